@@ -0,0 +1,332 @@
+"""
+Builds a PDBModel from parts of other models in a single pass
+
+PDBModel.concat copies every atom collected so far each time a model is added,
+so growing a model part by part takes a time quadratic in its size. An
+Assembly only records the atoms taken from every model and allocates the
+coordinates and profiles of the result once, when it is built. Chain ids,
+residue numbers and serial numbers are assigned in the same pass.
+
+"""
+
+import biskit as B
+import numpy as N
+import copy, string
+
+# Atoms that end a chain, removed when the chain is merged with the next one
+# (like PDBModel.mergeChains does)
+TERMINAL = ('OXT', 'OT2')
+
+
+class Assembly:
+    """
+    Parts of models to be joined into a new model
+
+    Usage
+    =====
+
+    >>> a = Assembly()
+    >>> a.addResidues(m1, range(10, 20))    # residues 10 to 19 of m1
+    >>> a.add(m2)                           # all of m2, as a new chain
+    >>> model = a.build()
+    """
+
+    def __init__(self):
+        self.parts = []
+
+    def __len__(self):
+        return sum(len(p['atoms']) for p in self.parts)
+
+    def add(self, model, atoms=None, newChain=True, split=True, renumber=False,
+        **profiles):
+        """
+        Adds atoms of a model after the ones already in the assembly
+
+        :param model:   model the atoms are taken from
+        :type model:    PDBModel
+        :param atoms:   indices of the atoms, in the order to take (default:
+                        None, all the atoms of model)
+        :type atoms:    list/array of int
+        :param newChain: the atoms start a new chain, otherwise they continue
+                        the last chain of the assembly (default: True)
+        :type newChain: bool
+        :param split:   keep the chain boundaries of model (and of changes of
+                        chain id) within the atoms, otherwise they are merged
+                        into a single chain (default: True)
+        :type split:    bool
+        :param renumber: number the residues consecutively from the start of
+                        their chain, and remove the insertion codes
+                        (default: False)
+        :type renumber: bool
+        :param profiles: atom profiles to use instead of the ones of model, as
+                        name=values with one value for every atom taken
+        :type profiles: lists/arrays
+        """
+        if atoms is None:
+            atoms = model.atomRange()
+
+        model.update()
+
+        self.parts.append({'model': model, 'atoms': N.asarray(atoms, int),
+            'newChain': newChain, 'split': split, 'renumber': renumber,
+            'profiles': profiles})
+
+    def addResidues(self, model, residues, **kw):
+        """
+        Adds residues of a model, see add()
+
+        :param residues: indices of the residues, in the order to take
+        :type residues: list/array of int
+        """
+        residues = list(residues)
+        atoms = model.res2atomIndices(residues) if residues else []
+
+        self.add(model, atoms, **kw)
+
+    def _chains(self, p):
+        """
+        :param p:   part of the assembly
+        :type p:    dict
+
+        :return: starts of the chains of the model, or of changes of chain id,
+                 within the atoms of the part (other than the first one)
+        :type return: array of int
+        """
+        m, i = p['model'], p['atoms']
+        if not len(i):
+            return N.zeros(0, int)
+
+        chainmap = m.chainMap()[i]
+        if 'chain_id' in p['profiles']:
+            ids = N.asarray(p['profiles']['chain_id'])
+        else:
+            ids = N.asarray(m.atoms['chain_id'])[i]
+
+        return N.flatnonzero((chainmap[1:] != chainmap[:-1]) | \
+            (ids[1:] != ids[:-1])) + 1
+
+    def _merged(self):
+        """
+        Removes the terminal atoms (see TERMINAL) of the chains that are
+        merged with the chain after them
+
+        :return: parts of the assembly without those atoms
+        :type return: list of dicts
+        """
+        starts, merges, names = [], [], []
+
+        start = 0
+        for p in self.parts:
+            i = p['atoms']
+            if len(i):
+                if p['newChain'] or not starts:
+                    starts.append(start)
+                else:
+                    merges.append(start)
+
+                bounds = start + self._chains(p)
+                if p['split']:
+                    starts.extend(bounds)
+                else:
+                    merges.extend(bounds)
+
+                names.append(N.asarray(p['model'].atoms['name'])[i])
+            start += len(i)
+
+        if not merges:
+            return self.parts
+
+        # Terminal atoms before the last merge of their chain
+        starts = N.sort(starts)
+        last = N.full(len(starts), -1)
+        N.maximum.at(last, N.searchsorted(starts, merges, side='right') - 1,
+            merges)
+        atoms = N.arange(start)
+        chain = N.searchsorted(starts, atoms, side='right') - 1
+        drop = N.isin(N.concatenate(names), TERMINAL) & (atoms < last[chain])
+
+        if not drop.any():
+            return self.parts
+
+        r = []
+        start = 0
+        for p in self.parts:
+            keep = N.flatnonzero(~drop[start:start+len(p['atoms'])])
+            start += len(p['atoms'])
+
+            profiles = {k: v[keep] if isinstance(v, N.ndarray) else \
+                [v[j] for j in keep] for k, v in p['profiles'].items()}
+            r.append(dict(p, atoms=p['atoms'][keep], profiles=profiles))
+
+        return r
+
+    def _profile(self, parts, key, level, index):
+        """
+        Joins an atom or residue profile of all the parts, the parts without
+        it take its default value
+
+        :param parts:   parts of the assembly
+        :type parts:    list of dicts
+        :param key:     name of the profile
+        :type key:      str
+        :param level:   'atoms' or 'residues'
+        :type level:    str
+        :param index:   indices taken from every part at this level
+        :type index:    list of arrays of int
+
+        :return: joined profile and its infos
+        :type return: (array or list, dict)
+        """
+        values = []
+        infos = None
+
+        for p, i in zip(parts, index):
+            pc = getattr(p['model'], level)
+
+            if level == 'atoms' and key in p['profiles']:
+                # Of the same type as the profile of the model
+                v = p['profiles'][key]
+                if key in pc:
+                    v = N.asarray(v) if isinstance(pc.get(key), N.ndarray) \
+                        else list(v)
+                values.append(v)
+            elif key in pc:
+                values.append(pc.get(key)[i] if isinstance(pc.get(key),
+                    N.ndarray) else [pc.get(key)[j] for j in i])
+            else:
+                values.append(None)
+
+            if infos is None and key in pc:
+                infos = copy.deepcopy(pc.getInfo(key))
+
+        infos = infos or {}
+        default = infos.get('default')
+        arrays = [v for v in values if isinstance(v, N.ndarray)]
+
+        if arrays and len(arrays) == len([v for v in values if v is not None]):
+            r = N.empty(sum(len(i) for i in index), N.result_type(*arrays))
+            start = 0
+            for v, i in zip(values, index):
+                r[start:start+len(i)] = default if v is None else v
+                start += len(i)
+
+        else:
+            r = []
+            for v, i in zip(values, index):
+                r += [default] * len(i) if v is None else list(v)
+
+        infos['changed'] = 1
+
+        return r, infos
+
+    def build(self, chainIds=True, serials=True):
+        """
+        Creates the model of the assembly
+
+        :param chainIds: name the chains with consecutive letters from A
+                        (default: True)
+        :type chainIds: bool
+        :param serials: number the atoms consecutively from 1 (default: True)
+        :type serials:  bool
+
+        Where chains are merged, their terminal atoms (OXT, OT2) are removed
+        like PDBModel.mergeChains does.
+
+        :return: new model with the atoms of every part
+        :type return: PDBModel
+
+        :raise PDBError: if there are more chains than letters for them
+        """
+        r = B.PDBModel()
+        if not self.parts:
+            return r
+
+        parts = self._merged()
+        first = parts[0]['model']
+        n = sum(len(p['atoms']) for p in parts)
+
+        xyz = N.empty((n, 3), first.xyz.dtype)
+        res_index, res_taken, chain_index = [], [], []
+        res_renumber = []
+
+        start = 0
+        for p in parts:
+            m, i = p['model'], p['atoms']
+            xyz[start:start+len(i)] = m.xyz[i]
+
+            if len(i):
+                # Residue and chain boundaries within the part
+                resmap = m.resMap()[i]
+                rstart = N.flatnonzero(resmap[1:] != resmap[:-1]) + 1
+                rstart = N.concatenate(([0], rstart))
+
+                if p['newChain'] or not chain_index:
+                    chain_index.append([start])
+                if p['split']:
+                    chain_index.append(start + self._chains(p))
+
+                res_index.append(start + rstart)
+                res_taken.append(resmap[rstart])
+                res_renumber.append(N.repeat(p['renumber'], len(rstart)))
+
+            else:
+                res_taken.append(N.zeros(0, int))
+
+            start += len(i)
+
+        r.setXyz(xyz)
+        r.setPdbCode(first.pdbCode)
+        r.info = copy.deepcopy(first.info)
+
+        atom_index = [p['atoms'] for p in parts]
+        r.atoms = first.atoms.__class__(r)
+        keys = []
+        for p in parts:
+            for k in list(p['model'].atoms.keys()) + list(p['profiles']):
+                if k not in keys:
+                    keys.append(k)
+        for key in keys:
+            values, infos = self._profile(parts, key, 'atoms', atom_index)
+            r.atoms.set(key, values, asarray=isinstance(values, N.ndarray),
+                **infos)
+
+        r.residues = first.residues.__class__(r)
+        keys = []
+        for p in parts:
+            keys += [k for k in p['model'].residues.keys() if k not in keys]
+        for key in keys:
+            values, infos = self._profile(parts, key, 'residues', res_taken)
+            r.residues.set(key, values, asarray=isinstance(values, N.ndarray),
+                **infos)
+
+        r._resIndex = N.concatenate(res_index).astype(int)
+        r._chainIndex = N.unique(N.concatenate(chain_index).astype(int))
+
+        # Residues to renumber, from 1 at the start of each chain
+        renumber = N.concatenate(res_renumber)
+        if renumber.any():
+            first_res = N.searchsorted(r._resIndex, r._chainIndex)
+            res_chain = N.searchsorted(r._chainIndex, r._resIndex,
+                side='right') - 1
+            numbers = N.arange(len(r._resIndex)) - first_res[res_chain] + 1
+
+            resmap = r.resMap()
+            mask = renumber[resmap]
+            old = r.atoms['residue_number']
+            r.atoms['residue_number'] = N.where(mask, numbers[resmap],
+                old).astype(old.dtype)
+            codes = r.atoms['insertion_code']
+            r.atoms['insertion_code'] = [''  if m else c for m, c in \
+                zip(mask, codes)]
+
+        if chainIds:
+            if len(r._chainIndex) > len(string.ascii_uppercase):
+                raise B.PDBError('Too many chains, running out of letters.')
+
+            letters = N.array(list(string.ascii_uppercase))
+            r.atoms['chain_id'] = letters[r.chainMap()].tolist()
+
+        if serials:
+            r['serial_number'] = N.arange(1, n+1)
+
+        return r
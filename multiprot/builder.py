@@ -11,14 +11,43 @@ to handle single and multiple chain scenarios
 ##### IN THE INPUT
 
 import tempfile
-import os, re, operator
+import copy, os, re, operator, time
+import concurrent.futures as F
 import biskit as B
 import biskit.tools as T
 import numpy as N
 from operator import itemgetter
 import multiprot.ranch as R
 import multiprot.pulchra as P
+import multiprot.rebuild as RB
+import multiprot.sampler as S
+import multiprot.ensemble as E
+import multiprot.assembly as A
+import multiprot.clash as CL
+import multiprot.shard as SH
+import multiprot.trace as TR
 from multiprot.errors import *
+from multiprot.parallel import pmap
+
+
+def _process_conformer(shared, model):
+    """
+    Processes one conformer of the last chain modeled (see
+    Builder.process_fullchain). Used to rebuild the conformers in a pool of
+    processes.
+
+    :param shared:  tuple (builder, chaini, out_symseq), with the builder of
+                    the conformers (see Builder.conformer_builder)
+    :type shared:   tuple
+    :param model:   model produced by Ranch, as a tuple
+                    (full, [modeled_doms], out_symseq)
+    :type model:    tuple
+
+    :return: symmetric units of the processed conformer
+    :type return: list of PDBModels
+    """
+    builder, chaini, out_symseq = shared
+    return builder.process_fullchain(chaini, model, out_symseq)
 
 
 class Builder:
@@ -28,19 +57,82 @@ class Builder:
     structures. This class will be used by the multiprot script.
     
     """
-    full_chains = []    # Will contain the symmetric units after each modeling step
-                        # (only one symmetric unit if there is no symmetry)
+    CHUNK = 256     # conformers of the last chain processed at once
+    SYM_TOL = 0.01  # maximum CA deviation (A) of symmetric copies of a unit
 
-    def __init__(self, chains, debug, number, dest):
+    def __init__(self, chains, debug, number, dest, workers=1, backend='ranch',
+        rebuild='pulchra', cache=None, clashes=None, oversample=1, rg=None,
+        budget=None, staging=None, seed=None, shard=None):
         """
         :param args: Object that contains the arguments parsed from the command line
         :type args: argparse.Namespace object created by calling parser.parse_args()
+        :param workers: number of processes used to post-process and rebuild
+                        the conformers produced by ranch (default: 1)
+        :type workers:  int
+        :param backend: program that samples the linkers, either the 'ranch'
+                        executable or the 'native' numpy sampler
+                        (default: 'ranch')
+        :type backend:  str
+        :param rebuild: program that rebuilds the atoms of the CA linkers,
+                        either the 'pulchra' executable or the 'native' tables
+                        of multiprot.rebuild (default: 'pulchra')
+        :type rebuild:  str
+        :param cache:   cache of the model pools built by ranch, not used by
+                        the native sampler (default: None, no cache)
+        :type cache:    multiprot.cache.PoolCache
+        :param clashes: distance (A) below which two heavy atoms of the final
+                        models clash, see multiprot.clash (default: None, the
+                        clashes are not scored)
+        :type clashes:  float
+        :param oversample:  ratio of models sampled to models kept for every
+                            chain, the best ones at the CA level (see select)
+                            (default: 1, the first models are kept)
+        :type oversample:   int
+        :param rg:      window (minimum, maximum) of the radius of gyration of
+                        the CA atoms used to select the models (default: None)
+        :type rg:       tuple of float
+        :param budget:  time in seconds given to ranch to sample the models
+                        of all the chains, shared among the chains left to
+                        model. The chains continue with the models sampled
+                        in their share (default: None, no limit)
+        :type budget:   float
+        :param staging: input of ranch shared with other builders with the
+                        same domains (default: None)
+        :type staging:  multiprot.ranch.Staging
+        :param seed:    seed of ranch or of the native sampler, from which the
+                        seed of every chain is derived (default: None, random)
+        :type seed:     int
+        :param shard:   number of the shard of the ensemble built, which only
+                        changes the seed of the chain that produces the final
+                        models, so all the shards share the other chains (see
+                        multiprot.shard) (default: None)
+        :type shard:    int
         """
         self.CHAINS = chains    # Original chains and PDBModels from input
 
+        # Will contain, for every conformer, the list of symmetric units after
+        # each modeling step (only one symmetric unit if there is no
+        # symmetry). Kept by every builder, so several of them can run in the
+        # same process
+        self.full_chains = []
+
         self.debug = debug
         self.num = number
         self.dest = dest
+        self.workers = workers
+        self.backend = backend
+        self.models = None      # final models, see run()
+        self.rebuild = rebuild
+        self.cache = cache
+        self.clashes = clashes
+        self.oversample = oversample
+        self.rg = rg
+        self.budget = budget
+        self.deadline = None    # end of the budget, see run()
+        self.staging = staging
+        self.seed = seed
+        self.shard = shard
+        self.sequential = False     # one chain per batch, see create_full
 
     def find_paired(self, i):
         """
@@ -105,7 +197,7 @@ class Builder:
         lowdom = first_res_dom[0]
         highdom = first_res_dom[-1]
         i=0
-        for match in re.finditer(dom.sequence(), full.sequence()):
+        for match in re.finditer(re.escape(dom.sequence()), full.sequence()):
             start,end = match.span()
             first_res_full = full.res2atomIndices([start])
             lowfull = first_res_full[0]
@@ -186,18 +278,56 @@ class Builder:
 
         return None
 
-    def call_ranch(self, chaini):
+    @TR.traced('builder.call_ranch')
+    def call_ranch(self, chaini, n=None, last=False, workers=None):
         """
         Builds models with ranch
+
+        :param chaini:  chain to be modeled
+        :type chaini:   multiprot.Chain object
+        :param n:   number of models to request from ranch (default: the
+                    number in chaini.args)
+        :type n:    int
+        :param last:    whether the chain produces the final models, whose
+                        seed depends on the shard (default: False)
+        :type last:     bool
+        :param workers: number of processes (default: None, self.workers)
+        :type workers:  int
         """
-        # Model with ranch
-        call = R.Ranch(*chaini.domains, **chaini.args, debug=self.debug)
+        workers = workers or self.workers
+        args = dict(chaini.args)
+        if n is not None:
+            args['n'] = n
+        if self.seed is not None:
+            key = (self.CHAINS.index(chaini),)
+            if last and self.shard is not None:
+                key = (self.shard,) + key
+            args['seed'] = SH.seed(self.seed, *key)
+
+        # Share of the time left for this chain
+        if self.deadline is not None:
+            now = time.time()
+            left = sum(not ch.modeled for ch in self.CHAINS)
+            args['deadline'] = now + max(0, self.deadline - now) / max(left, 1)
+
+        # Model with ranch, or with the native sampler
+        if self.backend == 'native':
+            call = S.Sampler(*chaini.domains, **args, workers=workers,
+                staging=self.staging, debug=self.debug)
+        else:
+            call = R.Ranch(*chaini.domains, **args, workers=workers,
+                cache=self.cache, staging=self.staging, debug=self.debug)
         models = call.run()
         if models is None:
             raise RanchError('Models not produced.')
+
+        # Residue ranges of the domains and linkers in the models
+        chaini.layout = call.layout
+
         return models
 
 
+    @TR.traced('builder.restore_pulchra')
     def restore_pulchra(self, ch, ch_reb, domains, modeled_domains, symtemplate,
         container_jdom):
         '''
@@ -220,7 +350,7 @@ class Builder:
         :type container_jdom:   PDBModel  
         '''
 
-        ch_res = B.PDBModel()
+        ch_res = A.Assembly()
         aa_count = 0
 
         for k in range(len(domains)):
@@ -256,27 +386,25 @@ class Builder:
                     # modeled_domains
                     len_dom = len(modeled_domains[k].takeChains([0]).sequence())
                 
-                rdom = ch.takeResidues(list(range(aa_count+Nd,
-                    aa_count+len_dom-Cd)))
+                rdom = list(range(aa_count+Nd, aa_count+len_dom-Cd))
 
                 assert ch_reb.sequence()[aa_count+Nd:aa_count+len_dom-Cd] == \
-                    rdom.sequence()
+                    ch.sequence()[aa_count+Nd:aa_count+len_dom-Cd]
 
-                ch_res = ch_res.concat(rdom)
+                ch_res.addResidues(ch, rdom, newChain=False, split=False,
+                    renumber=True)
                 aa_count += len_dom
             
             else:   # is a string
                 len_d = len(d)
                 # assert ch_reb.sequence()[aa_count:aa_count+len_d] == d
                 
-                ch_res = ch_res.concat(ch_reb.takeResidues(list(range(
-                    aa_count-Nd,aa_count+len_d+Cd))))
+                ch_res.addResidues(ch_reb, range(aa_count-Nd,aa_count+len_d+Cd),
+                    newChain=False, split=False, renumber=True)
                 aa_count += len_d
 
-        while ch_res.lenChains() > 1:
-            ch_res.mergeChains(0)
-
-        ch_res.renumberResidues()
+        # A single chain, with the residues numbered from 1
+        ch_res = ch_res.build(serials=False)
 
         assert ch_reb.sequence() == ch_res.sequence()
 
@@ -312,19 +440,24 @@ class Builder:
         m = model
         ch = m.takeChains([0])
 
-        print('    Rebuilding with pulchra...')
-        call = P.Pulchra(ch)
-        ch_reb = call.run()
+        if self.rebuild == 'native':
+            # The linkers of every conformer were already rebuilt at once
+            # (see create_full)
+            ch_reb = ch
+        else:
+            print('    Rebuilding with pulchra...')
+            call = P.Pulchra(ch)
+            ch_reb = call.run()
 
         ch_res = self.restore_pulchra(ch, ch_reb, domains, modeled_domains,
             symtemplate, container_jdom)
 
-        m_reb = ch_res.concat(m.takeChains(list(range(1,m.lenChains()))))
-
-        m_reb.addChainId()
-        m_reb['serial_number'] = N.arange(1,len(m_reb)+1) 
+        # The rebuilt chain, followed by the rest of the chains in m
+        m_reb = A.Assembly()
+        m_reb.add(ch_res)
+        m_reb.add(m, m.atomRange()[len(ch):])
 
-        return m_reb
+        return m_reb.build()
 
 
     def restore_emb(self,emb_mod,emb_ch):
@@ -338,22 +471,21 @@ class Builder:
         '''
 
         l = 0   # Cummulative residue length of the chains
-        full = B.PDBModel()
+        full = A.Assembly()
         
         # Go through each chain, obtain its length and take the corresponding
-        # residues from emb_ch. Then renumber amino acids and concat to full
+        # residues from emb_ch, with the amino acids renumbered
         for i in range(emb_mod.lenChains()):
             length = len(emb_mod.takeChains([i]).sequence())
-            ch = emb_ch.takeResidues(list(range(l,l+length)))
-            ch.renumberResidues()
-            full = full.concat(ch)
+            full.addResidues(emb_ch, range(l,l+length), renumber=True)
             l += length
 
-        return full
+        return full.build(chainIds=False, serials=False)
 
 
     ## WITHOUT GOING THROUGH ALL THE MODELS
-    def extract_embedded(self,model,emb_mod,container_seq):
+    @TR.traced('builder.extract_embedded')
+    def extract_embedded(self,model,emb_mod,container_seq,start):
         """
         Extracts emb_mod from the first chain of the model, appends it at the end
         of the model and rebuilds first chain with pulchra
@@ -365,6 +497,9 @@ class Builder:
         :type emb_mod:  PDBModel
         :param container_seq:   sequence of the specific domain with emb_mod inside
         :type container_seq:    str
+        :param start:   index of the first residue of emb_mod in the first
+                        chain (see embedded_start)
+        :type start:    int
 
         models = list of models to be processed
         emb_mod = PDBModel of the embedded CHAIN
@@ -376,12 +511,7 @@ class Builder:
         m = model
        
         ch = m.takeChains([0])  # The first chain will contain the embedded chain(s)
-        match = re.search(emb_mod.sequence(), ch.sequence())
-        
-        assert match, 'emb_mod is not in the first chain...'+'\n'+\
-            emb_mod.sequence()+'\n'+ch.sequence()
-
-        start, end = match.span()
+        end = start + emb_mod.lenResidues()
 
         assert container_seq==ch.takeResidues(list(range(start-2, 
             start-2+len(container_seq)))).sequence(), 'emb_mod is not inside \
@@ -391,30 +521,36 @@ class Builder:
         atomstart = ch.resIndex()[start]
         atomend = ch.resIndex()[end]
 
-        ch.remove(list(range(atomstart,atomend)))
+        # The first chain without emb_mod, as a single renumbered chain,
+        # followed by the rest of the chains in m
+        m_reb = A.Assembly()
+        m_reb.add(ch, N.r_[0:atomstart, atomend:len(ch)], split=False,
+            renumber=True)
+        m_reb.add(m, m.atomRange()[len(ch):])
 
-        # Rebuilding the chain
-        while ch.lenChains() > 1:
-            ch.mergeChains(0)
-
-        ch.renumberResidues()
-
-        # ch_reb = self.pulchra_rebuild(ch, domains, ch_ids)
+        # Divide emb_ch into the original chains (after running ranch, the aa
+        # are renumbered and the chains division is lost), at the end
+        m_reb.add(self.restore_emb(emb_mod,emb_ch))
 
-        # Concat ch_reb to the rest of the chains in m
-        m_reb = ch.concat(m.takeChains(list(range(1,m.lenChains()))))
+        return m_reb.build()
 
-        # Divide emb_ch into the original chains (after running ranch, the aa
-        # are renumbered and the chains division is lost)
-        emb_ch = self.restore_emb(emb_mod,emb_ch)
+    def embedded_start(self, chaini):
+        """
+        Finds where the chains embedded in the symmetric core (emb_mod) start
+        in the first chain of every symmetric unit modeled by ranch
 
-        # Concat the embedded chain(s) at the end
-        m_reb = m_reb.concat(emb_ch)
+        :param chaini:  chain with the symmetric core as symtemplate
+        :type chaini:   multiprot.Chain object
 
-        m_reb.addChainId()
-        m_reb['serial_number'] = N.arange(1,len(m_reb)+1)
+        :return: index of the first residue of emb_mod
+        :type return: int
+        """
+        symtemplate = chaini.args["symtemplate"]
+        k = [k for k, d in enumerate(chaini.domains) if d is symtemplate][0]
 
-        return m_reb
+        # emb_mod is placed after the first two residues of the container
+        # (see ranch.embed)
+        return chaini.layout[k][0] + 2
 
     def embed_symmetric(self,j_doms, full_chains):
         """
@@ -425,7 +561,7 @@ class Builder:
         :type j_doms:   list of PDBModels 
         """
         
-        full_symmetric = B.PDBModel()
+        full_symmetric = A.Assembly()
         emb_jsym = None
         ch = None
         j_dom = None
@@ -440,26 +576,28 @@ class Builder:
             assert emb_jsym.sequence() == j_dom.sequence()[:2] + ch.sequence() +\
                 j_dom.sequence()[2:]
 
-            full_symmetric = full_symmetric.concat(emb_jsym)
+            full_symmetric.add(emb_jsym)
 
+        full_symmetric = full_symmetric.build(chainIds=False, serials=False)
         container_jdom = j_dom.sequence()
         emb_mod = ch
         container_seq = emb_jsym.sequence()
         return full_symmetric, container_seq, emb_mod, container_jdom
 
-    def process_fullchain(self,chaini,model,out_symseq,bound_indexes):
+    @TR.traced('builder.process_fullchain')
+    def process_fullchain(self,chaini,model,out_symseq):
         """
-        Multi-purpose method that cleans the models obtained by ranch and saves
-        some chain attributes
+        Multi-purpose method that cleans the models obtained by ranch
         
         It takes every symmetric unit by separate, and does the following:
         1.  Extracts the embedded (previously modeled) chains
         2.  Runs pulchra on the modeled chain
-        3.  Adds symmetric unit (full_chain) and modeled domains dictionary to 
-            chain properties
-        4.  Replaces modeled domains in bound chains .domains attribute, and 
-            removes said domains from the corresponding full_chain
-        5.  Concatenates all of the full_chains into a full_model
+        3.  Returns the symmetric units (full_chains), which are concatenated
+            into a full model later (see concat_full)
+
+        It does not change chaini or the bound chains, so the conformers can
+        be processed in other processes. The modeled domains of the first
+        conformer are passed to the bound chains by record_modeled.
 
         out_symseq = sequence of the entire symmetric unit produced by ranch, or
         the sequence of the full model if there is no symmetry. May contain
@@ -467,10 +605,9 @@ class Builder:
 
         :param chaini:  chain to be processed
         :type chaini:   multiprot.Chain object
-        :param bound_indexes:   indexes of the chains bound to chaini
-        :type bound_indexes:    list of int
-        :param m:   model produced by Ranch (one of them)
-        :type m:    PDBModel
+        :param model:   model produced by Ranch (one of them), as a tuple
+                        (full, [modeled_doms], out_symseq)
+        :type model:    tuple
         :param out_symseq:  sequence of the entire symmetric unit produced by
                             ranch, or the sequence of the full model if there is
                             no symmetry. It may contain embedded previously
@@ -478,101 +615,445 @@ class Builder:
                             (container_seq)
         :type out_symseq:   str
 
-        :return s:  number of symmetric units
-        :type s:    int
-
-        Other output/modification to external variables:
-        This method appends every processed (emb_mod extracted and rebuilt with 
-        pulchra) symmetric unit as a separate element to the self.full_chains 
-        attribute, which is a list.
+        :return full_chains:    every processed (emb_mod extracted and rebuilt
+                                with pulchra) symmetric unit of the model as a
+                                separate element
+        :type full_chains:      list of PDBModels
 
         """
 
-        # if not full_model:
-        # full_model = B.PDBModel()
-
         m = model[0]
         
-        self.full_chains = []   # Reset variable to add new modeled chains
+        full_chains = []
+
+        # The symmetric units follow each other in the model, with the length
+        # of out_symseq each
+        l = len(out_symseq)
+
+        # Copies of the first unit are not rebuilt, but superposed
+        transforms = self.unit_transforms(m, l)
 
-        # For every appearance of out_symseq sequence in the model
         s=0
-        for match in re.finditer(out_symseq, m.sequence()):
-            istart, iend = match.span()
+        for istart in range(0, m.lenResidues() - l + 1, l):
+            modeled_domains = model[1][s]
+
+            if s and transforms:
+                full_ch = self.replicate(full_chains[0], m, copied,
+                    transforms, s)
+
+                full_chains.append(full_ch)
+                s += 1
+                continue
 
-            full_ch = m.takeResidues(list(range(istart, iend)))
+            full_ch = m.takeResidues(N.arange(istart, istart + l))
 
             # If there is a previously modeled chain embedded somewhere
             if chaini.container_seq:
                 # Extract the embedded chain(s)
                 # embedded chain(s) end up at the end of the model
                 full_ch = self.extract_embedded(full_ch, chaini.emb_mod, 
-                    chaini.container_seq)
-            
-            modeled_domains = model[1][s]
+                    chaini.container_seq, self.embedded_start(chaini))
 
             full_ch = self.pulchra_rebuild(full_ch, chaini.domains,
                 modeled_domains, chaini.args["symtemplate"], chaini.container_jdom)
 
-            # Add symmetric unit and modeled_domains dict to chain properties
-            self.full_chains.append(full_ch)
-            chaini.modeled_domains.append(modeled_domains)
+            if transforms:
+                copied = self.unit_atoms(full_ch, m, transforms[2])
 
-            self.replace_modeled(chaini,bound_indexes,s)
+            full_chains.append(full_ch)
 
             s += 1
 
-        return s
+        return full_chains
 
+    def record_modeled(self, chaini, model, units, bound_indexes):
+        """
+        Adds the modeled domains of every symmetric unit of a conformer to
+        chaini, and replaces them in the bound chains (see replace_modeled)
 
-    def concat_full(self):
+        :param chaini:  chain modeled
+        :type chaini:   multiprot.Chain object
+        :param model:   model produced by Ranch, as a tuple
+                        (full, [modeled_doms], out_symseq)
+        :type model:    tuple
+        :param units:   number of symmetric units of the model
+        :type units:    int
+        :param bound_indexes:   indexes of the chains bound to chaini
+        :type bound_indexes:    list of int
         """
-        Concats self.full_chains into a single model
+        for s in range(units):
+            chaini.modeled_domains.append(model[1][s])
+            self.replace_modeled(chaini, bound_indexes, s)
+
+    def conformer_builder(self):
+        """
+        :return: builder with only the options used by process_fullchain,
+                 which is sent to the processes that process the conformers
+                 instead of this one with all of its chains and models
+        :type return: Builder
         """
-        final = B.PDBModel()
+        return Builder([], self.debug, self.num, self.dest,
+            rebuild=self.rebuild)
 
-        for m in self.full_chains:
-            final = final.concat(m)
 
-        final.addChainId()
-        final['serial_number'] = N.arange(1,len(final)+1)
+    def unit_transforms(self, model, l):
+        """
+        Rigid transformations of the first symmetric unit of a model onto the
+        other ones, fitted on their CA atoms. The units are only copies if
+        they have the same atoms and the fit is within SYM_TOL, which is not
+        the case of the asymmetric poolsym modes.
 
-        print('Done.')
+        :param model:   model produced by ranch, with the symmetric units one
+                        after the other
+        :type model:    PDBModel
+        :param l:       number of residues of a symmetric unit
+        :type l:        int
 
-        return final
+        :return: rotations (units-1 x 3 x 3) and translations (units-1 x 3)
+                 of units 1.., and the first atom of every unit, or None if
+                 the units are not copies
+        :type return: tuple of numpy.arrays or None
+        """
+        n = model.lenResidues() // l
+        if n < 2:
+            return None
+
+        rindex = N.append(model.resIndex(), len(model))
+        bounds = rindex[N.arange(n + 1) * l]
+        sizes = N.diff(bounds)
+        if N.any(sizes != sizes[0]):
+            return None
+
+        names = N.array(model['name'])[:bounds[-1]].reshape(n, sizes[0])
+        if N.any(names != names[0]):
+            return None
+
+        ca = N.flatnonzero(model.maskCA()[:sizes[0]])
+        x = model.xyz[bounds[:-1,None] + ca].astype(N.float64)
+
+        r, t = S.superpose(x[:1], x[1:])
+        fit = x[0] @ N.swapaxes(r, -1, -2) + t[:,None]
+        if N.max(N.linalg.norm(fit - x[1:], axis=-1)) > self.SYM_TOL:
+            return None
+
+        return r, t, bounds[:-1]
+
+    def unit_atoms(self, unit, model, starts):
+        """
+        Finds the atoms of a processed symmetric unit that were taken from the
+        first unit of the ranch model as they are (fixed domains and other
+        chains), by their coordinates
+
+        :param unit:    first symmetric unit, after process_fullchain
+        :type unit:     PDBModel
+        :param model:   model produced by ranch
+        :type model:    PDBModel
+        :param starts:  first atom of every unit in model
+        :type starts:   numpy.array
+
+        :return: for every atom of unit, its index in the first unit of model,
+                 or -1 if the atom was rebuilt
+        :type return: numpy.array of int
+        """
+        def rows(xyz):
+            xyz = N.ascontiguousarray(xyz, N.float64)
+            return xyz.view(N.dtype((N.void, xyz.itemsize * 3))).ravel()
+
+        raw = rows(model.xyz[:starts[1] - starts[0]])
+        order = N.argsort(raw)
+        keys = rows(unit.xyz)
+
+        pos = N.minimum(N.searchsorted(raw[order], keys), len(raw) - 1)
+        found = raw[order][pos] == keys
+
+        return N.where(found, order[pos], -1)
+
+    def replicate(self, unit, model, copied, transforms, s):
+        """
+        Symmetric unit s of a model, as a copy of the processed first unit.
+        The rebuilt atoms are superposed onto unit s, and the others take
+        their coordinates from unit s of the ranch model, so the domains can
+        still be found in it (see extract_fixed).
+
+        :param unit:        first symmetric unit, after process_fullchain
+        :type unit:         PDBModel
+        :param model:       model produced by ranch
+        :type model:        PDBModel
+        :param copied:      atoms of unit taken from the ranch model, see
+                            unit_atoms()
+        :type copied:       numpy.array of int
+        :param transforms:  see unit_transforms()
+        :type transforms:   tuple
+        :param s:           index of the symmetric unit (> 0)
+        :type s:            int
+
+        :return: symmetric unit s
+        :type return: PDBModel
+        """
+        r, t, starts = transforms
+        mask = copied >= 0
+
+        xyz = unit.xyz @ r[s-1].T + t[s-1]
+        xyz[mask] = model.xyz[starts[s] + copied[mask]]
+
+        r = unit.clone()
+        r.xyz = xyz.astype(unit.xyz.dtype)
+
+        return r
 
-    def replace_jdoms(self,chainj):
+    @TR.traced('builder.concat_full')
+    def concat_full(self, full_chains):
+        """
+        Concats the symmetric units of every conformer into a single model
+
+        :param full_chains: symmetric units of every conformer
+        :type full_chains:  list of lists of PDBModels
+
+        :return models: one model for each conformer
+        :type models:   list of PDBModels
+        """
+        models = []
+
+        for units in full_chains:
+            final = A.Assembly()
+
+            for m in units:
+                final.add(m)
+
+            models.append(final.build())
+
+        return models
+
+    def pack(self, models, i, model, n):
+        """
+        Adds the final model of conformer i to the ensemble of the n final
+        models. The ensemble is started with the first conformer, and turned
+        into a list if a conformer does not have the same atoms as the others.
+
+        :param models:  final models of the conformers before i, or None
+        :type models:   Ensemble or list of PDBModels
+        :param i:       index of the conformer
+        :type i:        int
+        :param model:   final model of conformer i
+        :type model:    PDBModel
+        :param n:       number of conformers
+        :type n:        int
+
+        :return: final models up to conformer i
+        :type return:   Ensemble or list of PDBModels
+        """
+        if models is None:
+            return E.Ensemble.create(model, n)
+
+        if isinstance(models, E.Ensemble):
+            if models.fits(model):
+                models[i] = model
+                return models
+
+            models = [models[k] for k in range(i)]
+
+        models.append(model)
+        return models
+
+    def replace_jdoms(self,chainj,units=None):
         '''
         Replaces the models with new coordinates from chainj.new_domains 
         into chainj.domains, and deletes them from self.full_chains[0]
 
-        This method is only for non-symmetric structures
+        This method is only for non-symmetric structures, and it works on the
+        first conformer, which is the one the bound chains are modeled onto
+
+        :param units:   symmetric units to delete the domains from (default:
+                        None, self.full_chains[0])
+        :type units:    list of PDBModels
         '''
 
+        units = self.full_chains[0] if units is None else units
+
         for i in range(len(chainj.domains)):
             # Take the domains with new coordinates in chainj.new_domains,
             # and if there isn't any take the original one
             j_dom = chainj.new_domains[i]
             if j_dom:
                 chainj.domains[i] = j_dom
-                self.full_chains[0] = self.extract_fixed(j_dom, self.full_chains[0])
+                units[0] = self.extract_fixed(j_dom, units[0])
 
 
-    def create_full(self, i=0):
+    def schedule(self, order):
+        """
+        Chains to be modeled next, at the same time
+
+        A chain can be modeled once a chain bound to it is. Two such chains
+        are independent unless they are bound through a domain that was not
+        modeled yet, e.g. chains that are only bound to each other through a
+        complex modeled before them. Symmetric models are built one chain at
+        a time, and so are all the chains once the chains of a batch clashed
+        (see create_full).
+
+        :param order:   indexes of the modeled chains, in the order in which
+                        they were modeled
+        :type order:    list of int
+
+        :return: indexes of the chains to be modeled next, empty once there
+                 is no chain left to model
+        :type return: list of int
+        """
+        # pdbs whose coordinates are already set
+        placed = set(pdb for k in order for pdb in self.CHAINS[k].chains_names)
+        symmetric = bool(self.full_chains) and len(self.full_chains[0]) > 1
+
+        batch = []
+        for j, chainj in enumerate(self.CHAINS):
+            paired_to = self.find_paired(j)
+            if chainj.modeled or not any(k in paired_to for k in order):
+                continue
+
+            if all(pair[1][0] in placed for k in batch \
+                for pair in paired_to.get(k, [])):
+                batch.append(j)
+
+            if symmetric or self.sequential or chainj.args["symmetry"] != 'p1':
+                break
+
+        return batch
+
+    def attach(self, j, i, units):
+        """
+        Embeds the chains modeled so far into the domain of chain j bound to
+        chain i, so they are fixed when chain j is modeled
+
+        :param j:       index of the chain to be modeled
+        :type j:        int
+        :param i:       index of a modeled chain bound to chain j
+        :type i:        int
+        :param units:   symmetric units of the first conformer of the chains
+                        modeled so far. The domains of chain j are removed from
+                        them.
+        :type units:    list of PDBModels
+
+        :return: domains of chain j removed from the modeled chains
+        :type return: list of PDBModels
+        """
+        chainj = self.CHAINS[j]
+        chainj.paired_to = self.find_paired(j)
+
+        # Take chaini (along the rest of the modeled chains) and embed 
+        # it into the first domain in chainj bound to chaini
+        # (procedure changes a bit depending on symmetry)
+        pair = chainj.paired_to[i][0]
+        j_ind = chainj.names.index(pair[0])
+
+        if len(units)>1: 
+            # There is symmetry, embed all symmetric units into
+            # domjs ... assume that chaink is chaini
+            j_doms = chainj.jdomains[j_ind]
+            emb_sym = self.embed_symmetric(j_doms, units)
+            full_sym = emb_sym[0]
+            chainj.domains[j_ind] = full_sym
+            chainj.args["symtemplate"] = full_sym
+            chainj.args["symunit"] = emb_sym[1]
+            chainj.container_seq = emb_sym[1]
+            chainj.emb_mod = emb_sym[2]
+            chainj.container_jdom = emb_sym[3]
+
+            # Delete chainj.args["fixed"] contents
+            chainj.args["fixed"] = []
+
+            return []
+
+        # Take domains from chainj.new_domains, and remove
+        # them from the first conformer of the modeled chains
+        removed = [d for d in chainj.new_domains if d]
+        self.replace_jdoms(chainj, units)
+        
+        # Concat the full_chain to the first j_dom bound
+        # to chain k
+        jdom_new = chainj.domains[j_ind].concat(units[0])
+        chainj.args["fixed"].remove(chainj.domains[j_ind])
+        chainj.domains[j_ind] = jdom_new
+        chainj.args["fixed"].append(jdom_new)
+        # NOTE: Add jdom_new to chainj.args['chains'] dict??
+        # Not necessary so far since jdom_new is always the
+        # first chain, and that's the one taken if there is
+        # no chain specified in args['chains'] dict
+
+        return removed
+
+    @TR.traced('builder.select')
+    def select(self, models, n, workers=None):
         """
-        Method that will build the models through ranch and pulchra and return a
-        list with 10 PDBModels
-            MODIFY DESCRIPTION
+        Keeps the n best models produced by ranch, before their linkers are
+        rebuilt, according to their CA clashes and radius of gyration (see
+        multiprot.clash.rank). Without oversampling, the first n models are
+        kept.
+
+        :param models:  models produced by ranch
+        :type models:   Pool or list of tuples
+        :param n:       number of models
+        :type n:        int
+        :param workers: number of processes (default: None, self.workers)
+        :type workers:  int
+
+        :return: the n best models, the best first
+        :type return: Pool or list of tuples
         """
+        if self.oversample <= 1:
+            return models[:n]
+
+        workers = workers or self.workers
+        if isinstance(models, E.Pool):
+            return models[CL.rank(models.full, n, self.rg, workers)]
+
+        best = CL.rank([model[0] for model in models], n, self.rg, workers)
 
+        return [models[k] for k in best]
+
+    def model_chain(self, i, n, last, workers=None):
+        """
+        Models chain i through ranch and pulchra
+
+        :param i:       index of the chain
+        :type i:        int
+        :param n:       number of conformers
+        :type n:        int
+        :param last:    whether the chain is the last one to be modeled, which
+                        produces the final models
+        :type last:     bool
+        :param workers: number of processes (default: None, self.workers)
+        :type workers:  int
+
+        :return: the final models if last, otherwise the symmetric units of
+                 every conformer
+        :type return: Ensemble or list of PDBModels, or list of lists of
+                      PDBModels
+        """
         chaini = self.CHAINS[i]
+        workers = workers or self.workers
 
-        # Take only 'num' number of models
+        # Take only 'n' number of models
         print('Chain %d' % (i+1))
         print('    Modeling with ranch...')
-        models = self.call_ranch(chaini)[:self.num]
+        models = self.call_ranch(chaini, n * self.oversample, last, workers)
+
+        if self.deadline is not None and len(models) < n * self.oversample:
+            print('    * %d of the %d models requested were built within the '\
+                % (len(models), n * self.oversample) + 'time budget.')
+
+        if len(models) > n:
+            print('    Selecting the best %d of %d models...' % (n,
+                len(models)))
+        models = self.select(models, n, workers)
+
+        if self.rebuild == 'native':
+            print('    Rebuilding the linkers...')
+            with TR.span('builder.rebuild', chain=i+1):
+                if isinstance(models, E.Pool):
+                    models.full = RB.rebuild(models.full)
+                else:
+                    full = RB.rebuild([model[0] for model in models])
+                    models = [(f,) + tuple(model[1:]) for f, model in \
+                        zip(full, models)]
 
-        model = models[0]   # take first PDBModel
         out_symseq = models[0][2]   # symmetric unit sequence... if there is no
                                     # symmetry, this will be the seq of the
                                     # entire model
@@ -590,313 +1071,298 @@ class Builder:
 
         # Find indexes of bound chains
         bound_indexes = [key for key,value in chaini.paired_to.items()]
-  
-        s = self.process_fullchain(chaini,model,out_symseq, bound_indexes)
 
-        chaini.modeled=True
-        
-        for j in bound_indexes:
-            chainj = self.CHAINS[j]
-            if not chainj.modeled:
+        # The conformers are independent from each other, so they can be
+        # rebuilt in parallel, with only the data they need. The bound chains
+        # are modeled onto the first conformer, whose modeled domains are
+        # passed to them here. The final models are packed into an ensemble a
+        # chunk at a time, so only the coordinates of every conformer are kept.
+        full_chains = []
+        final = None
+        shared = (self.conformer_builder(), chaini, out_symseq)
+        for start in range(0, len(models), self.CHUNK):
+            with TR.span('builder.process', chain=i+1, start=start):
+                units = pmap(_process_conformer,
+                    models[start:start+self.CHUNK], workers, shared)
+
+            if start == 0:
+                self.record_modeled(chaini, models[0], len(units[0]),
+                    bound_indexes)
+
+            if last:
+                concat = self.concat_full(units)
+                with TR.span('builder.pack', chain=i+1, start=start):
+                    for k, m in enumerate(concat):
+                        final = self.pack(final, start+k, m, len(models))
+            else:
+                full_chains += units
+
+        return final if last else full_chains
+
+    def trace_chain(self, i, n, last, workers=None):
+        """
+        Models chain i (see model_chain) in a span of its own, see
+        multiprot.trace
+        """
+        with TR.span('builder.chain', chain=i+1, conformers=n):
+            return self.model_chain(i, n, last, workers)
 
-                chainj.paired_to = self.find_paired(j)
-                bound_j = [key for key, value in chainj.paired_to.items()]
-
-                # Take chaini (along the rest of the modeled chains) and embed 
-                # it into the first domain in chainj bound to chaini
-                # (procedure changes a bit depending on symmetry)
-                pair = chainj.paired_to[i][0]
-                j_ind = chainj.names.index(pair[0])
-
-                if s>1: 
-                    # There is symmetry, embed all symmetric units into
-                    # domjs ... assume that chaink is chaini
-                    j_doms = chainj.jdomains[j_ind]
-                    emb_sym = self.embed_symmetric(j_doms, self.full_chains)
-                    full_sym = emb_sym[0]
-                    chainj.domains[j_ind] = full_sym
-                    chainj.args["symtemplate"] = full_sym
-                    chainj.args["symunit"] = emb_sym[1]
-                    chainj.container_seq = emb_sym[1]
-                    chainj.emb_mod = emb_sym[2]
-                    chainj.container_jdom = emb_sym[3]
-
-                    # Delete chainj.args["fixed"] contents
-                    chainj.args["fixed"] = []
-                else:
-                    # Take domains from chainj.new_domains, and remove
-                    # them from self.full_chains[0]
-                    self.replace_jdoms(chainj)
-                    
-                    # Concat the full_chain to the first j_dom bound
-                    # to chain k
-                    jdom_new = chainj.domains[j_ind].concat(
-                        self.full_chains[0])
-                    chainj.args["fixed"].remove(chainj.domains[j_ind])
-                    chainj.domains[j_ind] = jdom_new
-                    chainj.args["fixed"].append(jdom_new)
-                    # NOTE: Add jdom_new to chainj.args['chains'] dict??
-                    # Not necessary so far since jdom_new is always the
-                    # first chain, and that's the one taken if there is
-                    # no chain specified in args['chains'] dict
-
-                self.create_full(j)
+    @TR.traced('builder.merge')
+    def merge(self, models, siblings):
+        """
+        Adds the chains modeled at the same time as the lead chain of a batch
+        (see create_full) to its models, after the lead chain. The domains
+        of the other chains are removed from the chains the lead chain was
+        modeled on, since they come with them.
+
+        :param models:  models of the lead chain, each with the lead chain
+                        followed by the chains it was modeled on
+        :type models:   Ensemble or list of PDBModels
+        :param siblings: for every other chain of the batch, a tuple
+                        (model, core, removed) with its first conformer, the
+                        chains it was modeled on, and its domains removed from
+                        them (see attach)
+        :type siblings: list of tuples
+
+        :return: models with the chains of the whole batch
+        :type return: Ensemble or list of PDBModels
+
+        :raise MatchError: if the chains a sibling was modeled on are not
+                           found in its model
+        :raise ClashError: if the chains of the batch clash with each other
+                           in the first merged model
+        """
+        parts = []
+        removed = []
+        for model, core, doms in siblings:
+            new = self.extract_fixed(core, model.clone())
+            if len(new) != len(model) - len(core):
+                raise MatchError('The modeled chains could not be found in '+\
+                    'a chain modeled at the same time.')
+            parts.append(new)
+            removed += doms
+
+        first = models[0]
+        lead = first.chainIndex()[1] if first.lenChains() > 1 else len(first)
+        sizes = [lead] + [len(new) for new in parts]
+
+        if not isinstance(models, E.Ensemble):
+            merged = [self.merge_model(m, parts, removed) for m in models]
+            self.check_siblings(merged[0], sizes)
+            return merged
+
+        # The conformers have the same atoms, so the atoms of the merged
+        # model are taken from the same positions in every one of them
+        first['merge_index'] = N.arange(len(first))
+        merged = self.merge_model(first, parts, removed)
+        self.check_siblings(merged, sizes)
+
+        index = merged['merge_index']
+        merged.atoms.remove('merge_index')
+        lead = index >= 0
+
+        r = E.Ensemble.create(merged, len(models))
+        for start in range(0, len(models), self.CHUNK):
+            xyz = models.xyz[start:start+self.CHUNK]
+            block = N.repeat(merged.xyz[None], len(xyz), axis=0)
+            block[:, lead] = xyz[:, index[lead]]
+            r.xyz[start:start+len(xyz)] = block
+
+        return r
+
+    def check_siblings(self, model, sizes):
+        """
+        Counts the clashes between the chains modeled at the same time (see
+        merge), which do not see each other while they are modeled
 
-        return None
+        :param model:   merged model, starting with the chains of the batch
+        :type model:    PDBModel
+        :param sizes:   number of atoms of every chain of the batch, in the
+                        order they are in model
+        :type sizes:    list of int
 
-    def run(self):
-        '''
-        Calls methods to create chains and concatenate them
-        '''
-        self.create_full()
-        return self.concat_full()
+        :raise ClashError: if any two of the chains clash
+        """
+        atoms = CL.contacts(model)
+        cutoff = self.clashes or CL.CUTOFF
+        bounds = N.cumsum([0] + sizes)
 
+        def clashes(start, end):
+            keep = (atoms[0] >= start) & (atoms[0] < end)
+            return CL.count(model.xyz, tuple(a[keep] for a in atoms), cutoff)
 
-    def write_pdbs(self, models, dest, pref='mp'):
-        '''
-        Writes the pdbmodels to the specified destination
-        '''
+        # Clashes among all the chains, but the ones within each chain
+        n = clashes(0, bounds[-1]) - sum(clashes(start, end) \
+            for start, end in zip(bounds[:-1], bounds[1:]))
 
-        f_out = [os.path.join(dest,pref+'_%02d.pdb' % i) for i in \
-            range(1,len(models)+1)]
+        if n:
+            raise ClashError('%d clashes between chains modeled at the same '
+                'time.' % n)
 
-        for i in range(len(models)):
-            models[i].writePdb(f_out[i])
+    def merge_model(self, model, parts, removed):
+        """
+        Inserts the chains in parts after the first chain of model, removing
+        the domains in removed from the rest of model (see merge)
 
-        return None    
+        :param model:   model of the lead chain of a batch
+        :type model:    PDBModel
+        :param parts:   chains modeled along with the lead chain
+        :type parts:    list of PDBModels
+        :param removed: domains to be removed from model
+        :type removed:  list of PDBModels
 
+        :return: merged model
+        :type return: PDBModel
+        """
+        model = model.clone()
+        for dom in removed:
+            model = self.extract_fixed(dom, model)
 
-#############
-##  TESTING        
-#############
-import multiprot.parseChains as C
-import multiprot.testing as testing
+        first = model.chainIndex()[1] if model.lenChains() > 1 else len(model)
 
-class TestBuilder(testing.AutoTest):
-    """
-    Test class for argument parsing
+        r = A.Assembly()
+        r.add(model, N.arange(first))
+        for new in parts:
+            if 'merge_index' in model.atoms:
+                r.add(new, merge_index=N.full(len(new), -1))
+            else:
+                r.add(new)
+        r.add(model, N.arange(first, len(model)))
 
-    Test for the examples 1, 4, 5 and 
-    ONLY SINGLE CHAINS FOR NOW
-    """
+        return r.build()
 
-    tempdir = None
-    testpath = None
-    mono1 = None
-    mono2 = None
-    mono3 = None
-    dimer1 = None
-    dimer2 = None
-    dimer3 = None
-    trimer = None
-    linker = None
-    argstring1 = None
-    argstring4 = None
-    argstring5 = None
-    argstring2ch = None
-    argstring2chfixed = None
-    argstring3ch = None
-    builder1 = None
-    builder4 = None
-    builder5 = None
-    builder2ch = None
-    builder2chfixed = None
-    builder3ch = None
-
-    def setUp(self):
-
-        self.testpath = self.testpath or \
-            os.path.join(os.path.abspath(os.path.dirname(__file__)), 'testdata')
-
-        self.mono1 = self.mono1 or os.path.join(self.testpath, '2z6o.pdb')
-        self.mono2 = self.mono2 or os.path.join(self.testpath, 'histone.pdb')
-        self.mono3 = self.mono3 or os.path.join(self.testpath, '2h5q.pdb')
-        self.dimer1 = self.dimer1 or os.path.join(self.testpath, 'domAB1.pdb')
-        self.dimer2 = self.dimer2 or os.path.join(self.testpath, 'domAB2.pdb')
-        self.dimer3 = self.dimer3 or os.path.join(self.testpath, '2qud.pdb')
-        self.trimer = self.trimer or os.path.join(self.testpath, '2ei4.pdb')
-
-        self.linker = self.linker or 'TG'*15
-
-        #### SINGLE CHAIN EXAMPLES
-        # Assemble argument strings
-        self.argstring1 = self.argstring1 or \
-                '--chain '+self.mono1+' '+self.linker+' '+self.mono2
-        
-        # Careful with the names of fixed domains... cannot be repeated in the chain
-        # for repeating pdbs that are not fixed or are not symtemplates there
-        # should be no problem
-        self.argstring4 = self.argstring4 or \
-                '--chain '+self.dimer1+':A '+self.linker+' '+\
-                self.dimer2+':B --fixed '+self.dimer1
-        
-        #### SYMMETRY EXAMPLE
-        # Careful with symtemplate name... cannot be repeated in the chain
-        self.argstring5 = self.argstring5 or '--chain '+self.dimer1+' '+\
-                self.linker+' '+self.dimer2+':A --symmetry p2 --symtemplate '\
-                +self.dimer1+' --poolsym s'
-
-        #### DOUBLE CHAIN
-        # Not fixed
-        self.argstring2ch = self.argstring2ch or '--chain '+self.dimer1+':A '+\
-                self.linker+' '+self.dimer3+':A '+self.linker+' '+self.dimer2+':A '+\
-                '--chain '+self.dimer1+':B '+self.linker+' '+self.dimer3+':B '+\
-                self.linker+' '+self.dimer2+':B'
-
-        # Fixed
-        # The model is the same as the previous one, but the coordinates of the
-        # dimers will be fixed
-        self.argstring2chfixed = self.argstring2chfixed or '--chain '+self.dimer1+\
-                ':A '+self.linker+' '+self.dimer3+':A '+self.linker+' '+\
-                self.dimer2+':A '+'--chain '+self.dimer1+':B '+self.linker+' '+\
-                self.dimer3+':B '+self.linker+' '+self.dimer2+':B --fixed '+\
-                self.dimer1+' '+self.dimer2+' '+self.dimer3
-
-        #### TRIPLE CHAIN
-        self.argstring3ch = self.argstring3ch or '--chain '+self.trimer+':A '+\
-                self.linker+' '+self.mono1+' --chain '+self.trimer+':B '+\
-                self.linker+' '+self.mono2+' --chain '+self.trimer+':C '+\
-                self.linker+' '+self.mono3
-
-        # Create Chain objects and Builder instance
-        args1 = C.parsing(self.argstring1.split())
-        CHAINS1 = C.create_chains(args1)
-        self.builder1 = Builder(CHAINS1,args1.debug,args1.number,
-            args1.destination)
-
-        args4 = C.parsing(self.argstring4.split())
-        CHAINS4 = C.create_chains(args4)
-        self.builder4 = Builder(CHAINS4,args4.debug,args4.number,
-            args4.destination)
-
-        args5 = C.parsing(self.argstring5.split())
-        CHAINS5 = C.create_chains(args5)
-        self.builder5 = Builder(CHAINS5,args5.debug,args5.number,
-            args5.destination)
-
-        args2ch = C.parsing(self.argstring2ch.split())
-        CHAINS2ch = C.create_chains(args2ch)
-        self.builder2ch = Builder(CHAINS2ch,args2ch.debug,args2ch.number,
-            args2ch.destination)
-
-        args2chfixed = C.parsing(self.argstring2chfixed.split())
-        CHAINS2chfixed = C.create_chains(args2chfixed)
-        self.builder2chfixed = Builder(CHAINS2chfixed,args2chfixed.debug,
-            args2chfixed.number,args2chfixed.destination)
-
-        args3ch = C.parsing(self.argstring3ch.split())
-        CHAINS3ch = C.create_chains(args3ch)
-        self.builder3ch = Builder(CHAINS3ch,args3ch.debug,args3ch.number,
-            args3ch.destination)
-
-        ## ADD TEST WITH 3 CHAINS AND SYMMETRY
-    
-    # PASSED
-    def test_find_paired(self):
-        '''
-        Test the output of find_paired method, which should return a dictionary 
-        of the form 
+    def create_full(self, i=0):
+        """
+        Method that will build the models through ranch and pulchra, leaving
+        the symmetric units of every conformer in self.full_chains, and the
+        final models in self.models once the last chain is modeled
+
+        Bound chains are modeled onto the first conformer of the chains
+        modeled before them, so only the last chain to be modeled is taken
+        through the pipeline with all of its 'num' ranch conformers. Every
+        final model therefore contains all of the chains.
+
+        The chains are modeled in batches, starting with chain i (see
+        schedule). The chains of a batch do not depend on each other, so they
+        are modeled at the same time (with up to self.workers threads, which
+        share the self.workers processes) on copies of the chains modeled
+        before, and then merged into the models of the last chain of the
+        batch (see merge). If the chains of a batch clash with each other,
+        the batch is modeled again one chain at a time, each chain onto the
+        ones modeled before it.
+        """
+        order = []      # modeled chains
+        batch = [i]
+
+        while batch:
+            # State before the batch, restored if its chains clash
+            saved = copy.deepcopy((self.CHAINS, self.full_chains)) \
+                if len(batch) > 1 else None
+
+            remaining = [ch for ch in self.CHAINS if not ch.modeled]
+            last = len(batch) == len(remaining)
+            lead = batch[-1]
+
+            # Only the last chain to be modeled produces the ensemble, the rest
+            # need a single conformer to embed into the bound chains
+            ns = [self.num if last and j==lead else 1 for j in batch]
+            lasts = [last and j==lead for j in batch]
+
+            cores = {}
+            for j in batch:
+                if order:
+                    units = [u.clone() for u in self.full_chains[0]]
+                    parent = [k for k in order if k in self.find_paired(j)][-1]
+                    removed = self.attach(j, parent, units)
+                    cores[j] = (units[0], removed)
+
+            if self.workers > 1 and len(batch) > 1:
+                # The processes are split among the threads, the lead chain
+                # takes the ones left over
+                threads = min(self.workers, len(batch))
+                workers = [self.workers // threads] * len(batch)
+                workers[-1] += self.workers % threads
+                with F.ThreadPoolExecutor(threads) as pool:
+                    results = list(pool.map(self.trace_chain, batch, ns,
+                        lasts, workers))
+            else:
+                results = list(map(self.trace_chain, batch, ns, lasts))
+
+            results = dict(zip(batch, results))
+            for j in batch:
+                self.CHAINS[j].modeled = True
+            order += batch
+
+            siblings = [(results[j][0][0],) + cores[j] for j in reversed(batch) \
+                if j != lead]
+
+            try:
+                if last:
+                    self.models = self.merge(results[lead], siblings) \
+                        if siblings else results[lead]
+                elif siblings:
+                    self.full_chains = [[self.merge([results[lead][0][0]],
+                        siblings)[0]]]
+                else:
+                    self.full_chains = results[lead]
 
-        paired_to_i = {j:[pair_ij1,pair_ij2],k:[pair_ik1],...}
+            except ClashError as e:
+                print('    * %s Modeling them again one at a time...' % e)
+                self.CHAINS, self.full_chains = saved
+                order = order[:-len(batch)]
+                self.sequential = True
 
-        Where 
-        - i is the index of the chain whose bound chains will be found
-        - j and k are indexes of bound chains
-        - pair_ij1 and pair_ij2 are the names of the domains that bind chains i and j,
-          in the form:
-            pair_ijx = [(pdb_namei, chain_idi),(pdb_namej, chain_idj)]
-        - pair_ik1 has the names of the domain that binds chains i and k, in the
-          form:
-            pair_ikx = [(pdb_namei, chain_idi),(pdb_namek, chain_idk)]
+            batch = self.schedule(order)
 
-        This test method tests all the example cases in the setUp method
-        
+        return None
+
+    @TR.traced('builder.run')
+    def run(self):
         '''
+        Calls methods to create chains and concatenate them
 
-        # Only one chain with linkers, no chains paired
-        paired_to1 = self.builder1.find_paired(0)
-        self.assertTrue(len(paired_to1)==0)
-
-        paired_to4 = self.builder4.find_paired(0)
-        self.assertTrue(len(paired_to4)==0)
-
-        # Symmetric chains, no paired chains taken into account
-        paired_to5 = self.builder5.find_paired(0)
-        self.assertTrue(len(paired_to5)==0)
-
-        # Two chains with linkers
-        # Running method on chain 0
-        paired_to2ch0 = self.builder2ch.find_paired(0)
-        pair1 = [(self.dimer1,'A'),(self.dimer1,'B')]
-        pair2 = [(self.dimer3,'A'),(self.dimer3,'B')]
-        pair3 = [(self.dimer2,'A'),(self.dimer2,'B')]
-        self.assertTrue(paired_to2ch0=={1:[pair1,pair2,pair3]}, paired_to2ch0)
-        # Running method on chain 1
-        paired_to2ch1 = self.builder2ch.find_paired(1)
-        pair1 = [(self.dimer1,'B'),(self.dimer1,'A')]
-        pair2 = [(self.dimer3,'B'),(self.dimer3,'A')]
-        pair3 = [(self.dimer2,'B'),(self.dimer2,'A')]
-        self.assertTrue(paired_to2ch1=={0:[pair1,pair2,pair3]}, paired_to2ch1)
-
-        # Three chains with linkers
-        # Running method on chain 0
-        paired_to3ch0 = self.builder3ch.find_paired(0)
-        pair1 = [(self.trimer,'A'),(self.trimer,'B')]
-        pair2 = [(self.trimer,'A'),(self.trimer,'C')]
-        self.assertTrue(paired_to3ch0=={1:[pair1],2:[pair2]})
-        # Running on chain 1
-        paired_to3ch1 = self.builder3ch.find_paired(1)
-        pair1 = [(self.trimer,'B'),(self.trimer,'A')]
-        pair2 = [(self.trimer,'B'),(self.trimer,'C')]
-        self.assertTrue(paired_to3ch1=={0:[pair1],2:[pair2]})
-        # Running on chain 2
-        paired_to3ch2 = self.builder3ch.find_paired(2)
-        pair1 = [(self.trimer,'C'),(self.trimer,'A')]
-        pair2 = [(self.trimer,'C'),(self.trimer,'B')]
-        self.assertTrue(paired_to3ch2=={0:[pair1],1:[pair2]})
-
-    # PASSED
-    def test_embed_symmetric(self):
+        :return models: one model for each of the 'num' conformers
+        :type models:   Ensemble, or list of PDBModels if the conformers do
+                        not have the same atoms
         '''
-        Tests builder.embed_symmetric()
+        if self.budget is not None:
+            self.deadline = time.time() + self.budget
+
+        self.create_full()
+
+        if self.clashes:
+            print('Scoring clashes...')
+            with TR.span('builder.clashes'):
+                CL.score(self.models, self.clashes, self.workers)
+
+        print('Done.')
+
+        return self.models
+
+
+    @TR.traced('builder.write_pdbs')
+    def write_pdbs(self, models, dest, pref='mp'):
         '''
-        mod1 = B.PDBModel(os.path.join(self.testpath, 'chain01_2ch.pdb'))
-        emb_mod = mod1.takeChains([1,2,3])
-        j_dom = mod1.takeChains([0])
-        full_emb = self.builder1.embed_symmetric([j_dom],[emb_mod])
+        Writes the pdbmodels to the specified destination, and the clashes of
+        every model to pref_clashes.txt if they were scored
 
-        self.assertTrue(len(full_emb[0])==9267, str(len(full_emb)))
+        :return: paths of the files written
+        :type return: list of str
+        '''
 
-    # PASSED  
-    def test_extract_embedded(self):
-        """
-        Tests the builder.extract_embedded method
-        """
-        
-        mod1 = B.PDBModel(os.path.join(self.testpath, 'chain01_2ch.pdb'))
-        emb_mod = mod1.takeChains([1,2,3])
-        j_dom = mod1.takeChains([0])
-        full_emb = self.builder1.embed_symmetric([j_dom],[emb_mod])
-        container_seq = j_dom.sequence()[:2] + emb_mod.sequence() +\
-            j_dom.sequence()[2:]
-
-        full = full_emb[0]
-        while full.lenChains()>1:
-            full.mergeChains(0)
-
-        chain01_2ch_reb = self.builder1.extract_embedded(full, emb_mod, 
-            container_seq)
-
-        # chain01_2ch_reb.writePdb('testdata/chain01_testrebuilt.pdb')
-
-        self.assertTrue(chain01_2ch_reb.lenChains()==4)
-        self.assertTrue(chain01_2ch_reb.sequence()==mod1.sequence())
-        # The length is 9747 instead of 9750 because Biskit does not write OXT
-        # And pulchra keeps it only for the rebuilt chain
-        # self.assertTrue(len(chain01_2ch_reb)==9747, len(chain01_2ch_reb))
-        
+        f_out = [os.path.join(dest,pref+'_%02d.pdb' % i) for i in \
+            range(1,len(models)+1)]
 
+        clashes = []
+        for i in range(len(models)):
+            m = models[i]
+            m.writePdb(f_out[i])
+            if 'clashes' in m.info:
+                clashes.append(m.info['clashes'])
 
-if __name__ == '__main__':
+        if clashes:
+            f_out.append(os.path.join(dest, pref+'_clashes.txt'))
+            CL.write_summary(f_out[-1], [os.path.basename(f) for f in \
+                f_out[:len(models)]], clashes)
 
-    testing.localTest(debug=False)
+        return f_out
@@ -0,0 +1,199 @@
+"""
+On-disk cache of the model pools produced by ranch
+
+The pools are stored by a hash of everything that defines them: the sequence
+given to ranch, the coordinates of the domains and the ranch options (other
+than the paths and the number of models). A request for n models is served
+from the cache if the pool already has them, and ranch only has to build the
+missing ones otherwise.
+
+The cache lives in $MULTIPROT_CACHE, or in ~/.cache/multiprot if it is not
+set. Once it grows past its maximum size, the pools that were used least
+recently are removed. The multipr script also keeps the parsed input pdb
+files in its 'structures' directory (see multiprot.structures), which is
+removed like a pool.
+
+"""
+
+import hashlib
+import os, shutil, time
+import numpy as N
+
+SIZE = 2 * 1024**3      # default maximum size of the cache, in bytes
+
+
+def location():
+    """
+    :return: default directory of the cache
+    :type return: str
+    """
+    return os.environ.get('MULTIPROT_CACHE') or \
+        os.path.join(os.path.expanduser('~'), '.cache', 'multiprot')
+
+def pool_key(sequence, domains, options):
+    """
+    Hash of the input of a ranch pool
+
+    The coordinates are rounded to the precision of the pdb format, so the
+    same domain gives the same key whether it was read from a file or not.
+
+    :param sequence:    sequence of the chain given to ranch
+    :type sequence:     str
+    :param domains:     domains given to ranch, in order
+    :type domains:      list of PDBModels
+    :param options:     ranch options, without paths and number of models
+    :type options:      str
+
+    :return: hexadecimal key of the pool
+    :type return: str
+    """
+    h = hashlib.sha256()
+    h.update(sequence.encode())
+
+    for dom in domains:
+        _update(h, dom)
+
+    h.update(b'\0' + options.encode())
+
+    return h.hexdigest()
+
+def model_key(model):
+    """
+    Hash of the sequence, atoms and coordinates of a model, see pool_key()
+
+    :param model:   model to hash
+    :type model:    PDBModel
+
+    :return: hexadecimal key of the model
+    :type return: str
+    """
+    h = hashlib.sha256()
+    _update(h, model)
+
+    return h.hexdigest()
+
+def _update(h, model):
+    """
+    Adds a model to a hash
+    """
+    h.update(b'\0' + model.sequence().encode())
+    h.update(' '.join(model.atoms['name']).encode())
+    h.update(N.round(model.xyz, 3).astype('<f8').tobytes())
+
+
+class PoolCache:
+    """
+    Directory with one sub-directory of models for every pool
+
+    Usage
+    =====
+
+    >>> cache = PoolCache()
+    >>> paths = cache.get(key, 20)          # up to 20 cached models
+    >>> cache.add(key, new_paths)           # store new models of the pool
+    """
+
+    def __init__(self, path=None, size=SIZE):
+        """
+        :param path:    directory of the cache (default: see location())
+        :type path:     str
+        :param size:    maximum size of the cache in bytes, the least
+                        recently used pools are removed beyond it
+                        (default: 2 GB)
+        :type size:     int
+        """
+        self.path = path or location()
+        self.size = size
+
+    def entry(self, key):
+        return os.path.join(self.path, key)
+
+    def get(self, key, n):
+        """
+        Cached models of a pool, in the order in which they were added. The
+        pool is marked as recently used.
+
+        :param key: key of the pool, see pool_key()
+        :type key:  str
+        :param n:   maximum number of models
+        :type n:    int
+
+        :return: paths of up to n models
+        :type return: list of str
+        """
+        entry = self.entry(key)
+        try:
+            files = sorted(f for f in os.listdir(entry) if f.endswith('.pdb'))
+            os.utime(entry)
+        except OSError:
+            return []
+
+        return [os.path.join(entry, f) for f in files[:n]]
+
+    def add(self, key, paths):
+        """
+        Copies new models of a pool into the cache, after the models that are
+        already there, and removes old pools if the cache is too large.
+
+        Every file is copied under a temporary name and renamed once complete,
+        so other processes never read a partial model.
+
+        :param key:     key of the pool, see pool_key()
+        :type key:      str
+        :param paths:   paths of the models
+        :type paths:    list of str
+        """
+        entry = self.entry(key)
+        os.makedirs(entry, exist_ok=True)
+
+        # Unique and increasing prefix for this batch of models
+        batch = '%016x%08x' % (time.time_ns(), os.getpid())
+
+        for i, f in enumerate(paths):
+            target = os.path.join(entry, '%s_%05d.pdb' % (batch, i))
+            shutil.copyfile(f, target + '.tmp')
+            os.replace(target + '.tmp', target)
+
+        os.utime(entry)
+        self.evict(keep=key)
+
+    def entries(self):
+        """
+        :return: (last use, size in bytes, key) of every pool in the cache,
+                 the least recently used first
+        :type return: list of tuples
+        """
+        r = []
+        try:
+            keys = os.listdir(self.path)
+        except OSError:
+            return r
+
+        for key in keys:
+            entry = self.entry(key)
+            try:
+                size = sum(os.path.getsize(os.path.join(entry, f))
+                    for f in os.listdir(entry))
+                r.append((os.path.getmtime(entry), size, key))
+            except OSError:     # removed by another process in the meantime
+                pass
+
+        return sorted(r)
+
+    def evict(self, keep=None):
+        """
+        Removes the least recently used pools until the cache is no larger
+        than self.size
+
+        :param keep:    key of a pool that is never removed (default: None)
+        :type keep:     str
+        """
+        entries = self.entries()
+        total = sum(e[1] for e in entries)
+
+        for used, size, key in entries:
+            if total <= self.size:
+                break
+            if key != keep:
+                shutil.rmtree(self.entry(key), ignore_errors=True)
+                total -= size
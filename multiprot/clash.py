@@ -0,0 +1,177 @@
+"""
+Scoring of the steric clashes of the models
+
+Two heavy atoms clash if they are closer than a cutoff distance, unless they
+are bonded: atoms of the same residue or of consecutive residues of a chain,
+and the SG atoms of a disulfide bridge. The close pairs of every model are
+found with a KD-tree (scipy.spatial.cKDTree), so the cost grows with the
+number of atoms and not with its square. All the conformers of an Ensemble
+share the atoms that are compared, which are only selected once. scipy is only
+imported when the first model is scored.
+
+"""
+
+import numpy as N
+
+import multiprot.ensemble as E
+from multiprot.parallel import pmap
+
+CUTOFF = 2.2    # default clash distance between heavy atoms, in A
+CA_CUTOFF = 3.0 # clash distance between CA atoms, in A
+CHUNK = 256     # conformers of an ensemble scored by a task
+
+
+def contacts(model, ca=False):
+    """
+    Atoms of a model that are compared to find clashes
+
+    :param model:   model, or topology of an ensemble
+    :type model:    PDBModel
+    :param ca:      compare only the CA atoms, e.g. of the models produced by
+                    ranch before their linkers are rebuilt (default: False)
+    :type ca:       bool
+
+    :return: indices of the heavy (or CA) atoms, and their residue index,
+             chain index and whether they are the SG atom of a cysteine
+    :type return: tuple of numpy.arrays
+    """
+    heavy = N.flatnonzero(model.maskCA() if ca else model.maskHeavy())
+    sg = N.array(model['name'])[heavy] == 'SG'
+
+    return heavy, model.resMap()[heavy], model.chainMap()[heavy], sg
+
+def count(xyz, atoms, cutoff=CUTOFF):
+    """
+    Number of clashes of a single model
+
+    :param xyz:     coordinates of the model
+    :type xyz:      numpy.array (atoms x 3)
+    :param atoms:   atoms to compare, see contacts()
+    :type atoms:    tuple
+    :param cutoff:  clash distance in A (default: CUTOFF)
+    :type cutoff:   float
+
+    :return: number of clashing pairs of atoms
+    :type return: int
+    """
+    from scipy.spatial import cKDTree
+
+    heavy, res, chain, sg = atoms
+
+    i, j = cKDTree(xyz[heavy]).query_pairs(cutoff, output_type='ndarray').T
+
+    bonded = (chain[i] == chain[j]) & (N.abs(res[i] - res[j]) <= 1)
+    bonded |= sg[i] & sg[j]
+
+    return int(N.count_nonzero(~bonded))
+
+def _count_block(shared, xyz):
+    """
+    Clashes of a block of conformers with the same atoms (see pmap)
+    """
+    atoms, cutoff = shared
+    return [count(x, atoms, cutoff) for x in xyz]
+
+def score(models, cutoff=CUTOFF, workers=1):
+    """
+    Counts the clashes of every model, and keeps them in the 'clashes' info
+    of the models
+
+    :param models:  models to score
+    :type models:   Ensemble or list of PDBModels
+    :param cutoff:  clash distance in A (default: CUTOFF)
+    :type cutoff:   float
+    :param workers: number of processes (default: 1)
+    :type workers:  int
+
+    :return: number of clashes of every model
+    :type return: numpy.array of int
+    """
+    if isinstance(models, E.Ensemble):
+        blocks = [N.array(models.xyz[start:start+CHUNK]) \
+            for start in range(0, len(models), CHUNK)]
+        r = pmap(_count_block, blocks, workers,
+            shared=(contacts(models.topology), cutoff))
+
+        r = N.array([n for block in r for n in block], int)
+        models.info['clashes'] = r
+
+        return r
+
+    r = N.array([count(m.xyz, contacts(m), cutoff) for m in models], int)
+    for m, n in zip(models, r):
+        m.info['clashes'] = int(n)
+
+    return r
+
+def gyration(xyz):
+    """
+    :param xyz: coordinates of one or more models
+    :type xyz:  numpy.array (... x atoms x 3)
+
+    :return: radius of gyration of every model
+    :type return: numpy.array (...)
+    """
+    c = xyz - xyz.mean(axis=-2, keepdims=True)
+    return N.sqrt((c**2).sum(axis=-1).mean(axis=-1))
+
+def _ca_block(shared, xyz):
+    """
+    CA clashes and radius of gyration of a block of conformers (see pmap)
+    """
+    atoms = shared
+    return [count(x, atoms, CA_CUTOFF) for x in xyz], \
+        gyration(xyz[:, atoms[0]])
+
+def rank(models, n, rg=None, workers=1):
+    """
+    Selects the best models at the CA level, before their linkers are
+    rebuilt. The models with a radius of gyration (of the CA atoms) outside
+    the window rg come last, sorted by how far they are from it, and the
+    others are sorted by their number of CA clashes (see CA_CUTOFF).
+
+    :param models:  models produced by ranch
+    :type models:   Ensemble or list of PDBModels
+    :param n:       number of models to select
+    :type n:        int
+    :param rg:      minimum and maximum radius of gyration in A
+                    (default: None, any)
+    :type rg:       tuple of float
+    :param workers: number of processes (default: 1)
+    :type workers:  int
+
+    :return: indices of the n best models, the best first
+    :type return: numpy.array of int
+    """
+    if isinstance(models, E.Ensemble):
+        blocks = [N.array(models.xyz[start:start+CHUNK]) \
+            for start in range(0, len(models), CHUNK)]
+        r = pmap(_ca_block, blocks, workers, shared=contacts(models.topology,
+            ca=True))
+    else:
+        r = [_ca_block(contacts(m, ca=True), m.xyz[None]) for m in models]
+
+    clashes = N.concatenate([block[0] for block in r])
+    radius = N.concatenate([block[1] for block in r])
+
+    off = N.zeros(len(radius))
+    if rg:
+        off = N.maximum(rg[0] - radius, 0) + N.maximum(radius - rg[1], 0)
+
+    return N.lexsort((clashes, off))[:n]
+
+def write_summary(f, names, clashes):
+    """
+    Writes the clashes of every model to a text file, one model per line
+
+    :param f:       path of the file
+    :type f:        str
+    :param names:   names of the models (e.g. their pdb files)
+    :type names:    list of str
+    :param clashes: number of clashes of every model
+    :type clashes:  list of int
+    """
+    with open(f, 'w') as fh:
+        fh.write('# model clashes\n')
+        for name, n in zip(names, clashes):
+            fh.write('%s %d\n' % (name, n))
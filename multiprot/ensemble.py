@@ -0,0 +1,287 @@
+"""
+Containers for many conformers of the same atoms
+
+An Ensemble keeps a single topology (a PDBModel) and the coordinates of all
+the conformers in one (models, atoms, 3) array, memory-mapped from a .npy
+file. A PDBModel of a conformer is only created when it is requested, so the
+memory taken by a pool grows with the coordinates only and large pools can
+stay on disk.
+
+A Pool holds the models produced by ranch, as ensembles of the full chain and
+of the modeled domains (see multiprot.ranch.extraction_plan).
+
+"""
+
+import biskit as B
+import biskit.tools as T
+import numpy as N
+import os, pickle, tempfile
+
+from multiprot.errors import *
+
+
+def _block(n, atoms, path=None):
+    """
+    Creates a memory-mapped coordinate block
+
+    :param n:       number of models
+    :type n:        int
+    :param atoms:   number of atoms
+    :type atoms:    int
+    :param path:    .npy file of the block (default: None, a temporary file
+                    that is removed once the block is no longer used)
+    :type path:     str
+
+    :return: coordinate block of shape (n, atoms, 3)
+    :type return: numpy.memmap of float32
+    """
+    if n * atoms == 0:      # empty files can not be mapped
+        return N.zeros((n, atoms, 3), N.float32)
+
+    temporary = path is None
+    if temporary:
+        fd, path = tempfile.mkstemp('.npy', 'ensemble_', T.tempDir())
+        os.close(fd)
+
+    xyz = N.lib.format.open_memmap(path, mode='w+', dtype=N.float32,
+        shape=(n, atoms, 3))
+
+    # The mapping keeps the data of the file after it is removed
+    if temporary:
+        os.remove(path)
+
+    return xyz
+
+
+class Ensemble:
+    """
+    Conformers with the same atoms, in a shared topology and a single block
+    of coordinates
+
+    Usage
+    =====
+
+    >>> ens = Ensemble.create(model, 1000)      # room for 1000 conformers
+    >>> ens[1] = other_model                    # with the atoms of model
+    >>> m = ens[1]                              # new PDBModel of conformer 1
+    >>> sub = ens[:10]                          # Ensemble of 10 conformers
+    """
+
+    def __init__(self, topology, xyz, info=None):
+        """
+        :param topology:    atoms of the conformers
+        :type topology:     PDBModel
+        :param xyz:         coordinates of the conformers
+        :type xyz:          numpy.array of shape (models, atoms, 3)
+        :param info:        values of every conformer (e.g. scores), which go
+                            to the info of its PDBModel (default: None)
+        :type info:         dict of numpy.arrays of length models
+        """
+        self.topology = topology
+        self.xyz = xyz
+        self.names = list(topology['name'])
+        self.info = info or {}
+
+    @classmethod
+    def create(cls, topology, n, path=None):
+        """
+        Creates an ensemble of n conformers on disk. The first conformer
+        takes the coordinates of topology.
+
+        :param topology:    atoms of the conformers
+        :type topology:     PDBModel
+        :param n:           number of conformers
+        :type n:            int
+        :param path:        .npy file for the coordinates (default: None, a
+                            temporary file)
+        :type path:         str
+
+        :return: ensemble
+        :type return: Ensemble
+        """
+        xyz = _block(n, len(topology), path)
+        if n:
+            xyz[0] = topology.xyz
+
+        return cls(topology.clone(), xyz)
+
+    @classmethod
+    def from_models(cls, models, path=None):
+        """
+        :param models:  conformers with the same atoms
+        :type models:   list of PDBModels
+        :param path:    .npy file for the coordinates (default: None, a
+                        temporary file)
+        :type path:     str
+
+        :return: ensemble of the models
+        :type return: Ensemble
+
+        :raise MatchError: if the models do not have the same atoms
+        """
+        r = cls.create(models[0], len(models), path)
+        for i in range(1, len(models)):
+            r[i] = models[i]
+
+        return r
+
+    @classmethod
+    def load(cls, path):
+        """
+        Maps an ensemble written by save()
+
+        :param path:    .npy file of the coordinates
+        :type path:     str
+
+        :return: ensemble, with read-only coordinates
+        :type return: Ensemble
+        """
+        with open(os.path.splitext(path)[0] + '.model', 'rb') as f:
+            topology = pickle.load(f)
+
+        return cls(topology, N.load(path, mmap_mode='r'))
+
+    def save(self, path):
+        """
+        Writes the coordinates to path (.npy) and the topology next to it,
+        with the extension .model
+
+        :param path:    .npy file for the coordinates
+        :type path:     str
+        """
+        N.save(path, self.xyz)
+        with open(os.path.splitext(path)[0] + '.model', 'wb') as f:
+            pickle.dump(self.topology, f)
+
+    def fits(self, model):
+        """
+        :return: True if model has the atoms of the ensemble
+        :type return: bool
+        """
+        return list(model['name']) == self.names
+
+    def __len__(self):
+        return len(self.xyz)
+
+    def __getitem__(self, i):
+        """
+        :return: a new PDBModel with the coordinates of conformer i, or an
+                 ensemble of the conformers in slice i (sharing this one's
+                 coordinates) or in the array of indices i (in memory)
+        :type return: PDBModel or Ensemble
+        """
+        if isinstance(i, (slice, list, N.ndarray)):
+            return self.__class__(self.topology, self.xyz[i],
+                {k: v[i] for k, v in self.info.items()})
+
+        r = self.topology.clone()
+        r.xyz = N.array(self.xyz[i])
+        r.info.update({k: v[i] for k, v in self.info.items()})
+
+        return r
+
+    def __setitem__(self, i, model):
+        """
+        Sets the coordinates of conformer i to the ones of model
+
+        :raise MatchError: if the model does not have the atoms of the ensemble
+        """
+        if not self.fits(model):
+            raise MatchError('The model does not have the atoms of the '+\
+                'ensemble.')
+
+        self.xyz[i] = model.xyz
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class Pool:
+    """
+    Models produced by ranch, as ensembles of the full chain and of the
+    modeled domains. Every element is a tuple (full, [modeled_doms],
+    out_symseq), like the ones of multiprot.ranch.extract_embedded, created
+    when it is requested.
+    """
+
+    def __init__(self, full, modeled_doms, out_symseq):
+        """
+        :param full:    full chains
+        :type full:     Ensemble
+        :param modeled_doms: for every symmetric unit, a dictionary with the
+                        ensemble of every modeled domain
+        :type modeled_doms: list of dicts
+        :param out_symseq:  sequence of the symmetric unit, or of the full
+                            chain if there is no symmetry
+        :type out_symseq:   str
+        """
+        self.full = full
+        self.modeled_doms = modeled_doms
+        self.out_symseq = out_symseq
+        self.index = None   # atoms of the ranch models taken, see set()
+        self.names = None   # atom names of the ranch models
+
+    @classmethod
+    def from_plan(cls, plan, n):
+        """
+        Creates an empty pool of n models for an extraction plan (see
+        multiprot.ranch.extraction_plan)
+
+        :return: pool, to be filled with set()
+        :type return: Pool
+        """
+        full, modeled_doms, out_symseq, index, names = plan
+
+        r = cls(Ensemble.create(full, n),
+            [{k: Ensemble.create(dom, n) for k, dom in d.items()} \
+                for d in modeled_doms], out_symseq)
+        r.index = index
+        r.names = names
+
+        return r
+
+    def ensembles(self):
+        """
+        :return: the full chains and every modeled domain, in the order of
+                 the atoms of the extraction plan
+        :type return: list of Ensembles
+        """
+        return [self.full] + [e for d in self.modeled_doms for e in d.values()]
+
+    def set(self, i, xyz):
+        """
+        Extracts the domains of model i from its coordinates, with a single
+        gather (see multiprot.ranch.extraction_plan)
+
+        :param i:   index of the model
+        :type i:    int
+        :param xyz: coordinates of the model produced by ranch
+        :type xyz:  numpy.array
+        """
+        xyz = xyz[self.index]
+
+        start = 0
+        for e in self.ensembles():
+            e.xyz[i] = xyz[start:start+len(e.names)]
+            start += len(e.names)
+
+    def __len__(self):
+        return len(self.full)
+
+    def __getitem__(self, i):
+        """
+        :return: tuple (full, [modeled_doms], out_symseq) of model i, or a
+                 pool of the models in slice i or in the array of indices i
+        :type return: tuple or Pool
+        """
+        if isinstance(i, (slice, list, N.ndarray)):
+            return self.__class__(self.full[i], [{k: e[i] for k, e in \
+                d.items()} for d in self.modeled_doms], self.out_symseq)
+
+        return (self.full[i], [{k: e[i] for k, e in d.items()} \
+            for d in self.modeled_doms], self.out_symseq)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
@@ -14,3 +14,6 @@ class MatchError(RanchError):
     """ Exception raised for errors when comparing two sequences"""
     pass
 
+class ClashError(RanchError):
+    """ Exception raised when chains modeled at the same time overlap"""
+    pass
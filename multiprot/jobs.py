@@ -0,0 +1,237 @@
+"""
+Batch mode of the multipr script
+
+A job file lists the constructs to build in a single process, so the imports
+and the parsing of the pdb files shared by the constructs (see
+multiprot.structures) are done only once. Every job has the command line
+arguments of multipr for one construct, and optionally a name:
+
+    [
+      {"name": "wt", "args": "--chain a.pdb TGTGTG b.pdb --number 10"},
+      {"name": "dimer", "args": ["--chain", "c.pdb:A", "TGTGTG", "b.pdb",
+                                 "--symmetry", "p2", "--symtemplate", "c.pdb"]},
+      "--chain a.pdb GSGSGS b.pdb"
+    ]
+
+The file is in JSON, or in YAML if its extension is .yaml or .yml (which
+needs PyYAML). The options given to multipr along with --jobs are the
+defaults of every job. A job without its own --destination writes its models
+to a sub-directory of the destination, with the name of the job.
+
+"""
+
+import concurrent.futures as F
+import json, os, shlex, time, traceback
+
+import multiprot.options as O
+import multiprot.parseChains as C
+import multiprot.builder as bu
+import multiprot.shard as SH
+from multiprot.errors import *
+
+BATCH = ('--jobs', '--job-workers')     # options of the batch itself
+
+
+def load(path):
+    """
+    Reads a job file
+
+    :param path:    path of the JSON or YAML file
+    :type path:     str
+
+    :return: (name, arguments) of every job
+    :type return: list of tuples (str, list of str)
+
+    :raise InputError: if the file is not a list of jobs
+    """
+    with open(path) as f:
+        if os.path.splitext(path)[1] in ('.yaml', '.yml'):
+            try:
+                import yaml
+            except ImportError:
+                raise InputError('PyYAML is needed to read %s.' % path)
+            jobs = yaml.safe_load(f)
+        else:
+            jobs = json.load(f)
+
+    if not isinstance(jobs, list):
+        raise InputError('%s must contain a list of jobs.' % path)
+
+    r = []
+    for i, job in enumerate(jobs):
+        if not isinstance(job, dict):
+            job = {'args': job}
+
+        args = job.get('args')
+        if isinstance(args, str):
+            args = shlex.split(args)
+        if not isinstance(args, list):
+            raise InputError('Job %d of %s has no arguments.' % (i+1, path))
+
+        r.append((str(job.get('name') or 'job%03d' % (i+1)),
+            [str(a) for a in args]))
+
+    return r
+
+def common(argv):
+    """
+    :param argv:    command line arguments of multipr in batch mode
+    :type argv:     list of str
+
+    :return: the arguments without the options of the batch, which are the
+             defaults of every job
+    :type return: list of str
+    """
+    return O.without(argv, BATCH)
+
+def build(args, registry=None, cache=None, staging=None):
+    """
+    Builds and writes the models of one construct, or of its shard if
+    --shard is given (see multiprot.shard)
+
+    :param args:    parsed arguments of multipr, see parseChains.parsing
+    :type args:     argparse.Namespace
+    :param registry:    registry of the pdb files (default: None, a new one)
+    :type registry:     multiprot.structures.StructureRegistry
+    :param cache:   cache of the model pools (default: None)
+    :type cache:    multiprot.cache.PoolCache
+    :param staging: input of ranch shared by the constructs with the same
+                    domains (default: None)
+    :type staging:  multiprot.ranch.Staging
+
+    :return: the models, and the paths of the files written
+    :type return: (Ensemble or list of PDBModels, list of str)
+    """
+    number, shard = args.number, None
+    if args.shard:
+        number = SH.part(args.number, *args.shard)[1]
+        shard = args.shard[0]
+
+    CHAINS = C.create_chains(args, registry)
+
+    build = bu.Builder(CHAINS, args.debug, number, args.destination,
+        workers=args.workers, backend=args.backend, rebuild=args.rebuild,
+        cache=cache, clashes=args.clashes, oversample=args.oversample,
+        rg=args.rg, budget=args.time_budget, staging=staging, seed=args.seed,
+        shard=shard)
+
+    models, files = [], []
+    if number:
+        models = build.run()
+        files = build.write_pdbs(models, args.destination)
+
+    if args.shard:
+        SH.write_manifest(args.destination, args.shard, args.seed,
+            args.number, files, {k: v for k, v in vars(args).items() \
+            if k not in ('shard', 'destination')})
+
+    return models, files
+
+def run_job(job, defaults, registry=None, cache=None, staging=None,
+    analyse=None):
+    """
+    Builds one job, catching its errors
+
+    :param job:         (name, arguments) of the job, see load()
+    :type job:          tuple
+    :param defaults:    arguments of every job, see common()
+    :type defaults:     list of str
+    :param analyse:     function of the models that returns a dict of
+                        values added to the report (default: None)
+    :type analyse:      function
+
+    See run_jobs() for the other parameters.
+
+    :return: report of the job, with its 'name', 'destination', whether it
+             succeeded ('ok'), the number of 'models' built, the 'files'
+             written, the 'time' it took in seconds and the 'error' if it
+             failed
+    :type return: dict
+    """
+    name, argv = job
+    r = {'name': name, 'destination': None, 'ok': False, 'models': 0,
+        'files': [], 'time': 0., 'error': None}
+    start = time.time()
+
+    try:
+        args = C.parsing(defaults + argv)
+        if not any(a in ('-d', '--destination') or \
+            a.startswith('--destination=') for a in argv):
+            args.destination = C.path_exists(os.path.join(args.destination,
+                name))
+        r['destination'] = args.destination
+
+        models, r['files'] = build(args, registry, cache, staging)
+        r['models'] = len(models)
+        if analyse is not None:
+            r.update(analyse(models))
+        r['ok'] = True
+
+    except SystemExit:      # error message already printed by argparse
+        r['error'] = 'Invalid arguments.'
+    except Exception as e:
+        traceback.print_exc()
+        r['error'] = '%s: %s' % (e.__class__.__name__, e)
+
+    r['time'] = time.time() - start
+
+    return r
+
+def run_jobs(jobs, defaults=[], workers=1, registry=None, cache=None,
+    staging=None, analyse=None):
+    """
+    Builds every job, up to 'workers' of them at the same time
+
+    :param jobs:        (name, arguments) of every job, see load()
+    :type jobs:         list of tuples
+    :param defaults:    arguments of every job, see common() (default: none)
+    :type defaults:     list of str
+    :param workers:     number of jobs built at the same time (default: 1)
+    :type workers:      int
+    :param registry:    registry of the pdb files shared by the jobs
+    :type registry:     multiprot.structures.StructureRegistry
+    :param cache:       cache of the model pools (default: None)
+    :type cache:        multiprot.cache.PoolCache
+    :param staging:     input of ranch shared by the jobs with the same
+                        domains (default: None)
+    :type staging:      multiprot.ranch.Staging
+    :param analyse:     function of the models of a job, see run_job()
+    :type analyse:      function
+
+    :return: report of every job, in the order of jobs (see run_job())
+    :type return: list of dicts
+    """
+    def run(job):
+        return run_job(job, defaults, registry, cache, staging, analyse)
+
+    if workers <= 1 or len(jobs) <= 1:
+        return [run(job) for job in jobs]
+
+    with F.ThreadPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        return list(pool.map(run, jobs))
+
+def write_report(f, reports):
+    """
+    Writes the reports of the jobs (see run_job()) to a JSON file
+    """
+    with open(f, 'w') as fh:
+        json.dump(reports, fh, indent=2)
+
+def summary(reports):
+    """
+    :return: one line for every job, and the number of jobs that failed
+    :type return: str
+    """
+    lines = []
+    for r in reports:
+        if r['ok']:
+            lines.append('%-20s ok      %5d model(s) %8.2f s  %s' % (r['name'],
+                r['models'], r['time'], r['destination']))
+        else:
+            lines.append('%-20s FAILED  %s' % (r['name'], r['error']))
+
+    failed = sum(not r['ok'] for r in reports)
+    lines.append('%d job(s) done, %d failed.' % (len(reports) - failed,
+        failed))
+
+    return '\n'.join(lines)
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Command line options of the multipr script
+
+Only argparse and os are imported here, so the script can show its help and
+reject invalid arguments before the modules that build the models (and
+biskit, numpy and scipy with them) are loaded.
+
+"""
+
+import argparse
+import os
+
+# If type=divide does not work, try action='append_const'
+
+def divide(s):
+    """
+    Converts entries for the --chain argument into tuples, and checks if PDB file
+    exists
+
+    E.g.
+    ABCD.pdb:A --> ('ABCD.pdb','A')
+    ABCD.pdb   --> ('ABCD.pdb',)
+    
+    :param s: string with one of the entries for --chain argument
+    :type s: str
+
+    """
+    r = tuple(s.split(':'))
+    # Does not work... find out why
+    # if not os.path.exists(r[0]):
+    #     raise argparse.ArgumentTypeError('Specified PDB file does not exist')
+    
+    return r
+
+
+def path_exists(s):
+    """
+    Checks if path specified for output exists
+
+    :param s: path specified for the --destination parameter
+    :type s: str
+    """
+    if not os.path.exists(s):
+        os.makedirs(s)
+    return s
+
+
+def shard(s):
+    """
+    Converts the entry of the --shard argument, e.g. 2/4, into a tuple (2, 4)
+
+    :param s: string with the number of the shard and the number of shards
+    :type s: str
+    """
+    try:
+        i, k = [int(x) for x in s.split('/')]
+    except ValueError:
+        raise argparse.ArgumentTypeError('%s is not of the form i/K' % s)
+
+    if not 1 <= i <= k:
+        raise argparse.ArgumentTypeError('%s: i must be between 1 and K' % s)
+
+    return i, k
+
+
+def length(s):
+    """
+    Converts an entry of the --sweep argument into a linker length of at
+    least one residue
+
+    :param s: string with the length
+    :type s: str
+    """
+    try:
+        r = int(s)
+    except ValueError:
+        raise argparse.ArgumentTypeError('%s is not an integer' % s)
+
+    if r < 1:
+        raise argparse.ArgumentTypeError('%s: a linker has at least one '
+            'residue' % s)
+
+    return r
+
+
+def parsing(args=None):
+    """
+    Creates the argument parser instance and applies it to the command line input
+
+    :param args:    list with the arguments to be parsed (only for testing
+                    purposes). If none is provided, it takes them from sys.argv
+    :type args:     list
+    """
+
+    # Supported symmetries for --symmetry argument
+    supp_sym = ['p'+str(i) for i in range(1,20)]
+    supp_sym += ['p'+str(i) for i in range(22,132,10)] + ['p222']
+
+    # Add positional and optional arguments
+    # NOTES: try formatter_class=argparse.MetavarTypeHelpFormatter
+    #        if no argument is given, show help (and possibly raise error)
+    #        look at customizing file parsing
+    #        look at exiting methods
+
+    parser = argparse.ArgumentParser(prog='multipr', 
+        description='''Build protein models connecting two or more structured 
+        domains with disordered linkers. Supports modelling of multiple chains 
+        and symmetry.''')
+
+    parser.add_argument('--chain', '-c', action='append', nargs='+', type=divide, 
+        help='Add a new chain to the model (required unless --jobs, --serve \
+        or --merge is given)')
+
+    # Feature not supported yet
+    # parser.add_argument('--split', '-spl', default=None, 
+    #     help='Split one or more chains from a given PDB')
+
+    parser.add_argument('--symmetry', '-sym', default='p1',
+        help='What kind of symmetry do you wish to have in your molecule. Supported\n\
+        symmetries are: p1, p2, ..., p19 (nineteen-fold), p22, p32, p42, p52, p62,\n\
+        ..., p122, p222.')  # choices=supp_sym
+
+    parser.add_argument('--symtemplate', '-t', default=[], 
+        help='Which domain will be the symmetry core, in case of symmetry other than\
+         p1 specified')
+
+    parser.add_argument('--number', '-n', default=1, type=int, help='How many \
+        models do you want to produce? (less models = faster)')
+
+    parser.add_argument('--poolsym', '-o', default='s', choices=['m', 's', 'a'], 
+        help='Specify the overall symmetry of the molecules to be produced, i.e. \
+        all symmetric [s], all asymmetric [a] or mixed. [m]')
+
+    parser.add_argument('--fixed', '-f', default=[], nargs='*',
+        help='Specify one or more domains to be fixed in their original coordinates.')
+
+    parser.add_argument('--destination', '-d', default=os.getcwd(), type=path_exists, 
+        help='Specify the directory where the output models will be saved (default cwd)')
+
+    parser.add_argument('--workers', '-w', default=1, type=int,
+        help='Number of processes used to build and rebuild the models in \
+        parallel, and of independent chains modeled at the same time \
+        (default 1)')
+
+    parser.add_argument('--backend', '-b', default='ranch',
+        choices=['ranch', 'native'], help='Program used to sample the linkers: \
+        the ranch executable [ranch] or the built-in numpy sampler [native] \
+        (default ranch)')
+
+    parser.add_argument('--rebuild', '-r', default='pulchra',
+        choices=['pulchra', 'native'], help='Program used to add the backbone \
+        and side chain atoms to the linkers: the pulchra executable [pulchra] \
+        or the built-in fragment and rotamer tables [native] (default pulchra)')
+
+    parser.add_argument('--cache', default=None, nargs='?', const='',
+        metavar='DIR', help='Keep the model pools built by ranch in a cache \
+        and reuse them for the same input. The cache is in DIR if given, or \
+        else in $MULTIPROT_CACHE or ~/.cache/multiprot')
+
+    parser.add_argument('--cache-size', default=2048, type=int, metavar='MB',
+        help='Maximum size of the cache in MB, the pools used least recently \
+        are removed beyond it (default 2048)')
+
+    parser.add_argument('--clashes', default=None, nargs='?', const=2.2,
+        type=float, metavar='CUTOFF', help='Count the clashes of the final \
+        models, i.e. the pairs of non-bonded heavy atoms closer than CUTOFF \
+        (default 2.2 A), and write them to mp_clashes.txt')
+
+    parser.add_argument('--oversample', '-k', default=1, type=int,
+        metavar='K', help='Sample K times the number of models needed for \
+        every chain and keep the best ones, with the fewest clashes of their \
+        CA atoms, before the linkers are rebuilt (default 1)')
+
+    parser.add_argument('--rg', default=None, nargs=2, type=float,
+        metavar=('MIN', 'MAX'), help='With --oversample, prefer the models \
+        with a radius of gyration of their CA atoms between MIN and MAX A')
+
+    parser.add_argument('--time-budget', default=None, type=float,
+        metavar='SECONDS', help='Stop ranch after SECONDS (shared among the \
+        chains) and continue with the models complete by then, which may be \
+        fewer than requested')
+
+    parser.add_argument('--seed', default=None, type=int, metavar='S',
+        help='Seed of the random numbers, to build the same models again \
+        with the same options')
+
+    parser.add_argument('--shard', default=None, type=shard, metavar='i/K',
+        help='Build only shard i (from 1 to K) of the models requested, with \
+        seeds derived from --seed (required) and i, and write a manifest \
+        along with the models, see multiprot.shard')
+
+    parser.add_argument('--merge', default=None, nargs='+', metavar='DIR',
+        help='Copy the models of the shards in the directories DIR to the \
+        destination, numbered after their position in the ensemble')
+
+    parser.add_argument('--jobs', default=None, metavar='FILE',
+        help='Build every construct listed in FILE (JSON, or YAML with the \
+        .yaml extension) in a single process, see multiprot.jobs. The other \
+        options are the defaults of every job')
+
+    parser.add_argument('--job-workers', default=1, type=int, metavar='N',
+        help='Number of jobs of --jobs, --sweep or --serve built at the same \
+        time (default 1)')
+
+    parser.add_argument('--sweep', default=None, nargs='+', type=length,
+        metavar='LENGTH', help='Build a variant of the construct for every \
+        linker length and unit of --sweep-units, with all its linkers \
+        replaced, and write the statistics of every variant to sweep.txt, \
+        see multiprot.sweep')
+
+    parser.add_argument('--sweep-units', default=['TG', 'GS', 'EAAAK'],
+        nargs='+', metavar='UNIT', help='Sequence units repeated in the \
+        linkers of --sweep (default TG GS EAAAK)')
+
+    parser.add_argument('--serve', default=None, metavar='SOCKET',
+        help='Keep running and build the constructs submitted with --server \
+        to the Unix socket SOCKET, reusing the parsed pdb files and the model \
+        pools between them, see multiprot.server. The other options are the \
+        defaults of every construct')
+
+    parser.add_argument('--server', default=None, metavar='SOCKET',
+        help='Build the construct with the multipr --serve process listening \
+        on SOCKET, instead of starting a new one')
+
+    parser.add_argument('--trace', default=None, metavar='FILE',
+        help='Record the time and memory of every stage of the modeling \
+        (ranch, pulchra, the steps of the builder), write them to FILE in the \
+        trace event format of Chrome and print a summary of every stage at \
+        the end, see multiprot.trace')
+
+    parser.add_argument('--debug', action='store_true')
+
+    # parser.add_argument('args', nargs=argparse.REMAINDER, help="Additional key=value\
+    #      parameters are passed on to 'Executor.__init__'. For example:\n\
+    #         debug   - 0|1, keep all temporary files (default: 0)")
+
+    #argument_default = argparse.SUPPRESS
+
+    r = parser.parse_args(args)
+    if not r.chain and not r.jobs and not r.serve and not r.merge:
+        parser.error('the following arguments are required: --chain/-c')
+    if r.shard and r.seed is None:
+        parser.error('--shard requires --seed')
+
+    return r
+    # vars(args)  returns dictionary with attributes
+
+
+def without(argv, options):
+    """
+    :param argv:    command line arguments of multipr
+    :type argv:     list of str
+    :param options: options to remove, along with their values (up to the
+                    next option)
+    :type options:  tuple of str
+
+    :return: the arguments without those options
+    :type return: list of str
+    """
+    r = []
+    skip = False
+    for a in argv:
+        if a.startswith('-'):
+            skip = a in options
+            if skip or a.split('=')[0] in options:
+                continue
+        if not skip:
+            r.append(a)
+
+    return r
@@ -0,0 +1,80 @@
+"""
+Helpers to distribute independent pieces of work (e.g. the post-processing of
+every conformer produced by ranch) over a pool of processes
+
+"""
+
+import concurrent.futures as F
+import multiprocessing as MP
+import multiprot.trace as TR
+
+# Start method of the worker processes. pmap is also called from threads
+# (sibling chains, jobs of a batch or of a server), and forking a process with
+# several threads may deadlock, so the workers are started by a fork server,
+# or spawned where there is none
+CONTEXT = 'forkserver' if 'forkserver' in MP.get_all_start_methods() \
+    else 'spawn'
+
+# Data shared by every task of the pool, set once per worker process
+_shared = None
+
+def _init_worker(shared, trace=False):
+    """
+    Initializer of the worker processes. Keeps the shared data as a module
+    variable, so it is only sent once to every worker instead of once per task
+    """
+    global _shared
+    _shared = shared
+
+    # Workers start without the spans of the main process, also if forked
+    TR.drain()
+    TR.enable(trace)
+
+def _call(task):
+    """
+    Runs a single task in a worker process
+
+    :return: result of the task, and the spans it recorded (see
+             multiprot.trace)
+    :type return: (any, list of dicts)
+    """
+    func, item = task
+    return func(_shared, item), TR.drain()
+
+def pmap(func, items, workers=1, shared=None, context=CONTEXT):
+    """
+    Applies func(shared, item) to every element of items and returns the
+    results in the same order as items
+
+    With a single worker (or a single item) the tasks run in the current
+    process, otherwise they are fanned out to a pool of 'workers' processes.
+
+    :param func:    function to apply. It has to be defined at module level so
+                    it can be sent to the worker processes
+    :type func:     function
+    :param items:   elements to process
+    :type items:    iterable
+    :param workers: maximum number of worker processes (default: 1)
+    :type workers:  int
+    :param shared:  data needed by every task, passed as first argument of func
+    :type shared:   any picklable object
+    :param context: start method of the worker processes (default: CONTEXT)
+    :type context:  str
+
+    :return: results of func for every item
+    :type return: list
+    """
+    items = list(items)
+
+    if workers <= 1 or len(items) <= 1:
+        return [func(shared, item) for item in items]
+
+    with F.ProcessPoolExecutor(max_workers=min(workers, len(items)),
+        mp_context=MP.get_context(context), initializer=_init_worker,
+        initargs=(shared, TR.enabled())) as pool:
+        results = list(pool.map(_call, [(func, item) for item in items]))
+
+    for r, spans in results:
+        TR.extend(spans)
+
+    return [r for r, spans in results]
@@ -15,6 +15,7 @@ from biskit.exe.executor import Executor
 import os, tempfile
 import biskit.tools as T
 from multiprot.errors import *
+import multiprot.trace as TR
 
 class Pulchra(Executor):
     """
@@ -66,6 +67,14 @@ class Pulchra(Executor):
         super().__init__('pulchra', tempdir=tempdir, configpath=self.configpath,
             args=pdb_path, **kw)
 
+    @TR.traced('pulchra.run')
+    def run(self, inp_mirror=None):
+        """
+        Overrides Executor method, to record the time of pulchra (see
+        multiprot.trace)
+        """
+        return super().run(inp_mirror)
+
     def finish(self):
         """
         Overrides Executor method
@@ -82,40 +91,3 @@ class Pulchra(Executor):
         """
         if not self.debug:
             T.tryRemove(self.tempdir, tree=True)
-
-
-
-#############
-##  TESTING        
-#############
-import multiprot.testing as testing
-
-class TestPulchra(testing.AutoTest):
-    """
-    Test class
-    """
-
-    TAGS = [testing.EXE]
-
-    testpdb = None
-
-    def setUp(self):
-        self.testpdb =  self.testpdb or \
-            os.path.join(os.path.abspath(os.path.dirname(__file__)), 
-                'testdata/2z6o.pdb')
-
-    def test_rebuiltFile(self):
-        """
-        Test to confirm that .rebuilt.pdb file was created after running pulchra
-        """
-        pdb = B.PDBModel(self.testpdb)
-        
-        call = Pulchra(pdb)
-        rebuilt = call.run()
-        
-        self.assertTrue(isinstance(rebuilt,B.PDBModel))
-
-
-if __name__ == '__main__':
-
-    testing.localTest(debug=False)
@@ -25,12 +25,18 @@ Calling and running this wrapper returns a tuple of the form
 
 import biskit as B
 import numpy as N
-import tempfile, os, time
-import re
-import subprocess
+import copy, tempfile, os, time, shutil
+import subprocess, threading
 
-from operator import itemgetter
 from multiprot.errors import *
+from multiprot.parallel import pmap
+import multiprot.watch as W
+import multiprot.cache as C
+import multiprot.reader as RD
+import multiprot.ensemble as E
+import multiprot.assembly as A
+import multiprot.trace as TR
+import multiprot.shard as SH
 from biskit.exe.executor import Executor
 
 import biskit.tools as T
@@ -50,10 +56,12 @@ def embed(dom, to_embed):
     :type int_dom: PDBModel
     """
 
-    first = dom.take(dom.res2atomIndices([0,1]))
-    last = dom.take(dom.res2atomIndices(list(range(2,dom.lenResidues()))))
+    r = A.Assembly()
+    r.addResidues(dom, [0,1])
+    r.add(to_embed)
+    r.addResidues(dom, range(2,dom.lenResidues()))
 
-    return first.concat(to_embed,last)
+    return r.build(chainIds=False, serials=False)
 
 def extract_embedded(full, embedded):
     """
@@ -80,7 +88,7 @@ def extract_embedded(full, embedded):
     :type modeled_doms: list of dictionaries
     """
 
-    r = B.PDBModel()
+    r = []         # Atoms and restored profiles of each embedded domain
     emb_ind = []   # List for start and end indexes for each embedded domain
     
     # Create dictionary for domains that were modeled
@@ -108,48 +116,41 @@ def extract_embedded(full, embedded):
         if full.sequence()[i_start:i_end] == dom.sequence() and \
             m_seq == m.sequence():
             
-            emb = full.takeResidues(list(range(i_start, i_end)))
-            # Restore chain ids and residue numbers
-            assert emb.sequence()==dom.sequence()
+            emb = full.res2atomIndices(list(range(i_start, i_end)))
             assert len(emb)==len(dom), str(len(emb))+', '+str(len(dom))
-            emb.atoms['chain_id'] = dom.atoms['chain_id']
-            emb.atoms['residue_number'] = dom.atoms['residue_number']   
-
-            m_new = full.takeResidues(list(range(*m_first))).concat(
-                full.takeResidues(list(range(*m_last))), newChain=False)
-            m_new.atoms['chain_id'] = m.atoms['chain_id']
-            m_new.atoms['residue_number'] = m.atoms['residue_number']
-            m_new = m_new.concat(emb)
-            modeled_doms[key] = m_new
+            # Restore chain ids and residue numbers (dom may have more than
+            # one chain)
+            restore = {'chain_id': dom.atoms['chain_id'],
+                'residue_number': dom.atoms['residue_number']}
+
+            m_new = A.Assembly()
+            m_new.addResidues(full, list(range(*m_first)) + \
+                list(range(*m_last)), split=False, chain_id=m.atoms['chain_id'],
+                residue_number=m.atoms['residue_number'])
+            m_new.add(full, emb, **restore)
+            modeled_doms[key] = m_new.build(chainIds=False, serials=False)
             
-            r = r.concat(emb)
+            r.append((emb, restore))
             
             emb_ind.append((i_start, i_end))
         else:
             raise MatchError('The sequence from the domain to exctract does not \
                 match the sequence in the full domain with the specified indices')
 
-    # Sort the list to remove the atoms from highest to lowest index,
-    # so the indexes won't be affected
-    emb_ind = sorted(emb_ind, key=itemgetter(0), reverse=True)
-
     # Remove the embedded domains from full
+    keep = N.ones(len(full), bool)
     for i_start, i_end in emb_ind:
-        atomi_start = full.resIndex()[i_start]
-        atomi_end = full.resIndex()[i_end]
-        full.remove(list(range(atomi_start, atomi_end)))
-
-    # Concat the original chain that previously contained the embedded domains
-    for i in range(full.lenChains()-1):
-        full.mergeChains(0)
-
-    full.renumberResidues()     # Renumber amino acids
-    full = full.concat(r)       # Combine full and r
-    full.addChainId()           # Add chain IDs with consecutive letters
-                                # NOTE: add feature for personalized chain names
-
-    # Renumber atoms
-    full['serial_number'] = N.arange(1,len(full)+1)
+        keep[full.resIndex()[i_start]:full.resIndex()[i_end]] = False
+
+    # The original chain that previously contained the embedded domains, as a
+    # single chain with renumbered amino acids, followed by the domains. The
+    # chain IDs are consecutive letters and the atoms are renumbered.
+    # NOTE: add feature for personalized chain names
+    full_r = A.Assembly()
+    full_r.add(full, N.flatnonzero(keep), split=False, renumber=True)
+    for emb, restore in r:
+        full_r.add(full, emb, **restore)
+    full = full_r.build()
 
     out_symseq = full.sequence()
 
@@ -180,26 +181,25 @@ def extract_symmetric(full, symseq, embedded):
     symunits = []
     modeled_doms = []
 
-    if re.search(symseq, full.sequence()):
+    # The symmetric units follow each other, with len(symseq) residues each
+    l = len(symseq)
+    n = full.lenResidues() // l
 
-        matches = re.finditer(symseq, full.sequence())
+    if n and full.sequence() == symseq * n:
 
-        for match in matches:
-            istart, iend = match.span()
-            symunit = full.takeResidues(list(range(istart, iend)))
+        for istart in range(0, n*l, l):
+            symunit = full.takeResidues(N.arange(istart, istart + l))
             # Extract embedded domains one symunit at a time
             extracted = extract_embedded(symunit, embedded)
             symunits.append(extracted[0])
             modeled_doms.append(extracted[1][0])
 
-        r = symunits[0]
-        out_symseq = r.sequence()
-
-        for i in range(1,len(symunits)):
-            r = r.concat(symunits[i])
+        out_symseq = symunits[0].sequence()
 
-        r.addChainId()
-        r['serial_number'] = N.arange(1,len(r)+1)
+        r = A.Assembly()
+        for symunit in symunits:
+            r.add(symunit)
+        r = r.build()
 
     else:
         raise MatchError("Symseq could not be found inside the full domain")
@@ -207,6 +207,120 @@ def extract_symmetric(full, symseq, embedded):
     return r, modeled_doms, out_symseq
 
 
+def extraction_plan(model, embedded, symseq=None):
+    """
+    Extracts the embedded domains from one model of a pool, keeping track of
+    the atom of the model that every extracted atom comes from. All the models
+    of a pool have the same atoms, so the result can be reused for the other
+    models by only gathering their coordinates (see multiprot.ensemble.Pool).
+
+    :param model:   model produced by ranch
+    :type model:    PDBModel
+    :param embedded: dictionary with embedded domains and its position (index)
+                     in the full sequence
+    :type embedded: dictionary
+    :param symseq:  sequence of the symmetric unit, None if there is no
+                    symmetry (default: None)
+    :type symseq:   str
+
+    :return: tuple (full, [modeled_doms], out_symseq, index, names), where
+             full and modeled_doms are the domains extracted from model,
+             index has the atom indices in model of all their atoms, in that
+             order, and names are the atom names of model
+    :type return: tuple
+    """
+    m = model.clone()
+    m['ranch_index'] = N.arange(len(m))
+
+    if symseq:
+        full, modeled_doms, out_symseq = extract_symmetric(m, symseq, embedded)
+    else:
+        full, modeled_doms, out_symseq = extract_embedded(m, embedded)
+
+    parts = [full] + [dom for d in modeled_doms for dom in d.values()]
+    index = N.concatenate([p['ranch_index'] for p in parts])
+    for p in parts:
+        p.atoms.remove('ranch_index')
+
+    return full, modeled_doms, out_symseq, index, list(model.atoms['name'])
+
+def _extract_model(shared, f_model):
+    """
+    Reads one model produced by ranch and extracts the embedded domains from
+    it. Used to post-process the models in a pool of processes.
+
+    :param shared:  tuple (embedded, symseq) where symseq is None if there is
+                    no symmetry
+    :type shared:   tuple
+    :param f_model: path to the pdb file of the model, or the model itself
+    :type f_model:  str or PDBModel
+
+    :return: tuple (full, [modeled_doms], out_symseq), see extract_embedded
+    :type return: tuple
+    """
+    embedded, symseq = shared
+
+    if symseq:
+        return extract_symmetric(B.PDBModel(f_model), symseq, embedded)
+
+    return extract_embedded(B.PDBModel(f_model), embedded)
+
+
+class Staging:
+    """
+    Input of ranch shared by the calls with the same domains, e.g. the
+    variants of the linkers of a sweep (see multiprot.sweep): every domain is
+    only embedded into its chain (see embed) and written to a pdb file once.
+    Can be shared by several threads.
+
+    Usage
+    =====
+
+    >>> staging = Staging(tempdir)
+    >>> call = Ranch(dom1, linker, dom2, staging=staging)
+    """
+
+    def __init__(self, path):
+        """
+        :param path:    directory of the pdb files of the domains
+        :type path:     str
+        """
+        self.path = path
+        self.embedded = {}  # (key of dom, key of to_embed) : embedded model
+        self.lock = threading.Lock()
+
+    def embed(self, dom, to_embed):
+        """
+        :return: new copy of dom with to_embed embedded, see embed()
+        :type return: PDBModel
+        """
+        key = (C.model_key(dom), C.model_key(to_embed))
+        with self.lock:
+            if key not in self.embedded:
+                self.embedded[key] = embed(dom, to_embed)
+            m = self.embedded[key]
+
+        return m.clone()
+
+    def write(self, dom, i):
+        """
+        :param dom: domain given to ranch
+        :type dom:  PDBModel
+        :param i:   position of the domain among the ones given to ranch
+        :type i:    int
+
+        :return: path of the pdb file of the domain, written by the first call
+        :type return: str
+        """
+        f = os.path.join(self.path, '%d_%s.pdb' % (i, C.model_key(dom)))
+        with self.lock:
+            if not os.path.exists(f):
+                dom.writePdb(f + '.tmp')
+                os.replace(f + '.tmp', f)
+
+        return f
+
+
 class Ranch(Executor):
 
     """
@@ -226,9 +340,11 @@ class Ranch(Executor):
 
     """
 
+    SPAN = 3.8      # maximum distance between consecutive CA atoms, in A
 
     def __init__(self, *domains, chains={}, symmetry='p1', symtemplate=None, 
-        symunit=None, pool_sym='m', fixed=[], n=10, **kw):
+        symunit=None, pool_sym='m', fixed=[], n=10, workers=1, seed=None,
+        cache=None, deadline=None, staging=None, **kw):
         
         """
         Creates the variables that Ranch needs to run
@@ -287,6 +403,31 @@ class Ranch(Executor):
         :param n: Number of models to be generated (let's say from 10 to 15,000,
                   though I'm not sure about the actual maximum for ranch)
         :type n:    Integer
+        :param workers: Number of processes used to extract the embedded domains
+                        from the models produced by ranch (default: 1). It is
+                        also the number of ranch processes among which the
+                        models are split, as long as each of them builds at
+                        least 10 models
+        :type workers:  Integer
+        :param seed:    Seed of the random number generator of ranch. With
+                        more than one process, every ranch process has its own
+                        seed derived from seed and its index (see
+                        multiprot.shard.seed), and a random seed is drawn if
+                        none is given (default: None)
+        :type seed:     Integer
+        :param cache:   cache of model pools. The models are taken from it if
+                        it has enough of them for the same input, and ranch
+                        only builds the missing ones otherwise. All the models
+                        built by ranch are added to it (default: None)
+        :type cache:    multiprot.cache.PoolCache
+        :param deadline:    time (see time.time()) at which ranch is stopped,
+                            keeping the models that are complete by then,
+                            which may be fewer than n (default: None, no
+                            limit)
+        :type deadline:     float
+        :param staging: input shared with other calls with the same domains
+                        (default: None, made for this call only)
+        :type staging:  Staging
         :param kw:  additional key=value parameters are passed on to
                     'Executor.__init__'. For example:
                     ::
@@ -311,6 +452,29 @@ class Ranch(Executor):
         self.dir_models = tempfile.mkdtemp( '', 'models_', tempdir )
 
         self.f_seq = os.path.join(tempdir, 'sequence.seq')
+        self.m_paths = None     # models kept when ranch is stopped early
+        self.seed = seed
+        self.cache = cache
+        self.cached = []        # models taken from the cache
+        self.deadline = deadline
+
+        self._init_input(domains, chains, symmetry, symtemplate, symunit,
+            pool_sym, fixed, n, workers, staging)
+
+        # Path for config file
+        self.configpath = [os.path.join(os.path.abspath(
+            os.path.dirname(__file__)), 'exeConfig/')]
+
+        super().__init__('ranch', tempdir=tempdir, cwd=tempdir,
+            configpath=self.configpath, **kw)
+
+    def _init_input(self, domains, chains, symmetry, symtemplate, symunit,
+        pool_sym, fixed, n, workers, staging=None):
+        """
+        Creates the variables describing the chain to be modeled (see
+        __init__ for the parameters). Shared with the native sampler, which
+        uses the same input but does not run ranch.
+        """
 
         self.n = n              # Number of models for the user
         if self.n >= 10:
@@ -318,6 +482,9 @@ class Ranch(Executor):
         else:
             self.rn = 10
 
+        self.workers = workers
+        self.staging = staging
+
         self.domains = domains
         self.chains = chains
         self.sequence = ''
@@ -327,6 +494,8 @@ class Ranch(Executor):
         self.pdbs_in = []    # list of pdb file paths
         self.embedded = {}   # dictionary with domain : residue number to
                                     # identify and locate embedded domains
+        self.layout = {}     # element index : residue range in the chain
+                                    # without the embedded domains
 
         self.pool_sym = pool_sym
 
@@ -345,13 +514,6 @@ class Ranch(Executor):
                 # Action: take symunit from symtemplate
                 self.symunit = symtemplate.takeChains([0]).sequence()
 
-        # Path for config file
-        self.configpath = [os.path.join(os.path.abspath(
-            os.path.dirname(__file__)), 'exeConfig/')]
-
-        super().__init__('ranch', tempdir=tempdir, cwd=tempdir,
-            configpath=self.configpath, **kw)
-
     def _setup(self):
         """
         - Creates the sequence from the domains and linkers
@@ -364,12 +526,14 @@ class Ranch(Executor):
         ## NOTE: The numbers are references to the steps in DIAGRAM.png
 
         i = 0   # Counter for domain position. Counts only PDBModels
+        pos = 0 # Residues of the chain without the embedded domains
         for k in range(len(self.domains)):
             element = self.domains[k]
             
             if isinstance(element, str):    # 1
                 # If is sequence, add to sequence and continue
                 self.sequence += element
+                length = len(element)
 
             elif isinstance(element, B.PDBModel):
                 # if is PDBModel
@@ -388,6 +552,7 @@ class Ranch(Executor):
 
                     self.sequence += self.symunit
                     self.doms_in.append(element)
+                    length = len(self.symunit)
 
                 elif element.lenChains()==1:
                     # If is single chain-domain, 
@@ -404,6 +569,7 @@ class Ranch(Executor):
                     # Conserve fixing
                     self.sequence += element.sequence()
                     self.doms_in.append(element)
+                    length = element.lenResidues()
 
                 else:
                     # Not modeled, and paired with another domain
@@ -441,7 +607,7 @@ class Ranch(Executor):
 
                         m = element.takeChains([chain_ind])
                         to_embed = extract_fixed(m, element)
-                        m_emb = embed(m, to_embed)
+                        m_emb = self.embed(m, to_embed)
 
                         # CHANGE
                         self.embedded[to_embed] = (len(self.sequence) + 2, 
@@ -450,6 +616,7 @@ class Ranch(Executor):
                         self.sequence += m_emb.sequence()
                         self.doms_in.append(m_emb)
 
+                        self.layout[k] = (pos, pos + m.lenResidues())
                         break
 
                     else: 
@@ -477,7 +644,7 @@ class Ranch(Executor):
                         to_take = list(range(element.lenChains()))
                         to_take.remove(chain_ind)
                         to_embed = element.takeChains(to_take)
-                        m_emb = embed(m, to_embed)
+                        m_emb = self.embed(m, to_embed)
                         
                         # self.embedded = {dom:(i, m, k),...}
                         # where dom is the embedded domain, i is the place where
@@ -488,6 +655,7 @@ class Ranch(Executor):
 
                         self.sequence += m_emb.sequence()
                         self.doms_in.append(m_emb)
+                        length = m.lenResidues()
 
                 i += 1
 
@@ -497,15 +665,123 @@ class Ranch(Executor):
                 raise InputError(
                     'The *domains arguments must be either strings or PDBModels.')
 
+            self.layout[k] = (pos, pos + length)
+            pos += length
+
 
         # Symseq is the sequence that will be multiplied in the symmetric 
         # structure ... TO BE PASSED ON TO HIGHER SCRIPT
         if self.symtemplate:
             self.symseq = self.sequence
 
+        self.check_fixed()
+
         return None
 
+    def embed(self, dom, to_embed):
+        """
+        Embeds to_embed into dom (see embed), only once for all the calls that
+        share the staging
+        """
+        if self.staging is not None:
+            return self.staging.embed(dom, to_embed)
+
+        return embed(dom, to_embed)
+
+    def anchors(self, dom):
+        """
+        :param dom: one of the domains given to ranch (self.doms_in)
+        :type dom:  PDBModel
+
+        :return: coordinates of the CA atoms of the first and last residues of
+                 the domain in the chain (those of the first symmetric unit
+                 for the symtemplate)
+        :type return: tuple of numpy.arrays
+        """
+        last = (len(self.symunit) if dom is self.symtemplate else \
+            dom.lenResidues()) - 1
+
+        resmap = dom.resMap()
+        ca = dom.maskCA()
+
+        def atom(r):
+            i = N.flatnonzero(ca & (resmap == r))
+            return dom.xyz[i[0] if len(i) else dom.resIndex()[r]]
+
+        return atom(0), atom(last)
+
+    def check_fixed(self):
+        """
+        Checks that consecutive fixed domains can be connected by what is
+        between them, before ranch is run. The chain between the last residue
+        of a fixed domain and the first residue of the next one spans at most
+        SPAN A per CA-CA bond, plus the distance between the ends of every
+        domain that is not fixed.
+
+        :raise InputError: if two consecutive fixed domains are too far apart,
+                           with an estimate of the minimum length of the
+                           linkers between them
+        """
+        i = 0           # index of the domain in self.doms_in
+        prev = None     # (element, last CA) of the previous fixed domain
+        bonds = 0       # CA-CA bonds since prev
+        spans = 0.      # lengths of the domains since prev, in A
+        linker = 0      # residues of the linkers since prev
+
+        for element in self.domains:
+            if isinstance(element, str):
+                bonds += len(element)
+                linker += len(element)
+                continue
+
+            if i >= len(self.doms_in):
+                break
+
+            dom = self.doms_in[i]
+            first, last = self.anchors(dom)
+            bonds += 1
+
+            if self.fixed[i] == 'no':
+                spans += N.linalg.norm(last - first)
+
+            else:
+                if prev is not None:
+                    d = N.linalg.norm(first - prev[1])
+                    reach = self.SPAN * bonds + spans
+
+                    if d > reach:
+                        # Linker residues needed, with the same domains
+                        needed = int(N.ceil((d - spans) / self.SPAN)) - \
+                            (bonds - linker)
+                        raise InputError(('The fixed domains %s and %s are '+\
+                            '%.1f A apart, but the %d linker residues between '+\
+                            'them can only span %.1f A. The linkers between '+\
+                            'them need at least %d residues in total.') % (
+                            self.name(prev[0]), self.name(element), d, linker,
+                            reach, needed))
+
+                prev = (element, last)
+                bonds, spans, linker = 0, 0., 0
+
+            i += 1
+
+    def name(self, element):
+        """
+        :param element: domain of the chain (one of self.domains)
+        :type element:  PDBModel
+
+        :return: name of the pdb file of the domain, or its position among the
+                 elements of the chain
+        :type return: str
+        """
+        if element.validSource() is not None:
+            return os.path.basename(element.sourceFile())
+
+        k = [e is element for e in self.domains].index(True)
+        return 'number %d' % (k + 1)
+
 
+    @TR.traced('ranch.prepare')
     def prepare(self):
         """
         Overrides Executor method.
@@ -519,6 +795,10 @@ class Ranch(Executor):
 
         # Write pdb files
         for i in range(len(self.doms_in)):
+            if self.staging is not None:
+                self.pdbs_in.append(self.staging.write(self.doms_in[i], i))
+                continue
+
             pdb_name = os.path.join(self.tempdir, str(i)+'_')
             if self.doms_in[i].validSource() is None: 
                 # If it was a pdb created 'de novo'
@@ -534,22 +814,106 @@ class Ranch(Executor):
         with open(self.f_seq, 'w') as f:
             f.write(self.sequence)
 
-        # Generate n models with no intensities
-        self.args = self.f_seq + ' -q=%s -i' % self.rn
+        # Options that define the models, besides the input files
+        options = ' -i'     # no intensities
 
         if self.symtemplate:
-            self.args = self.args + ' -s=%s -y=%s' % (self.symmetry, 
-                self.pool_sym)
+            options = options + ' -s=%s -y=%s' % (self.symmetry, self.pool_sym)
 
-        self.args = self.args + ' -x=%s' * len(self.pdbs_in) % tuple(self.pdbs_in)
+        fixing = ' -f=%s' * len(self.fixed) % tuple(self.fixed)
 
-        self.args = self.args + ' -f=%s' * len(self.fixed) % tuple(self.fixed)
+        fixing = fixing + ' -o=%s' * len(self.multich) % tuple(self.multich)
 
-        self.args = self.args + ' -o=%s' * len(self.multich) % tuple(self.multich)
+        self.options = options
+        self.fixing = fixing
 
-        self.args = self.args + ' -w=%s' % self.dir_models
+        if self.cache is not None:
+            self.use_cache(options + fixing)
 
-        
+        # Generate n models, with the seed of the shards if there are several
+        self.shards = self.split()
+        seed = self.seed if len(self.shards) == 1 else None
+        self.args = ' '.join(self.ranch_args(self.rn, self.dir_models, seed))
+
+    def ranch_args(self, q, dir_models, seed=None):
+        """
+        :param q:       number of models
+        :type q:        int
+        :param dir_models:  directory of the models
+        :type dir_models:   str
+        :param seed:    seed of ranch (default: None, no seed)
+        :type seed:     int
+
+        :return: arguments of a ranch process that builds q models into
+                 dir_models
+        :type return: list of str
+        """
+        args = [self.f_seq, '-q=%s' % q] + self.options.split()
+        args += ['-x=%s' % f for f in self.pdbs_in]
+        args += self.fixing.split()
+        args += ['-w=%s' % dir_models]
+
+        if seed is not None:
+            args.append('--seed=%s' % seed)
+
+        return args
+
+    def use_cache(self, options):
+        """
+        Takes the models already in the cache for the same sequence, domains,
+        options and seed, and sets self.rn to the number of models that ranch
+        still has to build (0 if the cache has all of them, otherwise at
+        least 10). With a seed, ranch runs with a seed derived from it and
+        the number of cached models (see multiprot.shard.seed), so it builds
+        new models instead of the cached ones again.
+
+        :param options: ranch options that define the models, without paths
+                        and number of models
+        :type options:  str
+        """
+        self.key = C.pool_key(self.sequence, self.doms_in,
+            options + ' --seed=%s' % self.seed)
+        self.cached = self.cache.get(self.key, self.n)
+
+        missing = self.n - len(self.cached)
+        self.rn = max(10, missing) if missing > 0 else 0
+
+        if self.cached and self.seed is not None:
+            self.seed = SH.seed(self.seed, len(self.cached))
+
+    def execute(self, inp=None):
+        """
+        Overrides Executor method, to run ranch only if the cache does not
+        have all the models already. The models built by ranch are added to
+        the cache, and the models of the result are the cached ones followed
+        by the new ones.
+
+        :return: execution time in seconds
+        :rtype: float
+        """
+        start_time = time.time()
+
+        if self.rn:
+            super().execute(inp=inp)
+
+        if self.cache is None:
+            return time.time() - start_time
+
+        new = W.ready(self.dir_models, self.rn, running=False)
+        if new:
+            self.cache.add(self.key, new)
+
+        # Copy the cached models, which may be evicted by other processes
+        paths = []
+        for i, f in enumerate(self.cached):
+            paths.append(os.path.join(self.dir_models, 'cached_%05d.pdb' % i))
+            shutil.copyfile(f, paths[-1])
+
+        self.m_paths = paths + new[:self.n - len(paths)]
+
+        return time.time() - start_time
+
+    @TR.traced('ranch.communicate')
     def communicate( self, cmd, inp, bufsize=-1, executable=None,
                      stdin=None, stdout=None, stderr=None,
                      shell=0, env=None, cwd=None ):
@@ -589,6 +953,11 @@ class Ranch(Executor):
         
         :raise RunError: if OSError occurs during Popen or Popen.communicate
         """
+        if len(self.shards) > 1:
+            return self.communicate_shards( cmd, inp, bufsize=bufsize,
+                executable=executable, stdin=stdin, stdout=stdout,
+                stderr=stderr, shell=shell, env=env )
+
         try:
             p = subprocess.Popen( cmd.split(),
                                   bufsize=bufsize, executable=executable,
@@ -601,35 +970,179 @@ class Ranch(Executor):
 
             self.pid = p.pid
 
-            if self.n < 10:     # if ranch has to be stopped prematurely
-                output, error = p.communicate( input=inp, timeout=0.5 )
+            # if ranch has to be stopped prematurely. With a cache every
+            # model is kept for later
+            stopped = False
+            if self.n < 10 and self.cache is None or \
+                self.deadline is not None:
+                output, error, stopped = self.stop_early( p, inp )
             
             else:
                 output, error = p.communicate( input=inp )
             
-            self.returncode = p.returncode
+            # ranch stopped on purpose did not fail
+            self.returncode = 0 if stopped else p.returncode
 
         except OSError as e:
             raise RunError("Couldn't run or communicate with external program: %r"\
                   % e.strerror)
 
-        except subprocess.TimeoutExpired:
-            # if the number of models requested by the user is less than 10,
-            # check self.dir_models every 0.5 seconds until the models are 
-            # produced by ranch, then kill process
+        return output, error
+
+    def split(self):
+        """
+        Splits the self.rn models among ranch processes, one for each worker,
+        as long as every process builds at least 10 models (the minimum for
+        ranch)
+
+        Every process (shard) has its own working directory, models directory
+        and seed, derived from self.seed and its index. With a single process
+        the models are built in self.cwd and self.dir_models as usual.
+
+        :return: (number of models, working directory, models directory, seed)
+                 for every shard
+        :type return: list of tuples
+        """
+        k = max(1, min(self.workers, self.rn // 10))
 
-            m_paths = [os.path.join(self.dir_models, f) for f in os.listdir(
-                self.dir_models)]
+        seed = self.seed
+        if seed is None and k > 1:
+            seed = int(N.random.randint(0, 2**30))
 
-            while len(os.listdir(self.dir_models)) < self.n:
-                time.sleep(0.5)
+        if k == 1:
+            return [(self.rn, self.cwd, self.dir_models, seed)]
 
-            time.sleep(0.5) # wait for extra 0.5s to avoid the strange error
-            p.kill()
-            output, error = p.communicate()
+        shards = []
+        for i in range(k):
+            q = self.rn // k + (i < self.rn % k)
+            cwd = tempfile.mkdtemp('', 'shard%02d_' % i, self.tempdir)
+            dir_models = tempfile.mkdtemp('', 'models_', cwd)
+            shards.append((q, cwd, dir_models, SH.seed(seed, i)))
+
+        return shards
+
+    def shard_command(self, shard):
+        """
+        :param shard:   (number of models, working directory, models
+                        directory, seed), see split()
+        :type shard:    tuple
+
+        :return: command of the ranch process of the shard, built like the
+                 command of a single process (see Executor.command) with the
+                 arguments of the shard
+        :type return: str
+        """
+        q, cwd, dir_models, seed = shard
+
+        call = copy.copy(self)
+        call.args = ' '.join(self.ranch_args(q, dir_models, seed))
+
+        return call.command()
+
+    @TR.traced('ranch.communicate_shards')
+    def communicate_shards( self, cmd, inp, bufsize=-1, executable=None,
+                     stdin=None, stdout=None, stderr=None, shell=0, env=None ):
+        """
+        Runs one ranch process for every shard (see split()) at the same time,
+        and moves all of the models into self.dir_models once they are done.
+        The models of every shard keep their order, after the ones of the
+        previous shards.
+
+        See communicate() for the parameters
+
+        :return: output and error output of all the processes
+        :rtype: str, str
+        """
+        procs = []
+        try:
+            for shard in self.shards:
+                procs.append( subprocess.Popen(
+                    self.shard_command(shard).split(),
+                    bufsize=bufsize, executable=executable,
+                    stdin=stdin, stdout=stdout, stderr=stderr,
+                    shell=shell or self.exe.shell,
+                    env=env or self.environment(),
+                    universal_newlines=True, cwd=shard[1] ) )
+
+        except OSError as e:
+            for p in procs:
+                p.kill()
+            raise RunError("Couldn't run or communicate with external program: %r"\
+                  % e.strerror)
+
+        self.pid = procs[0].pid
+
+        # Read the pipes of every process in its own thread, so none of them
+        # blocks on a full pipe
+        pipes = [[] for p in procs]
+        readers = [threading.Thread(target=lambda p=p, r=r: \
+            r.extend(p.communicate(input=inp))) for p, r in zip(procs, pipes)]
+        for t in readers:
+            t.start()
+        for t in readers:
+            t.join(None if self.deadline is None else \
+                max(0, self.deadline - time.time()))
+
+        # Out of time, keep the models complete so far
+        stopped = []
+        if any(t.is_alive() for t in readers):
+            stopped = [p for p in procs if p.poll() is None]
+            for p in stopped:
+                W.stop(p)
+            for t in readers:
+                t.join()
+            for shard in self.shards:
+                W.prune(shard[2])
+
+        # The processes stopped at the deadline did not fail
+        self.returncode = max([abs(p.returncode) for p in procs \
+            if p not in stopped] or [0])
+
+        # Merge the models of all the shards
+        for i, shard in enumerate(self.shards):
+            for f in sorted(os.listdir(shard[2])):
+                os.replace(os.path.join(shard[2], f),
+                    os.path.join(self.dir_models, 's%02d_%s' % (i, f)))
+
+        output = ''.join(r[0] or '' for r in pipes)
+        error = ''.join(r[1] or '' for r in pipes)
 
         return output, error
 
+    def stop_early(self, p, inp):
+        """
+        Waits until ranch has written self.n complete models and stops it,
+        instead of letting it build the 10 models it always produces. With a
+        deadline, ranch is stopped when it is reached and the models that
+        were not complete are removed.
+
+        The pipes of the process are read in a separate thread in the
+        meantime, so ranch can not block on a full pipe.
+
+        :param p:   ranch process
+        :type p:    subprocess.Popen
+        :param inp: (for pipes) input sequence
+        :type inp:  str
+
+        :return: output and error output, and whether ranch was stopped
+        :rtype: str, str, bool
+        """
+        pipes = []
+        reader = threading.Thread(
+            target=lambda: pipes.extend(p.communicate(input=inp)))
+        reader.start()
+
+        self.m_paths = W.wait_models(self.dir_models, self.n, p,
+            deadline=self.deadline)
+
+        stopped = p.poll() is None
+        if stopped:
+            W.stop(p)
+            W.prune(self.dir_models)
+        reader.join()
+
+        return pipes[0], pipes[1], stopped
+
 
     def isFailed(self):
         """
@@ -664,6 +1177,7 @@ class Ranch(Executor):
         ## PRINT ERROR MESSAGE FROM RANCH
 
 
+    @TR.traced('ranch.finish')
     def finish(self):
         """
         Overrides Executor method.
@@ -672,9 +1186,8 @@ class Ranch(Executor):
         
         # Retrieve models created as PDBModels
         # only as many models as the user requested
-        m_paths = [os.path.join(self.dir_models, f) for f in os.listdir(
-            self.dir_models)]
-        m_paths = m_paths[:self.n]
+        m_paths = self.m_paths or W.ready(self.dir_models, self.n,
+            running=False)
 
         # self.result = [(full1, modeled_doms1), (full2, modeled_doms2), ...]
         # where 'full#' is the clean model generated, and 'modeled_doms#' is
@@ -682,255 +1195,74 @@ class Ranch(Executor):
         # *index of domain in chain*:*original domain with new coordinates*
         # symmetric models have also a out_symseq output for the symmetric unit
         # sequence
-        if self.symtemplate:
-            self.result = [extract_symmetric(B.PDBModel(m), self.symseq,
-                self.embedded) for m in m_paths]
-        else:
-            self.result = [extract_embedded(B.PDBModel(m), self.embedded) \
-            for m in m_paths]
-
+        self.result = self.extract(m_paths)
 
-    def cleanup(self):
+    @TR.traced('ranch.extract')
+    def extract(self, models):
         """
-        Delete temporary files
+        Extracts the embedded domains from the models produced by ranch
+
+        The domains are located in the first model only, and taken from the
+        others with the same atom indices (see extraction_plan), into the
+        memory-mapped ensembles of a multiprot.ensemble.Pool. The coordinates
+        of all the models are read into one (models, atoms, 3) array, parsing
+        only the coordinate columns of the files after the first (see
+        multiprot.reader.read_pool). If the models do not all have the same
+        atoms, each one is processed on its own, distributing the models over
+        self.workers processes.
+
+        :param models:  models produced by ranch, as paths to their pdb files,
+                        as PDBModels or as an Ensemble
+        :type models:   list of str or PDBModels, or Ensemble
+
+        :return: one tuple (full, [modeled_doms], out_symseq) for every model
+        :type return: Pool or list of tuples
         """
-        if not self.debug:
-            T.tryRemove(self.tempdir, tree=True)
+        symseq = self.symseq if self.symtemplate else None
 
+        if not len(models):
+            return []
 
+        try:
+            first, xyz = self._read(models)
 
+        except MatchError:
+            return pmap(_extract_model, list(models), self.workers,
+                (self.embedded, symseq))
 
-#############
-##  TESTING        
-#############
-import multiprot.testing as testing
+        # The domains are located once, in the first model
+        plan = extraction_plan(first, self.embedded, symseq)
+        pool = E.Pool.from_plan(plan, len(models))
 
-class TestRanch(testing.AutoTest):
-    """
-    Test class
-    Test examples 1, 4, 5, 7, and 10 from ranch_examples/
-    
-    Runs each case separately and tests for the creation of the models list
-    with 10 PDBModels, and then for one of the models tests for number of chains,
-    length of each chain, residue numbering and serial numbering
+        for i in range(1, len(models)):
+            pool.set(i, xyz[i])
 
-    These tests take around 35 seconds to complete, because ranch is called for
-    each example
-    """
+        return pool
 
-    TAGS = [ testing.EXE, testing.LONG ]
-    
-    dom1 = None ## define empty class variable
-    dom2 = None 
-    domAB1 = None
-    domAB2 = None
-    testpath = None
-
-    def setUp(self):
+    def _read(self, models):
+        """
+        :return: the first model, and the coordinates of all the models in an
+                 array of shape (models, atoms, 3)
+        :type return: (PDBModel, numpy.array)
 
-        self.testpath = self.testpath or \
-            os.path.join(os.path.abspath(os.path.dirname(__file__)), 'testdata')
-        
-        self.dom1 = self.dom1 or B.PDBModel(os.path.join(self.testpath, 
-            '2z6o.pdb'))
-        self.dom2 = self.dom2 or B.PDBModel(os.path.join(self.testpath, 
-            'histone.pdb'))
-        self.domAB1 = self.domAB1 or B.PDBModel(os.path.join(self.testpath, 
-            'domAB1.pdb'))
-        self.domAB2 = self.domAB2 or self.domAB1.clone()
-
-    def test_example1(self):
-        call = Ranch(self.dom1,'GGGGGGGGGG',self.dom2)
-        models = call.run()
-
-        # models = [(PDBModel, [modeled_doms]), (PDBModel, [modeled_doms]), ...]
-
-        self.assertTrue(len(models)==10, "models does not contain 10 elements")
-        self.assertTrue(isinstance(models[0], tuple) and \
-            isinstance(models[0][0], B.PDBModel) and \
-            isinstance(models[0][1], list) and \
-            isinstance(models[0][1][0], dict), 
-            "models contents are not tuples with (PDBModel, [dictionaries])")
-
-        model = models[0][0]
-        self.assertTrue(model.lenChains()==1, 'Incorrect number of chains')
-        self.assertTrue(len(model.sequence())==274, 'Incorrect chain length')
-        self.assertTrue(model.atoms['residue_number'][-1]==274, 
-            'Incorrect residue numbering')
-        self.assertTrue(model.atoms['serial_number'][-1]==2181, 
-            'Incorrect serial numbering')
-
-        dlist = models[0][1]
-        self.assertTrue(len(dlist)==1, 'list should have a single dict')
-        self.assertTrue(len(dlist[0])==0, 'dict should have 0 elements')
-
-        out_symseq = models[0][2]
-        self.assertTrue(out_symseq==model.sequence())
-
-    def test_example4(self):
-        call = Ranch(self.domAB1, 'GGGGGGGGGGGGGGGGGGGG', self.domAB2, 
-            chains = {self.domAB1:'A', self.domAB2: 'B'})
-        models = call.run()
-
-        self.assertTrue(len(models)==10, "models does not contain 10 elements")
-        self.assertTrue(isinstance(models[0], tuple) and \
-            isinstance(models[0][0], B.PDBModel) and \
-            isinstance(models[0][1], list) and \
-            isinstance(models[0][1][0], dict), 
-            "models contents are not tuples with (PDBModel, [dictionaries])")
-
-        model = models[0][0]
-        self.assertTrue(model.lenChains()==3, 'Incorrect number of chains')
-        self.assertTrue(len(model.takeChains([0]).sequence())==456 and \
-            len(model.takeChains([1]).sequence())==218 and \
-            len(model.takeChains([2]).sequence())==218, 'Incorrect chain length')
-        self.assertTrue(model.takeChains([0]).atoms['residue_number'][-1]==456 \
-            and model.takeChains([1]).atoms['residue_number'][-1]==218 \
-            and model.takeChains([2]).atoms['residue_number'][-1]==218, 
-            'Incorrect residue numbering')
-        self.assertTrue(model.atoms['serial_number'][-1]==7163, 
-            'Incorrect serial numbering')
-
-        dlist = models[0][1]
-        self.assertTrue(len(dlist)==1, 'list should have a single dict')
-        
-        d = dlist[0]
-        # The d keys will be 0 and 2, as those are the indexes of self.domAB1 and
-        # self.domAB2 in the call to ranch above
-        # d[0] and d[2] have to be PDBModels with the same sequence and number of
-        # chains as self.domAB1 and self.domAB2 respectively, but with the new
-        # coordinates after being modeled
-        self.assertTrue(len(d)==2, 'dict should have 2 elements')
-        self.assertTrue(self.domAB1.sequence() == d[0].sequence() and \
-            self.domAB2.sequence() == d[2].sequence(), 'sequences from \
-            modeled_doms and original input are different')
-        # The first model is always fixed
-        self.assertTrue(N.all(self.domAB1.xyz == d[0].xyz)) 
-
-        out_symseq = models[0][2]
-        self.assertTrue(out_symseq==model.sequence())
-
-    def test_example5(self):
-        call = Ranch(self.domAB1, 'GGGGGGGGGGGGGGGGGGGG', self.domAB2, 
-            chains = {self.domAB2: 'A'}, symmetry='p2', symtemplate=self.domAB1, 
-            pool_sym='s')
-        models = call.run()
-
-        self.assertTrue(len(models)==10, "models does not contain 10 elements")
-        self.assertTrue(isinstance(models[0], tuple) and \
-            isinstance(models[0][0], B.PDBModel) and \
-            isinstance(models[0][1], list) and \
-            isinstance(models[0][1][0], dict), 
-            "models contents are not tuples with (PDBModel, [dictionaries])")
-
-        model = models[0][0]
-        self.assertTrue(model.lenChains()==4, 'Incorrect number of chains')
-        self.assertTrue(len(model.takeChains([0]).sequence())==456 and \
-            len(model.takeChains([1]).sequence())==218 and \
-            len(model.takeChains([2]).sequence())==456 and \
-            len(model.takeChains([3]).sequence())==218, 'Incorrect chain length')
-        self.assertTrue(model.takeChains([0]).atoms['residue_number'][-1]==456 \
-            and model.takeChains([1]).atoms['residue_number'][-1]==218 \
-            and model.takeChains([2]).atoms['residue_number'][-1]==456 \
-            and model.takeChains([3]).atoms['residue_number'][-1]==218, 
-            'Incorrect residue numbering')
-        self.assertTrue(model.atoms['serial_number'][-1]==10754, 
-            'Incorrect serial numbering')
-
-        dlist = models[0][1]
-        # this list will have two 'modeled_doms' dictionaries, one for each
-        # symmetric unit
-        self.assertTrue(len(dlist)==2, 'list should have two dictionaries')
-
-        d = dlist[0]    # Take the first dictionary
-        # The only key will be 2, the position of self.domAB1 in the call to
-        # Ranch above. The symtemplate domain is not included
-        self.assertTrue(len(d)==1, 'dictionary should have 1 entry')
-        self.assertTrue(self.domAB2.sequence() == d[2].sequence(), 'sequences \
-            from modeled dom and original are different')
-
-        out_symseq = models[0][2]
-        self.assertTrue(
-            out_symseq==model.sequence()[:int(len(model.sequence())/2)])
-
-    def test_example7(self):
-        linker = 'GGGGGGGGGGGGGGGGGGGG'
-        call = Ranch(self.dom2, linker, self.domAB1, linker, self.dom2, 
-            symmetry='p2', symtemplate=self.domAB1, pool_sym='mix')
-        models = call.run()
-
-        self.assertTrue(len(models)==10, "models does not contain 10 elements")
-        self.assertTrue(isinstance(models[0], tuple) and \
-            isinstance(models[0][0], B.PDBModel) and \
-            isinstance(models[0][1], list) and \
-            isinstance(models[0][1][0], dict), 
-            "models contents are not tuples with (PDBModel, [dictionaries])")
-
-        model = models[0][0]
-        self.assertTrue(model.lenChains()==2, 'Incorrect number of chains')
-        self.assertTrue(len(model.takeChains([0]).sequence())==454 and \
-            len(model.takeChains([0]).sequence())==454, 'Incorrect chain length')
-        self.assertTrue(model.takeChains([0]).atoms['residue_number'][-1]==454 \
-            and model.takeChains([1]).atoms['residue_number'][-1]==454, 
-            'Incorrect residue numbering')
-        self.assertTrue(model.atoms['serial_number'][-1]==6876, 
-            'Incorrect serial numbering')
-
-        dlist = models[0][1]
-        # this list will have two 'modeled_doms' dictionaries, one for each
-        # symmetric unit
-        self.assertTrue(len(dlist)==2, 'list should have two dictionaries')
-
-        self.assertTrue(len(dlist[0])==0, dlist[0])
-
-        out_symseq = models[0][2]
-        self.assertTrue(
-            out_symseq==model.sequence()[:int(len(model.sequence())/2)])
-
-    def test_example10(self):
-        call = Ranch(self.domAB1, 'GGGGGGGGGGGGGGGGGGGG', self.domAB2, 
-            'GGGGGGGGGGGGGGGGGGGG', self.domAB2, chains = {self.domAB2:'B'})
-        models = call.run()
-
-        self.assertTrue(len(models)==10, "models does not contain 10 elements")
-        self.assertTrue(isinstance(models[0], tuple) and \
-            isinstance(models[0][0], B.PDBModel) and \
-            isinstance(models[0][1], list) and \
-            isinstance(models[0][1][0], dict), 
-            "models contents are not tuples with (PDBModel, [dictionaries])")
-
-        model = models[0][0]
-        self.assertTrue(model.lenChains()==4, 'Incorrect number of chains')
-        self.assertTrue(len(model.takeChains([0]).sequence())==694 and \
-            len(model.takeChains([1]).sequence())==218 and \
-            len(model.takeChains([2]).sequence())==218 and \
-            len(model.takeChains([3]).sequence())==218, 'Incorrect chain length')
-        self.assertTrue(model.takeChains([0]).atoms['residue_number'][-1]==694 \
-            and model.takeChains([1]).atoms['residue_number'][-1]==218 \
-            and model.takeChains([2]).atoms['residue_number'][-1]==218 \
-            and model.takeChains([3]).atoms['residue_number'][-1]==218, 
-            'Incorrect residue numbering')
-        self.assertTrue(model.atoms['serial_number'][-1]==10754, 
-            'Incorrect serial numbering')
-
-        dlist = models[0][1]
-        self.assertTrue(len(dlist)==1, 'list should have a single dict')
-        
-        d = dlist[0]
-        # The d keys will be 0, 2 and 4, as those are the indexes of self.domAB1
-        # and self.domAB2 in the call to ranch above
-        self.assertTrue(len(d)==3, 'dict should have 2 elements')
-        self.assertTrue(self.domAB1.sequence() == d[0].sequence() and \
-            self.domAB2.sequence() == d[2].sequence() and \
-            self.domAB2.sequence() == d[4].sequence(), 'sequences from \
-            modeled_doms and original input are different')
-        self.assertTrue(N.all(self.domAB1.xyz == d[0].xyz), 'coordinates should be\
-         the same')
+        :raise MatchError: if the models do not all have the atoms of the
+                           first one
+        """
+        if isinstance(models, E.Ensemble):
+            return models[0], models.xyz
 
-        out_symseq = models[0][2]
-        self.assertTrue(out_symseq==model.sequence())
+        if not isinstance(models[0], B.PDBModel):
+            return RD.read_pool(models)
 
+        names = list(models[0]['name'])
+        if any(list(m['name']) != names for m in models):
+            raise MatchError('The models have different atoms.')
 
-if __name__ == '__main__':
+        return models[0], N.array([m.xyz for m in models])
 
-    testing.localTest(debug=False)
+    def cleanup(self):
+        """
+        Delete temporary files
+        """
+        if not self.debug:
+            T.tryRemove(self.tempdir, tree=True)
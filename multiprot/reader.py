@@ -0,0 +1,71 @@
+"""
+Fast reader for the pools of models produced by ranch
+
+All the models of a pool have the same atoms, so only the first one is parsed
+into a PDBModel. Only the coordinate columns of the ATOM/HETATM records are
+read from the other files, into a single (models, atoms, 3) array, from which
+multiprot.ensemble.Pool takes the atoms of every model (see
+multiprot.ranch.Ranch.extract).
+
+"""
+
+import biskit as B
+import numpy as N
+
+from multiprot.errors import *
+
+RECORDS = (b'ATOM', b'HETATM')
+
+
+def read_xyz(path, out=None):
+    """
+    Reads the coordinates of the atoms in a pdb file
+
+    :param path:    path of the pdb file
+    :type path:     str
+    :param out:     array for the coordinates, of shape (atoms, 3), which
+                    must match the number of atoms in the file (default: None,
+                    a new array is created)
+    :type out:      numpy.array
+
+    :return: coordinates of the atoms
+    :type return: numpy.array of float32
+
+    :raise MatchError: if the number of atoms does not match out
+    """
+    with open(path, 'rb') as f:
+        lines = [l for l in f if l.startswith(RECORDS)]
+
+    if out is None:
+        out = N.empty((len(lines), 3), N.float32)
+
+    elif len(lines) != len(out):
+        raise MatchError('%s has %d atoms instead of %d.' % (path, len(lines),
+            len(out)))
+
+    # Fixed width columns, which may not be separated by spaces
+    out[:] = N.array([(l[30:38], l[38:46], l[46:54]) for l in lines])
+
+    return out
+
+def read_pool(paths):
+    """
+    Reads the models of a pool, parsing the first one completely and only
+    the coordinates of the others
+
+    :param paths:   paths of the pdb files of the models
+    :type paths:    list of str
+
+    :return: the first model, and the coordinates of all the models in an
+             array of shape (models, atoms, 3)
+    :type return: (PDBModel, numpy.array of float32)
+
+    :raise MatchError: if a model does not have the atoms of the first one
+    """
+    first = B.PDBModel(paths[0])
+
+    xyz = N.empty((len(paths), len(first), 3), N.float32)
+    for i, path in enumerate(paths):
+        read_xyz(path, xyz[i])
+
+    return first, xyz
@@ -0,0 +1,452 @@
+"""
+Native all-atom reconstruction of the CA linkers, as an alternative to the
+pulchra executable
+
+Ranch (and multiprot.sampler) produce the linkers as residues made of a single
+CA atom. The rest of the atoms of those residues are placed directly from the
+CA trace, for every conformer of the ensemble at once:
+
+-   the C, O and N atoms of the peptide between two consecutive CA atoms are
+    read from a fragment table (multiprot.rebuildTables.BACKBONE) in the local
+    frame of the four CA atoms around the peptide, and selected by the virtual
+    dihedral and bond angles of those CA atoms
+-   side chains are attached to the N, CA, C frame of every residue, with the
+    most representative rotamer of each amino acid
+    (multiprot.rebuildTables.ROTAMERS)
+
+The residues that already have all of their atoms (the domains) are kept
+untouched.
+
+Both tables were derived from the structures in multiprot/testdata with
+derive_tables()
+
+"""
+
+import biskit as B
+import biskit.molUtils as MU
+import numpy as N
+
+import multiprot.sampler as S
+import multiprot.ensemble as E
+from multiprot.errors import *
+
+# Bins of the fragment table: virtual dihedral of the four CA atoms around the
+# peptide, and virtual bond angles at its two CA atoms, in degrees
+TAU_BINS = 24
+THETA_BINS = 3
+THETA_RANGE = (80., 150.)
+
+BACKBONE_ATOMS = ['N', 'CA', 'C', 'O']
+
+CHUNK = 1000    # conformers of an ensemble rebuilt at once
+
+
+#### Helper geometry functions ####
+
+def unit(v):
+    """
+    :param v:   vectors
+    :type v:    array (... x 3)
+
+    :return: normalized vectors
+    :type return: array (... x 3)
+    """
+    return v / N.linalg.norm(v, axis=-1)[...,None]
+
+def frames(a, b, c):
+    """
+    Orthonormal frames with the origin in b, the x axis along bc and the xy
+    plane containing a
+
+    :param a, b, c: coordinates of the three points defining the frames
+    :type a, b, c:  arrays (... x 3)
+
+    :return: frames, as rows of their x, y, z axes
+    :type return: array (... x 3 x 3)
+    """
+    x = unit(c - b)
+    y = a - b
+    y = unit(y - N.sum(y*x, axis=-1)[...,None] * x)
+
+    return N.stack([x, y, N.cross(x, y)], axis=-2)
+
+def virtual(ca):
+    """
+    Extends a CA trace with two virtual CA atoms at each end, so that every
+    peptide of the chain is surrounded by four CA atoms
+
+    :param ca:  CA coordinates of one chain
+    :type ca:   array (M x L x 3)
+
+    :return: extended CA coordinates, starting with the two virtual atoms
+             before the first residue (traces shorter than 3 residues are
+             also completed at the end)
+    :type return: array (M x max(L,3)+4 x 3)
+    """
+    m = len(ca)
+
+    # Very short traces are first completed along a straight line
+    while ca.shape[1] < 3:
+        step = N.array([S.Sampler.BOND, 0., 0.]) if ca.shape[1] < 2 else \
+            ca[:,-1] - ca[:,-2]
+        ca = N.concatenate([ca, (ca[:,-1] + step)[:,None]], axis=1)
+
+    theta = N.full(m, N.radians(120.))
+    tau = N.full(m, N.radians(-120.))
+
+    ext = list(ca.transpose(1,0,2))
+    for i in range(2):
+        ext.insert(0, S.place(ext[2], ext[1], ext[0], S.Sampler.BOND, theta, tau))
+        ext.append(S.place(ext[-3], ext[-2], ext[-1], S.Sampler.BOND, theta,
+            tau))
+
+    return N.array(ext).transpose(1,0,2)
+
+def angles(ca):
+    """
+    Virtual bond angles and dihedrals of the CA atoms around every peptide
+
+    :param ca:  CA coordinates of one chain, extended with virtual()
+    :type ca:   array (M x L+4 x 3)
+
+    :return: virtual dihedral of the CA atoms k-1, k, k+1 and k+2, and the
+             virtual bond angles at k and k+1, for the peptide between the CA
+             atoms k and k+1 (k from 1 to L+1), in degrees
+    :type return: tuple of arrays (M x L+1)
+    """
+    b0 = ca[:,:-3] - ca[:,1:-2]
+    b1 = unit(ca[:,2:-1] - ca[:,1:-2])
+    b2 = ca[:,3:] - ca[:,2:-1]
+
+    v = b0 - N.sum(b0*b1, axis=-1)[...,None] * b1
+    w = b2 - N.sum(b2*b1, axis=-1)[...,None] * b1
+    tau = N.degrees(N.arctan2(N.sum(N.cross(b1, v) * w, axis=-1),
+        N.sum(v*w, axis=-1)))
+
+    theta1 = N.degrees(N.arccos(N.clip(N.sum(unit(b0) * b1, axis=-1), -1, 1)))
+    theta2 = N.degrees(N.arccos(N.clip(N.sum(-b1 * unit(b2), axis=-1), -1, 1)))
+
+    return tau, theta1, theta2
+
+def bins(tau, theta1, theta2):
+    """
+    Indexes of the fragment table for the given CA geometry
+
+    :return: indexes of the dihedral and of the two bond angles
+    :type return: tuple of int arrays
+    """
+    it = ((tau + 180.) / 360. * TAU_BINS).astype(int) % TAU_BINS
+
+    lo, hi = THETA_RANGE
+    ia = N.clip(((theta1 - lo) / (hi - lo) * THETA_BINS).astype(int), 0,
+        THETA_BINS-1)
+    ib = N.clip(((theta2 - lo) / (hi - lo) * THETA_BINS).astype(int), 0,
+        THETA_BINS-1)
+
+    return it, ia, ib
+
+def backbone(ca, table=None):
+    """
+    Places the N, C and O atoms of every residue of a chain from its CA trace
+
+    :param ca:      CA coordinates of the consecutive residues of one chain
+    :type ca:       array (M x L x 3)
+    :param table:   fragment table (default: rebuildTables.BACKBONE)
+    :type table:    array (TAU_BINS x THETA_BINS x THETA_BINS x 3 x 3)
+
+    :return: coordinates of the N, C and O atoms of every residue
+    :type return: tuple of arrays (M x L x 3)
+    """
+    if table is None:
+        import multiprot.rebuildTables as RT
+        table = N.array(RT.BACKBONE)
+
+    L = ca.shape[1]
+    x = virtual(ca)
+
+    f = frames(x[:,:-3], x[:,1:-2], x[:,2:-1])
+    local = table[bins(*angles(x))]
+
+    # C, O and N atoms of every peptide (L+1 of them, from the virtual CA
+    # before the first residue to the one after the last)
+    pep = x[:,1:-2,None] + local @ f
+
+    return pep[:,:L,2], pep[:,1:L+1,0], pep[:,1:L+1,1]
+
+def sidechains(n, ca, c, local):
+    """
+    Places the side chain atoms of several residues of the same type
+
+    :param n, ca, c:    coordinates of the N, CA and C atoms of the residues
+    :type n, ca, c:     arrays (M x R x 3)
+    :param local:       coordinates of the side chain atoms in the frame of
+                        the N, CA, C atoms (see ROTAMERS)
+    :type local:        array (K x 3)
+
+    :return: coordinates of the side chain atoms
+    :type return: array (M x R x K x 3)
+    """
+    f = frames(n, ca, c)
+    return ca[...,None,:] + N.asarray(local) @ f
+
+
+#### Rebuild of the models ####
+
+def _rebuild_xyz(ref, xyz):
+    """
+    Rebuilds the CA-only residues of conformers that all have the atoms of ref
+
+    :param ref:     atoms of the conformers
+    :type ref:      PDBModel
+    :param xyz:     coordinates of the conformers
+    :type xyz:      numpy.array of shape (models, atoms, 3)
+
+    :return: atoms and coordinates of the rebuilt conformers, or None if
+             there is nothing to rebuild
+    :type return: (PDBModel, numpy.array)
+    """
+    import multiprot.rebuildTables as RT
+
+    ri = N.append(ref.resIndex(), len(ref))
+    names = ref['name']
+    rnames = ref['residue_name']
+    mask_ca = ref.maskCA()
+
+    # CA atom of every residue (its first atom if there is none)
+    ica = ri[:-1].copy()
+    ica[ref.resMap()[mask_ca]] = N.flatnonzero(mask_ca)
+
+    target = (N.diff(ri) == 1) & mask_ca[ri[:-1]]
+    if not target.any():
+        return None
+
+    xyz = N.array(xyz, dtype=float)
+    m = len(xyz)
+    nres = len(ri) - 1
+
+    bb_n = N.zeros((m, nres, 3))
+    bb_c = N.zeros((m, nres, 3))
+    bb_o = N.zeros((m, nres, 3))
+
+    table = N.array(RT.BACKBONE)
+    res_chain = ref.chainMap()[ri[:-1]]
+    for c in N.unique(res_chain[target]):
+        res = N.flatnonzero(res_chain == c)
+        n, cc, o = backbone(xyz[:,ica[res]], table)
+        bb_n[:,res], bb_c[:,res], bb_o[:,res] = n, cc, o
+
+    # Atoms of the rebuilt models: every CA-only residue takes its CA atom
+    # record once for each of its atoms
+    idx = []
+    new_names = []
+    offsets = {}    # residue name -> (residues, atom offsets)
+    for k in range(nres):
+        a, b = ri[k], ri[k+1]
+        if target[k]:
+            atoms = BACKBONE_ATOMS + RT.ROTAMERS.get(rnames[a], ([],))[0]
+            offsets.setdefault(rnames[a], ([], []))
+            offsets[rnames[a]][0].append(k)
+            offsets[rnames[a]][1].append(len(idx))
+            idx += [ica[k]] * len(atoms)
+            new_names += atoms
+        else:
+            idx += list(range(a, b))
+            new_names += names[a:b]
+
+    new = ref.take(idx)
+    new['name'] = new_names
+    if 'element' in new.atoms:
+        new['element'] = [a[0] for a in new_names]
+    new['serial_number'] = N.arange(1, len(new)+1,
+        dtype=ref['serial_number'].dtype)
+
+    x = xyz[:,idx]
+    for name, (res, offs) in offsets.items():
+        res = N.array(res)
+        offs = N.array(offs)
+        x[:,offs] = bb_n[:,res]
+        x[:,offs+2] = bb_c[:,res]
+        x[:,offs+3] = bb_o[:,res]
+
+        if name in RT.ROTAMERS:
+            local = N.array(RT.ROTAMERS[name][1])
+            side = offs[:,None] + 4 + N.arange(len(local))
+            x[:,side] = sidechains(bb_n[:,res], xyz[:,ica[res]], bb_c[:,res],
+                local)
+
+    return new, x
+
+def _rebuild_ensemble(models):
+    """
+    Rebuilds the CA-only residues of models that all have the same atoms
+
+    :param models:  models to rebuild
+    :type models:   list of PDBModels
+
+    :return: rebuilt models
+    :type return: list of PDBModels
+    """
+    r = _rebuild_xyz(models[0], [m.xyz for m in models])
+    if r is None:
+        return models
+
+    new, x = r
+    result = []
+    for xi in x:
+        m = new.clone()
+        m.xyz = xi
+        result.append(m)
+
+    return result
+
+def rebuild_ensemble(ens):
+    """
+    Rebuilds the CA-only residues of the conformers of an ensemble, a block
+    of CHUNK conformers at a time
+
+    :param ens:     conformers to rebuild
+    :type ens:      multiprot.ensemble.Ensemble
+
+    :return: rebuilt conformers
+    :type return: multiprot.ensemble.Ensemble
+    """
+    r = None
+    for start in range(0, len(ens), CHUNK):
+        block = _rebuild_xyz(ens.topology, ens.xyz[start:start+CHUNK])
+        if block is None:
+            return ens
+
+        new, x = block
+        if r is None:
+            r = E.Ensemble.create(new, len(ens))
+        r.xyz[start:start+len(x)] = x
+
+    return r
+
+def rebuild(models):
+    """
+    Adds the backbone and side chain atoms of the residues made of a single CA
+    atom (the linkers produced by ranch)
+
+    Models with the same atoms, like all the conformers produced by a ranch
+    run, are rebuilt together.
+
+    :param models:  models to rebuild
+    :type models:   list of PDBModels, or Ensemble
+
+    :return: rebuilt models, in the same order
+    :type return: list of PDBModels, or Ensemble
+    """
+    if isinstance(models, E.Ensemble):
+        return rebuild_ensemble(models)
+
+    groups = {}
+    for i, m in enumerate(models):
+        key = (tuple(m['name']), tuple(m['residue_name']))
+        groups.setdefault(key, []).append(i)
+
+    result = [None] * len(models)
+    for group in groups.values():
+        rebuilt = _rebuild_ensemble([models[i] for i in group])
+        for i, r in zip(group, rebuilt):
+            result[i] = r
+
+    return result
+
+
+#### Derivation of the tables from full atom structures ####
+
+def _residues(model):
+    """
+    Atom coordinates of every residue of model
+
+    :return: for every chain, a list with one tuple (residue name,
+             {atom name: xyz}) per residue
+    :type return: list of lists of tuples
+    """
+    chains = []
+    for i in range(model.lenChains()):
+        ch = model.takeChains([i])
+        ch = ch.compress(ch.maskProtein())
+        ri = N.append(ch.resIndex(), len(ch))
+        names = ch['name']
+        rnames = ch['residue_name']
+        chains.append([(rnames[a], {names[k]: ch.xyz[k] for k in range(a,b)})\
+            for a, b in zip(ri[:-1], ri[1:])])
+
+    return chains
+
+def derive_tables(models):
+    """
+    Derives the fragment table of the peptide atoms and the side chain
+    rotamers from full atom structures
+
+    Every cell of the fragment table holds the mean position of the C, O and
+    N atoms of the peptides with that CA geometry; empty cells take the value
+    of the closest cell with data. The rotamer of every amino acid is the
+    medoid of all of its side chains in the structures.
+
+    :param models:  full atom structures
+    :type models:   list of PDBModels
+
+    :return: the fragment table and the rotamer of every amino acid as
+             {residue name: (side chain atom names, local coordinates)}
+    :type return: tuple (array, dict)
+    """
+    pep = []
+    geo = []
+    sides = {}
+
+    for model in models:
+        for res in _residues(model):
+            ok = [all(a in r for a in BACKBONE_ATOMS) for name, r in res]
+
+            for k in range(1, len(res)-2):
+                if not all(ok[k-1:k+3]):
+                    continue
+
+                x = N.array([res[j][1]['CA'] for j in range(k-1, k+3)])
+                if N.any(N.linalg.norm(x[1:] - x[:-1], axis=1) > 4.2):
+                    continue
+
+                f = frames(x[0], x[1], x[2])
+                p = N.array([res[k][1]['C'], res[k][1]['O'], res[k+1][1]['N']])
+                pep.append((p - x[1]) @ f.T)
+                geo.append(x)
+
+            for (name, r), o in zip(res, ok):
+                atoms = [a for a in MU.aaAtoms.get(name, []) \
+                    if a not in BACKBONE_ATOMS + ['OXT']]
+                if o and atoms and all(a in r for a in atoms):
+                    f = frames(r['N'], r['CA'], r['C'])
+                    side = N.array([r[a] for a in atoms])
+                    sides.setdefault(name, (atoms, []))[1].append(
+                        (side - r['CA']) @ f.T)
+
+    pep = N.array(pep)
+    cells = bins(*[a[:,0] for a in angles(N.array(geo))])
+
+    shape = (TAU_BINS, THETA_BINS, THETA_BINS)
+    table = N.zeros(shape + (3, 3))
+    count = N.zeros(shape)
+    N.add.at(table, cells, pep)
+    N.add.at(count, cells, 1)
+
+    full = N.array(N.nonzero(count)).T
+    for cell in N.array(N.nonzero(count == 0)).T:
+        d = N.abs(full - cell)
+        d[:,0] = N.minimum(d[:,0], TAU_BINS - d[:,0])
+        closest = tuple(full[N.argmin(N.sum(d**2, axis=1))])
+        table[tuple(cell)] = table[closest]
+        count[tuple(cell)] = count[closest]
+
+    table /= count[...,None,None]
+
+    rotamers = {}
+    for name, (atoms, coords) in sorted(sides.items()):
+        coords = N.array(coords)
+        rmsd = N.sqrt(N.mean(N.sum((coords[:,None] - coords[None])**2,
+            axis=-1), axis=-1))
+        rotamers[name] = (atoms, coords[N.argmin(rmsd.sum(axis=1))])
+
+    return table, rotamers
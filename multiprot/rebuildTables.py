@@ -0,0 +1,578 @@
+"""
+Tables used by multiprot.rebuild to place the atoms of the CA linkers
+
+Generated with multiprot.rebuild.derive_tables() from the structures in
+multiprot/testdata (1it2, 2ei4, 2h5q, 2qud, 2z6o, 5agc, chain01_2ch, domAB1
+and histone)
+
+"""
+
+# Mean coordinates of the C, O and N atoms of a peptide in the frame of its
+# first CA atom (see rebuild.frames), for every bin of the virtual dihedral
+# (multiprot.rebuild.TAU_BINS, from -180 degrees) and of the virtual bond
+# angles at the two CA atoms of the peptide (rebuild.THETA_BINS)
+BACKBONE = [
+    # tau -180 to -165
+    [
+        [
+            [[1.402, 0.107, -0.530], [1.631, 0.365, -1.650], [2.353, -0.058, 0.321]],
+            [[1.392, -0.103, -0.533], [1.579, -0.208, -1.716], [2.346, 0.037, 0.352]],
+            [[1.441, -0.398, -0.212], [1.716, -1.443, -0.803], [2.409, 0.403, 0.237]],
+        ],
+        [
+            [[1.424, 0.056, -0.502], [1.633, 0.171, -1.638], [2.396, -0.005, 0.362]],
+            [[1.429, 0.113, -0.495], [1.642, 0.360, -1.664], [2.411, -0.034, 0.376]],
+            [[1.424, 0.165, -0.485], [1.630, 0.563, -1.606], [2.391, -0.129, 0.354]],
+        ],
+        [
+            [[1.431, 0.316, -0.426], [1.650, 0.965, -1.446], [2.396, -0.147, 0.354]],
+            [[1.427, 0.275, -0.451], [1.627, 0.825, -1.523], [2.413, -0.091, 0.356]],
+            [[1.422, 0.270, -0.434], [1.638, 0.838, -1.462], [2.386, -0.154, 0.344]],
+        ],
+    ],
+    # tau -165 to -150
+    [
+        [
+            [[1.424, -0.118, -0.529], [1.641, -0.198, -1.735], [2.388, -0.098, 0.376]],
+            [[1.435, -0.554, -0.073], [1.636, -1.774, 0.008], [2.418, 0.341, -0.189]],
+            [[1.434, -0.302, 0.425], [1.675, -0.961, 1.444], [2.406, 0.163, -0.320]],
+        ],
+        [
+            [[1.418, 0.093, -0.499], [1.649, 0.290, -1.641], [2.386, -0.075, 0.359]],
+            [[1.429, 0.085, -0.470], [1.651, 0.311, -1.571], [2.406, -0.067, 0.350]],
+            [[1.421, 0.219, -0.478], [1.629, 0.794, -1.525], [2.392, -0.227, 0.297]],
+        ],
+        [
+            [[1.427, 0.291, -0.361], [1.654, 0.865, -1.362], [2.433, -0.109, 0.389]],
+            [[1.413, 0.347, -0.417], [1.611, 0.998, -1.416], [2.382, -0.107, 0.343]],
+            [[1.415, 0.340, -0.425], [1.618, 1.056, -1.381], [2.375, -0.202, 0.294]],
+        ],
+    ],
+    # tau -150 to -135
+    [
+        [
+            [[1.435, -0.346, 0.150], [1.655, -1.116, 0.499], [2.402, 0.228, -0.112]],
+            [[1.435, -0.554, -0.073], [1.636, -1.774, 0.008], [2.418, 0.341, -0.189]],
+            [[1.427, -0.414, 0.339], [1.657, -1.360, 1.076], [2.393, 0.302, -0.204]],
+        ],
+        [
+            [[1.420, 0.187, -0.510], [1.631, 0.566, -1.648], [2.389, -0.127, 0.342]],
+            [[1.418, 0.138, -0.505], [1.632, 0.459, -1.642], [2.388, -0.090, 0.352]],
+            [[1.451, 0.174, -0.344], [1.728, 0.776, -1.310], [2.440, -0.265, 0.362]],
+        ],
+        [
+            [[1.454, 0.252, -0.187], [1.689, 0.770, -0.461], [2.461, -0.038, 0.045]],
+            [[1.418, 0.317, -0.435], [1.612, 0.912, -1.453], [2.379, -0.091, 0.344]],
+            [[1.416, 0.407, -0.338], [1.622, 1.305, -1.133], [2.383, -0.257, 0.266]],
+        ],
+    ],
+    # tau -135 to -120
+    [
+        [
+            [[1.444, -0.353, -0.004], [1.683, -1.150, -0.023], [2.444, 0.203, -0.003]],
+            [[1.411, -0.260, -0.156], [1.648, -0.828, -0.638], [2.387, 0.156, 0.201]],
+            [[1.400, -0.527, 0.231], [1.584, -1.683, 0.618], [2.386, 0.334, -0.028]],
+        ],
+        [
+            [[1.422, 0.179, -0.300], [1.637, 0.540, -1.001], [2.387, -0.100, 0.229]],
+            [[1.429, 0.218, -0.433], [1.672, 0.750, -1.464], [2.396, -0.156, 0.364]],
+            [[1.454, 0.347, -0.359], [1.650, 1.050, -1.356], [2.416, -0.183, 0.370]],
+        ],
+        [
+            [[1.378, 0.466, -0.393], [1.592, 1.207, -1.295], [2.312, -0.123, 0.270]],
+            [[1.414, 0.346, -0.368], [1.627, 1.087, -1.241], [2.387, -0.186, 0.306]],
+            [[1.413, 0.292, 0.165], [1.627, 0.897, 0.515], [2.371, -0.145, -0.074]],
+        ],
+    ],
+    # tau -120 to -105
+    [
+        [
+            [[1.433, -0.469, 0.126], [1.657, -1.609, 0.429], [2.422, 0.380, -0.098]],
+            [[1.411, -0.260, -0.156], [1.648, -0.828, -0.638], [2.387, 0.156, 0.201]],
+            [[1.414, -0.500, 0.185], [1.621, -1.588, 0.693], [2.386, 0.346, -0.158]],
+        ],
+        [
+            [[1.430, 0.228, -0.193], [1.670, 0.629, -0.613], [2.400, -0.072, 0.128]],
+            [[1.438, 0.254, -0.426], [1.669, 0.804, -1.484], [2.414, -0.140, 0.379]],
+            [[1.454, 0.347, -0.359], [1.650, 1.050, -1.356], [2.416, -0.183, 0.370]],
+        ],
+        [
+            [[1.461, 0.383, -0.168], [1.719, 1.343, -0.733], [2.455, -0.277, 0.332]],
+            [[1.416, 0.321, -0.413], [1.606, 0.999, -1.376], [2.388, -0.175, 0.319]],
+            [[1.420, 0.497, -0.174], [1.628, 1.685, -0.408], [2.387, -0.400, -0.057]],
+        ],
+    ],
+    # tau -105 to -90
+    [
+        [
+            [[1.427, -0.523, 0.000], [1.641, -1.736, 0.042], [2.389, 0.392, -0.037]],
+            [[1.427, -0.523, 0.000], [1.641, -1.736, 0.042], [2.389, 0.392, -0.037]],
+            [[1.401, -0.491, 0.230], [1.616, -1.596, 0.701], [2.363, 0.346, -0.121]],
+        ],
+        [
+            [[1.443, 0.395, -0.290], [1.695, 1.362, -0.978], [2.422, -0.343, 0.202]],
+            [[1.434, 0.309, -0.418], [1.654, 1.001, -1.387], [2.402, -0.212, 0.318]],
+            [[1.476, 0.445, -0.352], [1.742, 1.486, -0.972], [2.441, -0.377, 0.065]],
+        ],
+        [
+            [[1.455, 0.384, -0.261], [1.704, 1.332, -1.004], [2.472, -0.288, 0.288]],
+            [[1.429, 0.314, -0.369], [1.666, 0.999, -1.244], [2.390, -0.206, 0.297]],
+            [[1.420, 0.502, 0.158], [1.636, 1.623, 0.544], [2.393, -0.330, -0.132]],
+        ],
+    ],
+    # tau -90 to -75
+    [
+        [
+            [[1.427, -0.523, 0.000], [1.641, -1.736, 0.042], [2.389, 0.392, -0.037]],
+            [[1.432, -0.513, 0.064], [1.662, -1.700, 0.275], [2.401, 0.374, -0.122]],
+            [[1.458, -0.481, -0.091], [1.717, -1.643, -0.240], [2.473, 0.392, -0.098]],
+        ],
+        [
+            [[1.420, 0.399, -0.334], [1.662, 1.359, -1.037], [2.385, -0.307, 0.199]],
+            [[1.437, 0.169, -0.402], [1.660, 0.574, -1.330], [2.412, -0.120, 0.313]],
+            [[1.421, 0.046, 0.537], [1.630, 0.145, 1.746], [2.397, -0.041, -0.365]],
+        ],
+        [
+            [[1.437, 0.398, -0.211], [1.671, 1.480, -0.735], [2.435, -0.408, 0.093]],
+            [[1.414, 0.472, -0.165], [1.633, 1.544, -0.355], [2.364, -0.332, -0.034]],
+            [[1.362, 0.437, -0.410], [1.480, 1.182, -1.177], [2.372, -0.217, 0.087]],
+        ],
+    ],
+    # tau -75 to -60
+    [
+        [
+            [[1.400, 0.433, 0.358], [1.582, 1.446, 1.060], [2.400, -0.315, -0.175]],
+            [[1.432, -0.513, 0.064], [1.662, -1.700, 0.275], [2.401, 0.374, -0.122]],
+            [[1.458, -0.481, -0.091], [1.717, -1.643, -0.240], [2.473, 0.392, -0.098]],
+        ],
+        [
+            [[1.400, 0.433, 0.358], [1.582, 1.446, 1.060], [2.400, -0.315, -0.175]],
+            [[1.423, 0.485, -0.197], [1.661, 1.593, -0.699], [2.374, -0.338, 0.212]],
+            [[1.444, -0.355, 0.160], [1.695, -1.409, 0.573], [2.420, 0.469, -0.055]],
+        ],
+        [
+            [[1.408, 0.519, -0.124], [1.621, 1.706, -0.311], [2.376, -0.373, -0.005]],
+            [[1.426, 0.509, -0.118], [1.647, 1.653, -0.506], [2.406, -0.327, 0.217]],
+            [[1.395, 0.541, 0.007], [1.590, 1.716, 0.148], [2.354, -0.319, 0.059]],
+        ],
+    ],
+    # tau -60 to -45
+    [
+        [
+            [[1.427, -0.296, -0.433], [1.660, -1.047, -1.375], [2.410, 0.293, 0.261]],
+            [[1.418, -0.251, -0.498], [1.637, -0.578, -1.649], [2.374, -0.036, 0.379]],
+            [[1.418, -0.251, -0.498], [1.637, -0.578, -1.649], [2.374, -0.036, 0.379]],
+        ],
+        [
+            [[1.400, 0.433, 0.358], [1.582, 1.446, 1.060], [2.400, -0.315, -0.175]],
+            [[1.419, 0.564, 0.061], [1.662, 1.787, 0.138], [2.377, -0.367, 0.048]],
+            [[1.444, -0.355, 0.160], [1.695, -1.409, 0.573], [2.420, 0.469, -0.055]],
+        ],
+        [
+            [[1.419, 0.526, 0.090], [1.649, 1.719, 0.344], [2.376, -0.365, -0.124]],
+            [[1.432, 0.497, -0.120], [1.650, 1.663, -0.459], [2.405, -0.384, 0.144]],
+            [[1.395, 0.541, 0.007], [1.590, 1.716, 0.148], [2.354, -0.319, 0.059]],
+        ],
+    ],
+    # tau -45 to -30
+    [
+        [
+            [[1.427, -0.296, -0.433], [1.660, -1.047, -1.375], [2.410, 0.293, 0.261]],
+            [[1.418, -0.251, -0.498], [1.637, -0.578, -1.649], [2.374, -0.036, 0.379]],
+            [[1.447, -0.292, 0.450], [1.689, -0.922, 1.480], [2.410, 0.159, -0.342]],
+        ],
+        [
+            [[1.379, 0.265, 0.465], [1.562, 0.846, 1.328], [2.343, -0.157, -0.204]],
+            [[1.419, 0.564, 0.061], [1.662, 1.787, 0.138], [2.377, -0.367, 0.048]],
+            [[1.428, 0.226, 0.457], [1.659, 0.770, 1.538], [2.394, -0.182, -0.358]],
+        ],
+        [
+            [[1.419, 0.526, 0.090], [1.649, 1.719, 0.344], [2.376, -0.365, -0.124]],
+            [[1.438, 0.509, -0.176], [1.662, 1.665, -0.540], [2.399, -0.360, 0.098]],
+            [[1.428, 0.226, 0.457], [1.659, 0.770, 1.538], [2.394, -0.182, -0.358]],
+        ],
+    ],
+    # tau -30 to -15
+    [
+        [
+            [[1.379, 0.265, 0.465], [1.562, 0.846, 1.328], [2.343, -0.157, -0.204]],
+            [[1.447, -0.292, 0.450], [1.689, -0.922, 1.480], [2.410, 0.159, -0.342]],
+            [[1.447, -0.292, 0.450], [1.689, -0.922, 1.480], [2.410, 0.159, -0.342]],
+        ],
+        [
+            [[1.379, 0.265, 0.465], [1.562, 0.846, 1.328], [2.343, -0.157, -0.204]],
+            [[1.431, 0.445, 0.252], [1.664, 1.511, 0.802], [2.398, -0.367, -0.180]],
+            [[1.450, -0.311, 0.333], [1.698, -1.168, 1.157], [2.412, 0.327, -0.307]],
+        ],
+        [
+            [[1.379, 0.265, 0.465], [1.562, 0.846, 1.328], [2.343, -0.157, -0.204]],
+            [[1.413, 0.502, 0.124], [1.623, 1.658, 0.463], [2.389, -0.365, -0.136]],
+            [[1.428, 0.226, 0.457], [1.659, 0.770, 1.538], [2.394, -0.182, -0.358]],
+        ],
+    ],
+    # tau -15 to 0
+    [
+        [
+            [[1.427, -0.278, 0.458], [1.639, -0.939, 1.481], [2.395, 0.236, -0.297]],
+            [[1.427, -0.278, 0.458], [1.639, -0.939, 1.481], [2.395, 0.236, -0.297]],
+            [[1.435, -0.360, 0.352], [1.663, -1.171, 1.236], [2.402, 0.238, -0.334]],
+        ],
+        [
+            [[1.419, 0.234, -0.364], [1.640, 0.636, -1.220], [2.375, -0.031, 0.279]],
+            [[1.431, 0.445, 0.252], [1.664, 1.511, 0.802], [2.398, -0.367, -0.180]],
+            [[1.450, -0.311, 0.333], [1.698, -1.168, 1.157], [2.412, 0.327, -0.307]],
+        ],
+        [
+            [[1.405, 0.176, 0.211], [1.655, 0.533, 0.751], [2.354, -0.037, -0.217]],
+            [[1.413, 0.502, 0.124], [1.623, 1.658, 0.463], [2.389, -0.365, -0.136]],
+            [[1.221, 0.001, 0.969], [1.130, 0.063, 2.204], [2.330, -0.508, 0.441]],
+        ],
+    ],
+    # tau 0 to 15
+    [
+        [
+            [[1.373, -0.375, 0.312], [1.584, -1.159, 1.193], [2.334, 0.262, -0.397]],
+            [[1.458, -0.358, 0.250], [1.713, -1.296, 0.997], [2.448, 0.256, -0.365]],
+            [[1.435, -0.458, 0.238], [1.686, -1.456, 0.887], [2.409, 0.302, -0.234]],
+        ],
+        [
+            [[1.412, 0.241, -0.476], [1.594, 0.827, -1.502], [2.426, -0.136, 0.253]],
+            [[1.442, -0.139, 0.326], [1.679, -0.484, 1.094], [2.415, 0.120, -0.225]],
+            [[1.434, 0.200, -0.484], [1.654, 0.672, -1.600], [2.406, -0.137, 0.357]],
+        ],
+        [
+            [[1.405, 0.176, 0.211], [1.655, 0.533, 0.751], [2.354, -0.037, -0.217]],
+            [[1.428, 0.296, -0.452], [1.671, 1.029, -1.425], [2.385, -0.229, 0.299]],
+            [[1.221, 0.001, 0.969], [1.130, 0.063, 2.204], [2.330, -0.508, 0.441]],
+        ],
+    ],
+    # tau 15 to 30
+    [
+        [
+            [[1.422, -0.315, 0.420], [1.667, -1.061, 1.369], [2.369, 0.271, -0.295]],
+            [[1.442, -0.369, 0.339], [1.664, -1.261, 1.129], [2.428, 0.280, -0.267]],
+            [[1.434, -0.353, 0.374], [1.643, -1.166, 1.206], [2.428, 0.259, -0.220]],
+        ],
+        [
+            [[1.427, 0.020, 0.232], [1.645, 0.034, 0.766], [2.398, 0.022, -0.171]],
+            [[1.428, -0.257, 0.498], [1.660, -0.990, 1.452], [2.390, 0.338, -0.176]],
+            [[1.455, -0.245, 0.271], [1.718, -0.889, 0.775], [2.389, 0.308, -0.061]],
+        ],
+        [
+            [[1.425, 0.390, -0.373], [1.631, 1.166, -1.290], [2.400, -0.154, 0.334]],
+            [[1.415, 0.449, -0.316], [1.629, 1.407, -1.065], [2.382, -0.270, 0.247]],
+            [[1.221, 0.001, 0.969], [1.130, 0.063, 2.204], [2.330, -0.508, 0.441]],
+        ],
+    ],
+    # tau 30 to 45
+    [
+        [
+            [[1.439, -0.285, 0.387], [1.670, -0.947, 1.305], [2.419, 0.218, -0.302]],
+            [[1.445, -0.316, 0.370], [1.681, -1.111, 1.232], [2.425, 0.312, -0.251]],
+            [[1.443, -0.439, 0.191], [1.682, -1.526, 0.611], [2.410, 0.393, -0.103]],
+        ],
+        [
+            [[1.473, 0.020, 0.154], [1.772, 0.095, 0.501], [2.451, -0.072, -0.151]],
+            [[1.439, -0.356, 0.366], [1.658, -1.203, 1.234], [2.413, 0.283, -0.281]],
+            [[1.439, -0.524, -0.010], [1.667, -1.736, 0.020], [2.407, 0.385, -0.060]],
+        ],
+        [
+            [[1.055, 0.371, -0.851], [0.793, 0.926, -1.725], [2.239, 0.053, -0.627]],
+            [[1.415, 0.449, -0.316], [1.629, 1.407, -1.065], [2.382, -0.270, 0.247]],
+            [[1.432, 0.275, -0.448], [1.664, 0.916, -1.474], [2.389, -0.204, 0.337]],
+        ],
+    ],
+    # tau 45 to 60
+    [
+        [
+            [[1.435, -0.322, 0.391], [1.663, -1.055, 1.335], [2.413, 0.229, -0.312]],
+            [[1.432, -0.470, 0.133], [1.654, -1.554, 0.427], [2.402, 0.343, -0.084]],
+            [[1.440, -0.461, 0.074], [1.662, -1.475, 0.250], [2.444, 0.259, -0.029]],
+        ],
+        [
+            [[1.438, -0.226, 0.466], [1.671, -0.852, 1.499], [2.398, 0.255, -0.308]],
+            [[1.439, -0.356, 0.366], [1.658, -1.203, 1.234], [2.413, 0.283, -0.281]],
+            [[1.439, -0.524, -0.010], [1.667, -1.736, 0.020], [2.407, 0.385, -0.060]],
+        ],
+        [
+            [[0.946, 0.067, -1.140], [0.436, 0.162, -2.139], [2.251, -0.011, -1.123]],
+            [[1.426, 0.550, 0.022], [1.719, 1.747, 0.050], [2.380, -0.344, -0.091]],
+            [[1.424, 0.442, -0.249], [1.683, 1.461, -0.784], [2.376, -0.341, 0.178]],
+        ],
+    ],
+    # tau 60 to 75
+    [
+        [
+            [[1.441, -0.391, 0.301], [1.669, -1.309, 1.055], [2.423, 0.293, -0.257]],
+            [[1.432, -0.458, 0.256], [1.649, -1.511, 0.831], [2.400, 0.334, -0.179]],
+            [[1.411, -0.426, 0.199], [1.655, -1.534, 0.569], [2.360, 0.403, -0.104]],
+        ],
+        [
+            [[1.438, -0.226, 0.466], [1.671, -0.852, 1.499], [2.398, 0.255, -0.308]],
+            [[1.432, -0.458, 0.256], [1.649, -1.511, 0.831], [2.400, 0.334, -0.179]],
+            [[1.411, 0.470, -0.332], [1.619, 1.404, -1.114], [2.373, -0.197, 0.292]],
+        ],
+        [
+            [[1.432, 0.560, 0.071], [1.635, 1.751, 0.313], [2.406, -0.323, -0.090]],
+            [[1.426, 0.550, 0.022], [1.719, 1.747, 0.050], [2.380, -0.344, -0.091]],
+            [[1.424, 0.442, -0.249], [1.683, 1.461, -0.784], [2.376, -0.341, 0.178]],
+        ],
+    ],
+    # tau 75 to 90
+    [
+        [
+            [[1.430, -0.450, 0.233], [1.654, -1.479, 0.746], [2.401, 0.328, -0.136]],
+            [[1.427, -0.464, 0.194], [1.655, -1.530, 0.629], [2.399, 0.339, -0.095]],
+            [[1.441, -0.471, 0.010], [1.671, -1.568, 0.061], [2.408, 0.347, 0.007]],
+        ],
+        [
+            [[1.429, -0.508, 0.213], [1.662, -1.549, 0.835], [2.393, 0.253, -0.278]],
+            [[1.456, -0.463, 0.271], [1.738, -1.515, 0.818], [2.417, 0.255, -0.256]],
+            [[1.449, -0.529, -0.115], [1.641, -1.734, -0.331], [2.441, 0.361, 0.056]],
+        ],
+        [
+            [[1.432, 0.560, 0.071], [1.635, 1.751, 0.313], [2.406, -0.323, -0.090]],
+            [[1.456, -0.463, 0.271], [1.738, -1.515, 0.818], [2.417, 0.255, -0.256]],
+            [[1.449, -0.529, -0.115], [1.641, -1.734, -0.331], [2.441, 0.361, 0.056]],
+        ],
+    ],
+    # tau 90 to 105
+    [
+        [
+            [[1.435, -0.445, 0.158], [1.674, -1.559, 0.495], [2.418, 0.393, -0.057]],
+            [[1.428, -0.425, 0.236], [1.641, -1.453, 0.832], [2.406, 0.339, -0.223]],
+            [[1.446, -0.400, -0.323], [1.682, -1.232, -1.163], [2.422, 0.276, 0.237]],
+        ],
+        [
+            [[1.443, -0.450, 0.257], [1.654, -1.575, 0.695], [2.426, 0.424, 0.023]],
+            [[1.494, 0.214, 0.351], [1.769, 1.174, 1.069], [2.504, -0.511, -0.107]],
+            [[1.449, -0.529, -0.115], [1.641, -1.734, -0.331], [2.441, 0.361, 0.056]],
+        ],
+        [
+            [[1.443, -0.450, 0.257], [1.654, -1.575, 0.695], [2.426, 0.424, 0.023]],
+            [[1.494, 0.214, 0.351], [1.769, 1.174, 1.069], [2.504, -0.511, -0.107]],
+            [[1.421, 0.387, -0.340], [1.675, 1.238, -1.203], [2.361, -0.252, 0.325]],
+        ],
+    ],
+    # tau 105 to 120
+    [
+        [
+            [[1.438, -0.474, -0.072], [1.662, -1.599, -0.219], [2.422, 0.363, 0.057]],
+            [[1.458, -0.432, 0.080], [1.711, -1.536, 0.284], [2.441, 0.390, -0.080]],
+            [[1.414, -0.455, -0.056], [1.638, -1.523, -0.207], [2.403, 0.319, 0.038]],
+        ],
+        [
+            [[1.404, -0.549, -0.044], [1.620, -1.760, 0.035], [2.369, 0.356, -0.035]],
+            [[1.494, 0.214, 0.351], [1.769, 1.174, 1.069], [2.504, -0.511, -0.107]],
+            [[1.400, 0.188, -0.537], [1.611, 0.691, -1.648], [2.341, -0.200, 0.308]],
+        ],
+        [
+            [[1.404, -0.549, -0.044], [1.620, -1.760, 0.035], [2.369, 0.356, -0.035]],
+            [[1.421, 0.387, -0.340], [1.675, 1.238, -1.203], [2.361, -0.252, 0.325]],
+            [[1.421, 0.387, -0.340], [1.675, 1.238, -1.203], [2.361, -0.252, 0.325]],
+        ],
+    ],
+    # tau 120 to 135
+    [
+        [
+            [[1.443, -0.389, -0.175], [1.685, -1.410, -0.603], [2.435, 0.325, 0.181]],
+            [[1.433, -0.414, 0.148], [1.668, -1.363, 0.529], [2.413, 0.288, -0.145]],
+            [[1.439, -0.417, -0.084], [1.677, -1.391, -0.313], [2.415, 0.310, 0.087]],
+        ],
+        [
+            [[1.434, -0.507, -0.163], [1.659, -1.659, -0.533], [2.403, 0.353, 0.138]],
+            [[1.433, -0.414, 0.148], [1.668, -1.363, 0.529], [2.413, 0.288, -0.145]],
+            [[1.439, 0.113, -0.405], [1.648, 0.292, -1.604], [2.453, 0.009, 0.454]],
+        ],
+        [
+            [[1.434, -0.507, -0.163], [1.659, -1.659, -0.533], [2.403, 0.353, 0.138]],
+            [[1.430, 0.376, -0.282], [1.709, 1.290, -1.049], [2.356, -0.328, 0.327]],
+            [[1.430, 0.376, -0.282], [1.709, 1.290, -1.049], [2.356, -0.328, 0.327]],
+        ],
+    ],
+    # tau 135 to 150
+    [
+        [
+            [[1.432, -0.352, -0.373], [1.643, -1.171, -1.223], [2.403, 0.261, 0.272]],
+            [[1.434, -0.474, -0.072], [1.646, -1.545, -0.253], [2.425, 0.308, 0.091]],
+            [[1.439, -0.417, -0.084], [1.677, -1.391, -0.313], [2.415, 0.310, 0.087]],
+        ],
+        [
+            [[1.434, -0.507, -0.163], [1.659, -1.659, -0.533], [2.403, 0.353, 0.138]],
+            [[1.432, -0.499, -0.062], [1.660, -1.707, -0.193], [2.402, 0.410, 0.032]],
+            [[1.436, 0.162, -0.451], [1.665, 0.647, -1.549], [2.407, -0.215, 0.370]],
+        ],
+        [
+            [[1.434, -0.507, -0.163], [1.659, -1.659, -0.533], [2.403, 0.353, 0.138]],
+            [[1.432, -0.499, -0.062], [1.660, -1.707, -0.193], [2.402, 0.410, 0.032]],
+            [[1.430, 0.376, -0.282], [1.709, 1.290, -1.049], [2.356, -0.328, 0.327]],
+        ],
+    ],
+    # tau 150 to 165
+    [
+        [
+            [[1.439, -0.336, -0.388], [1.669, -1.154, -1.282], [2.407, 0.288, 0.275]],
+            [[1.417, -0.382, -0.193], [1.615, -1.257, -0.619], [2.399, 0.273, 0.127]],
+            [[1.444, -0.530, -0.060], [1.669, -1.737, 0.017], [2.410, 0.378, -0.178]],
+        ],
+        [
+            [[1.434, -0.248, -0.087], [1.671, -0.865, -0.239], [2.417, 0.190, 0.047]],
+            [[1.405, 0.223, -0.534], [1.654, 0.649, -1.601], [2.349, -0.208, 0.248]],
+            [[1.434, 0.187, -0.462], [1.664, 0.611, -1.587], [2.394, -0.113, 0.382]],
+        ],
+        [
+            [[1.434, -0.248, -0.087], [1.671, -0.865, -0.239], [2.417, 0.190, 0.047]],
+            [[1.405, 0.223, -0.534], [1.654, 0.649, -1.601], [2.349, -0.208, 0.248]],
+            [[1.430, 0.283, -0.424], [1.641, 0.875, -1.482], [2.383, -0.140, 0.390]],
+        ],
+    ],
+    # tau 165 to 180
+    [
+        [
+            [[1.415, -0.321, -0.476], [1.625, -0.968, -1.497], [2.384, 0.152, 0.297]],
+            [[1.423, -0.122, -0.400], [1.641, -0.463, -1.334], [2.392, 0.180, 0.304]],
+            [[1.449, -0.123, -0.533], [1.728, -0.206, -1.729], [2.440, -0.034, 0.380]],
+        ],
+        [
+            [[1.422, -0.013, -0.506], [1.642, -0.070, -1.659], [2.385, 0.032, 0.366]],
+            [[1.431, 0.156, -0.505], [1.633, 0.485, -1.672], [2.409, -0.049, 0.370]],
+            [[1.427, 0.134, -0.469], [1.634, 0.467, -1.610], [2.415, -0.150, 0.362]],
+        ],
+        [
+            [[1.431, 0.316, -0.426], [1.650, 0.965, -1.446], [2.396, -0.147, 0.354]],
+            [[1.422, 0.283, -0.467], [1.616, 0.822, -1.556], [2.397, -0.074, 0.366]],
+            [[1.422, 0.249, -0.457], [1.642, 0.758, -1.530], [2.381, -0.112, 0.367]],
+        ],
+    ],
+    ]
+
+# Side chain atoms of the most representative rotamer of every amino acid,
+# with their coordinates in the frame of the N, CA and C atoms of the residue
+# (see rebuild.sidechains)
+ROTAMERS = {
+    'ALA': (['CB'], [
+        [-0.523, -0.761, -1.213],
+        ]),
+    'ARG': (['CB', 'CG', 'CD', 'NE', 'CZ', 'NH1', 'NH2'], [
+        [-0.522, -0.778, -1.204],
+        [-2.035, -0.933, -1.216],
+        [-2.440, -2.080, -2.108],
+        [-1.845, -3.324, -1.637],
+        [-1.972, -4.497, -2.249],
+        [-2.680, -4.585, -3.366],
+        [-1.392, -5.575, -1.738],
+        ]),
+    'ASN': (['CB', 'CG', 'OD1', 'ND2'], [
+        [-0.419, -0.746, -1.264],
+        [-1.787, -1.384, -1.155],
+        [-2.125, -2.000, -0.153],
+        [-2.571, -1.274, -2.223],
+        ]),
+    'ASP': (['CB', 'CG', 'OD1', 'OD2'], [
+        [-0.461, -0.747, -1.204],
+        [-1.937, -1.120, -1.234],
+        [-2.540, -1.267, -0.150],
+        [-2.433, -1.280, -2.371],
+        ]),
+    'CYS': (['CB', 'SG'], [
+        [-0.500, -0.758, -1.228],
+        [-2.238, -1.203, -1.155],
+        ]),
+    'GLN': (['CB', 'CG', 'CD', 'OE1', 'NE2'], [
+        [-0.531, -0.791, -1.192],
+        [-1.966, -1.258, -1.021],
+        [-2.435, -2.135, -2.162],
+        [-1.712, -2.351, -3.142],
+        [-3.663, -2.640, -2.048],
+        ]),
+    'GLU': (['CB', 'CG', 'CD', 'OE1', 'OE2'], [
+        [-0.380, -0.711, -1.171],
+        [-1.651, -1.406, -0.819],
+        [-2.124, -2.146, -2.044],
+        [-2.363, -1.460, -3.046],
+        [-2.250, -3.377, -2.011],
+        ]),
+    'HIS': (['CB', 'CG', 'ND1', 'CD2', 'CE1', 'NE2'], [
+        [-0.452, -0.794, -1.223],
+        [-1.923, -0.929, -1.358],
+        [-2.631, -1.931, -0.731],
+        [-2.817, -0.226, -2.090],
+        [-3.908, -1.824, -1.050],
+        [-4.046, -0.798, -1.874],
+        ]),
+    'ILE': (['CB', 'CG1', 'CG2', 'CD1'], [
+        [-0.519, -0.776, -1.240],
+        [-2.033, -0.968, -1.126],
+        [0.185, -2.121, -1.369],
+        [-2.671, -1.512, -2.388],
+        ]),
+    'LEU': (['CB', 'CG', 'CD1', 'CD2'], [
+        [-0.511, -0.760, -1.226],
+        [-1.973, -1.222, -1.181],
+        [-2.347, -1.880, -2.499],
+        [-2.186, -2.174, -0.007],
+        ]),
+    'LYS': (['CB', 'CG', 'CD', 'CE', 'NZ'], [
+        [-0.519, -0.727, -1.237],
+        [-0.512, -2.223, -1.124],
+        [-1.097, -2.842, -2.372],
+        [-2.611, -2.848, -2.326],
+        [-3.165, -3.784, -3.348],
+        ]),
+    'MET': (['CB', 'CG', 'SD', 'CE'], [
+        [-0.533, -0.692, -1.202],
+        [-1.979, -1.166, -1.238],
+        [-2.467, -1.643, -2.918],
+        [-1.642, -3.207, -2.807],
+        ]),
+    'PHE': (['CB', 'CG', 'CD1', 'CD2', 'CE1', 'CE2', 'CZ'], [
+        [-0.471, -0.793, -1.178],
+        [-1.841, -1.305, -1.014],
+        [-2.070, -2.430, -0.260],
+        [-2.911, -0.659, -1.612],
+        [-3.351, -2.917, -0.115],
+        [-4.199, -1.140, -1.475],
+        [-4.421, -2.270, -0.718],
+        ]),
+    'PRO': (['CB', 'CG', 'CD'], [
+        [-0.507, -0.605, -1.320],
+        [-1.553, 0.299, -1.833],
+        [-1.372, 1.642, -1.192],
+        ]),
+    'SER': (['CB', 'OG'], [
+        [-0.530, -0.813, -1.177],
+        [-0.103, -0.351, -2.408],
+        ]),
+    'THR': (['CB', 'OG1', 'CG2'], [
+        [-0.493, -0.746, -1.254],
+        [-1.924, -0.692, -1.316],
+        [-0.046, -2.197, -1.214],
+        ]),
+    'TRP': (['CB', 'CG', 'CD1', 'CD2', 'NE1', 'CE2', 'CE3', 'CZ2', 'CZ3', 'CH2'], [
+        [-0.604, -0.712, -1.299],
+        [-0.460, -2.211, -1.336],
+        [0.650, -2.797, -1.863],
+        [-1.356, -3.126, -0.842],
+        [0.477, -4.118, -1.716],
+        [-0.705, -4.333, -1.120],
+        [-2.552, -3.125, -0.164],
+        [-1.213, -5.527, -0.739],
+        [-3.072, -4.353, 0.216],
+        [-2.400, -5.528, -0.063],
+        ]),
+    'TYR': (['CB', 'CG', 'CD1', 'CD2', 'CE1', 'CE2', 'CZ', 'OH'], [
+        [-0.461, -0.727, -1.252],
+        [-1.856, -1.257, -1.201],
+        [-2.212, -2.210, -0.262],
+        [-2.804, -0.840, -2.119],
+        [-3.492, -2.721, -0.219],
+        [-4.083, -1.343, -2.093],
+        [-4.424, -2.285, -1.142],
+        [-5.702, -2.797, -1.111],
+        ]),
+    'VAL': (['CB', 'CG1', 'CG2'], [
+        [-0.534, -0.765, -1.238],
+        [0.041, -2.140, -1.306],
+        [-2.058, -0.893, -1.144],
+        ]),
+    }
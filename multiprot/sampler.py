@@ -0,0 +1,661 @@
+"""
+Native replacement for the ranch executable
+
+Grows random CA-only linkers between rigid domains directly in numpy, for all
+the requested models at once, and returns the models in the same format as the
+Ranch wrapper:
+
+Calling and running this sampler returns a list of tuples of the form
+(full, [modeled_doms], out_symseq), see multiprot.ranch
+
+The chain is grown residue by residue away from an anchor domain (the symmetry
+core, the first domain specified as fixed, or the first domain of the chain),
+keeping the original coordinates of every fixed domain:
+
+-   every linker residue is placed 3.8 A away from the previous CA, with a
+    virtual bond angle and dihedral drawn from the statistics of disordered
+    regions (STATES)
+-   every free domain is attached by its terminal CA with a random orientation
+-   linkers leading to a fixed domain are closed onto its terminal CA
+-   proposals clashing with the atoms placed so far are rejected and drawn
+    again; models that cannot be grown are discarded
+
+"""
+
+import biskit as B
+import biskit.molUtils as MU
+import numpy as N
+import time
+
+import multiprot.ranch as R
+import multiprot.ensemble as E
+import multiprot.trace as TR
+from multiprot.errors import *
+
+
+#### Helper geometry functions ####
+
+def place(a, b, c, bond, theta, tau):
+    """
+    Places a fourth point d after the points a, b and c, such that |cd| = bond,
+    the angle bcd = theta and the dihedral abcd = tau (NeRF algorithm)
+
+    :param a, b, c: coordinates of the three previous points
+    :type a, b, c:  arrays (M x 3)
+    :param bond:    distance between c and d
+    :type bond:     float
+    :param theta:   bond angles, in radians
+    :type theta:    array (M)
+    :param tau:     dihedral angles, in radians
+    :type tau:      array (M)
+
+    :return: coordinates of d
+    :type return: array (M x 3)
+    """
+    bc = c - b
+    bc /= N.linalg.norm(bc, axis=1)[:,None]
+    n = N.cross(b - a, bc)
+    n /= N.linalg.norm(n, axis=1)[:,None]
+    m = N.cross(n, bc)
+
+    return c + bond * (-N.cos(theta)[:,None] * bc + \
+        (N.sin(theta) * N.cos(tau))[:,None] * m + \
+        (N.sin(theta) * N.sin(tau))[:,None] * n)
+
+def close(p, t, bond, rng):
+    """
+    Places a point d at distance 'bond' from both p and t, at a random position
+    of the circle where the two spheres intersect
+
+    :param p, t:    coordinates of the two points to bridge
+    :type p, t:     arrays (M x 3)
+    :param bond:    distance of d to p and t
+    :type bond:     float
+    :param rng:     random number generator
+    :type rng:      numpy.random.Generator
+
+    :return: coordinates of d, NaN where p and t are too far apart
+    :type return: array (M x 3)
+    """
+    pt = t - p
+    d = N.linalg.norm(pt, axis=1)
+    u = pt / d[:,None]
+
+    v = rng.normal(size=p.shape)
+    w = v - N.sum(v*u, axis=1)[:,None] * u
+    w /= N.linalg.norm(w, axis=1)[:,None]
+
+    with N.errstate(invalid='ignore'):
+        h = N.sqrt(bond**2 - (d/2)**2)
+
+    return p + pt/2 + h[:,None] * w
+
+def random_rotations(m, rng):
+    """
+    Uniformly distributed random rotation matrices (from random unit
+    quaternions)
+
+    :param m:   number of rotations
+    :type m:    int
+    :param rng: random number generator
+    :type rng:  numpy.random.Generator
+
+    :return: rotation matrices
+    :type return: array (m x 3 x 3)
+    """
+    u1, u2, u3 = rng.random((3, m))
+    q = N.array([N.sqrt(1-u1) * N.sin(2*N.pi*u2),
+                 N.sqrt(1-u1) * N.cos(2*N.pi*u2),
+                 N.sqrt(u1) * N.sin(2*N.pi*u3),
+                 N.sqrt(u1) * N.cos(2*N.pi*u3)])
+    x, y, z, w = q
+
+    return N.array([
+        [1-2*(y*y+z*z), 2*(x*y-z*w), 2*(x*z+y*w)],
+        [2*(x*y+z*w), 1-2*(x*x+z*z), 2*(y*z-x*w)],
+        [2*(x*z-y*w), 2*(y*z+x*w), 1-2*(x*x+y*y)]]).transpose(2,0,1)
+
+def superpose(x, y):
+    """
+    Rigid transformation (rotation and translation) that superposes the
+    coordinates x onto y with the minimum RMSD (Kabsch algorithm)
+
+    :param x, y:    coordinates of equivalent atoms
+    :type x, y:     arrays (... x K x 3)
+
+    :return: rotation matrices r and translations t, such that
+             x @ r^T + t ~ y
+    :type return: tuple of arrays (... x 3 x 3), (... x 3)
+    """
+    cx = x.mean(axis=-2)
+    cy = y.mean(axis=-2)
+    h = N.swapaxes(x - cx[...,None,:], -1, -2) @ (y - cy[...,None,:])
+    u, s, vt = N.linalg.svd(h)
+
+    d = N.sign(N.linalg.det(N.swapaxes(vt, -1, -2) @ N.swapaxes(u, -1, -2)))
+    dm = N.zeros(h.shape)
+    dm[...,0,0] = 1
+    dm[...,1,1] = 1
+    dm[...,2,2] = d
+
+    r = N.swapaxes(vt, -1, -2) @ dm @ N.swapaxes(u, -1, -2)
+    t = cy - (cx[...,None,:] @ N.swapaxes(r, -1, -2))[...,0,:]
+
+    return r, t
+
+def ca_trace(seq, ref):
+    """
+    Creates a CA-only model for a linker sequence, with the same profiles as
+    'ref' and all the coordinates set to 0
+
+    :param seq: linker sequence
+    :type seq:  str
+    :param ref: model used as template for the CA atom records
+    :type ref:  PDBModel
+
+    :return: one residue with a single CA atom for every amino acid in seq
+    :type return: PDBModel
+    """
+    n = len(seq)
+    i_ca = N.flatnonzero(ref.maskCA())[0]
+
+    r = ref.take([i_ca]*n, rindex=N.arange(n), cindex=N.array([0]))
+    r.xyz = N.zeros((n, 3))
+    r['residue_name'] = MU.single2longAA(seq)
+    r['residue_number'] = N.arange(1, n+1, dtype=ref['residue_number'].dtype)
+    r['insertion_code'] = ['']*n
+    r['alternate'] = ['']*n
+
+    return r
+
+
+class Sampler(R.Ranch):
+    """
+    A native replacement for the Ranch wrapper that grows the CA linkers in
+    numpy instead of running the ranch executable.
+
+    Usage
+    =====
+
+    >>> call = Sampler(dom1, linker1, dom2, linker2, ..., chains = {dom1:'chainA',
+                        dom2:'chainC'}, symmetry='p2', symtemplate=dom2,
+                        pool_sym='s', n=1000)
+    >>> models = call.run()
+
+    The parameters and the output are the same as for multiprot.ranch.Ranch.
+    """
+
+    BOND = 3.8          # distance between consecutive CA atoms
+    CLASH_ATOM = 3.0    # minimum distance of a linker CA to any domain atom
+    CLASH_CA = 3.8      # minimum distance between non-bonded CA atoms
+
+    # Virtual CA bond angle / dihedral states of disordered regions, as
+    # (weight, mean theta, sd theta, mean tau, sd tau), in degrees
+    STATES = [
+        (0.25,  91.0,  5.0,   50.0, 12.0),  # alpha
+        (0.45, 122.0,  9.0, -165.0, 25.0),  # extended
+        (0.30, 112.0, 10.0, -105.0, 30.0),  # polyproline II
+        ]
+
+    TRIES = 50      # proposals per residue or domain before discarding a model
+    BATCH = 256     # maximum number of models grown at once
+    ROUNDS = 20     # maximum number of batches
+
+    def __init__(self, *domains, chains={}, symmetry='p1', symtemplate=None,
+        symunit=None, pool_sym='m', fixed=[], n=10, workers=1, seed=None,
+        deadline=None, staging=None, debug=False, **kw):
+        """
+        Creates the variables that the sampler needs to run
+
+        See multiprot.ranch.Ranch for the description of the parameters
+
+        :param seed:    seed for the random number generator (default: None)
+        :type seed:     int
+        :param deadline:    time (see time.time()) after which no more rounds
+                            of models are grown (default: None, no limit)
+        :type deadline:     float
+        :param debug:   kept for compatibility with the Ranch wrapper
+        :type debug:    bool
+        """
+        self._init_input(domains, chains, symmetry, symtemplate, symunit,
+            pool_sym, fixed, n, workers, staging)
+
+        self.debug = debug
+        self.deadline = deadline
+        self.rng = N.random.default_rng(seed)
+        self.result = None
+
+        w = N.array([s[0] for s in self.STATES])
+        self.states = N.radians(N.array([s[1:] for s in self.STATES]))
+        self.weights = w / w.sum()
+
+    def _unit(self, k=0):
+        """
+        Creates the template model of one symmetric unit (or of the full chain
+        if there is no symmetry), with the linkers as CA atoms, and the
+        residue ranges of its domains
+
+        :param k:   index of the symmetric unit, whose symtemplate chain is
+                    taken as core
+        :type k:    int
+
+        :return: dictionary with the template model 'model', the residue
+                 ranges of the domains 'doms' as (start, end, fixed, core)
+                 and the index of the anchor domain 'anchor'
+        :type return: dict
+        """
+        parts = []
+        doms = []
+        r = 0   # residue counter
+        i = 0   # domain counter
+
+        for element in self.domains:
+            if isinstance(element, str):
+                part = ca_trace(element, self.doms_in[0])
+
+            else:
+                part = self.doms_in[i]
+                core = element is self.symtemplate
+
+                if core:
+                    lunit = len(self.symunit)
+                    part = part.takeResidues(list(range(k*lunit,(k+1)*lunit)))
+
+                doms.append((r, r+part.lenResidues(), self.fixed[i]=='yes',
+                    core))
+                i += 1
+
+            parts.append(part)
+            r += part.lenResidues()
+
+        model = parts[0].concat(*parts[1:])
+
+        # Single chain with consecutive residue and atom numbers
+        model._chainIndex = N.array([0])
+        model['chain_id'] = ['A']*len(model)
+        model['residue_number'] = (model.resMap() + 1).astype(N.int32)
+        model['serial_number'] = N.arange(1, len(model)+1, dtype=N.int32)
+
+        anchor = [j for j in range(len(doms)) if doms[j][3]] or \
+                 [j for j in range(len(doms)) if doms[j][2]] or [0]
+
+        return {'model':model, 'doms':doms, 'anchor':anchor[0]}
+
+    def _states(self, m):
+        """
+        Draws virtual bond angles and dihedrals
+
+        :return: theta, tau in radians
+        :type return: arrays (m)
+        """
+        s = self.states[self.rng.choice(len(self.weights), m, p=self.weights)]
+        theta = self.rng.normal(s[:,0], s[:,1])
+        tau = self.rng.normal(s[:,2], s[:,3])
+
+        return N.clip(theta, N.radians(80), N.radians(150)), tau
+
+    def _clashes(self, x, obst, thr2):
+        """
+        Checks every point in x against the obstacles of its own model
+
+        :param x:   points to check
+        :type x:    array (M x K x 3)
+        :param obst:    obstacles
+        :type obst:     array (M x A x 3)
+        :param thr2:    squared minimum distance for each obstacle
+        :type thr2:     array (A) or float
+
+        :return: True for the models with at least one clash
+        :type return: array of bool (M)
+        """
+        r = N.zeros(len(x), bool)
+        if not obst.shape[1] or not x.shape[1]:
+            return r
+
+        # Chunks of models, to keep the distance matrices small
+        step = max(1, 2**22 // (x.shape[1] * obst.shape[1]))
+        for i in range(0, len(x), step):
+            d2 = N.sum((x[i:i+step,:,None] - obst[i:i+step,None])**2, axis=-1)
+            r[i:i+step] = N.any(d2 < thr2, axis=(1,2))
+
+        return r
+
+    def _grow(self, unit, m):
+        """
+        Grows m models of one symmetric unit (or of the full chain)
+
+        :param unit:    template of the unit, as returned by _unit()
+        :type unit:     dict
+        :param m:       number of models to grow
+        :type m:        int
+
+        :return: coordinates of all the atoms of the unit, and a mask with the
+                 models that could be grown
+        :type return: array (m x atoms x 3), array of bool (m)
+        """
+        model = unit['model']
+        doms = unit['doms']
+
+        nres = model.lenResidues()
+        resmap = model.resMap()
+        rindex = N.append(model.resIndex(), len(model))
+
+        # Representative atom of every residue (CA, or the first atom)
+        ca = rindex[:-1].copy()
+        i_ca = N.flatnonzero(model.maskCA())
+        ca[resmap[i_ca]] = i_ca
+
+        # Domain each residue belongs to (-1 for linkers)
+        resdom = N.full(nres, -1)
+        for j, (start, end, fixed, core) in enumerate(doms):
+            resdom[start:end] = j
+
+        thr2 = N.where(resdom[resmap] < 0, self.CLASH_CA, self.CLASH_ATOM)**2
+
+        x = N.repeat(model.xyz[None], m, axis=0)
+        alive = N.ones(m, bool)
+
+        # Anchor and fixed domains keep their original coordinates
+        placed = N.zeros(nres, bool)
+        a = unit['anchor']
+        for j, (start, end, fixed, core) in enumerate(doms):
+            if j == a or fixed:
+                placed[start:end] = True
+
+        def atoms(res):
+            return N.flatnonzero(N.isin(resmap, N.flatnonzero(res)))
+
+        # Grow forward from the last residue of the anchor, then backward from
+        # its first residue
+        for d, cur in ((1, doms[a][1]-1), (-1, doms[a][0])):
+            r = cur + d
+            while 0 <= r < nres and alive.any():
+                j = resdom[r]
+                near = N.abs(N.arange(nres) - r) <= 2   # bonded neighbours
+                prev = [ca[cur - k*d] if 0 <= cur - k*d < nres else None \
+                    for k in (2, 1, 0)]
+
+                if j < 0:
+                    # Linker residue, possibly closing onto a fixed domain
+                    nxt = r
+                    while 0 <= nxt < nres and resdom[nxt] < 0:
+                        nxt += d
+                    target = None
+                    if 0 <= nxt < nres and placed[nxt]:
+                        target = x[:,ca[nxt]]
+                    nrem = abs(nxt - r)
+
+                    obst = atoms(placed & ~near)
+                    alive = self._place_residue(x, alive, prev, ca[r], obst,
+                        thr2[obst], target, nrem)
+                    placed[r] = True
+                    cur = r
+                    r += d
+
+                else:
+                    start, end, fixed, core = doms[j]
+                    first, last = (start, end-1) if d > 0 else (end-1, start)
+
+                    if placed[first]:
+                        # Fixed domain, reached by the closure of the linker
+                        b = N.linalg.norm(x[:,ca[first]] - x[:,prev[2]], axis=1)
+                        alive &= N.abs(b - self.BOND) < 0.5
+                    else:
+                        dom = N.arange(rindex[start], rindex[end])
+                        obst = N.flatnonzero(placed)
+                        alive = self._place_domain(x, alive, prev, dom,
+                            ca[first], ca[start:end][~near[start:end]],
+                            ca[obst[~near[obst]]], atoms(placed & ~near &
+                            (resdom < 0)))
+                        placed[start:end] = True
+
+                    cur = last
+                    r = last + d
+
+        return x, alive
+
+    def _propose(self, x, rows, prev):
+        """
+        Proposes the position of the next CA for the given rows, from the three
+        previous CA atoms (in the direction of growth)
+        """
+        m = len(rows)
+        if prev[0] is None or prev[1] is None:
+            # Not enough residues in the previous domain to define a
+            # dihedral... random direction
+            v = self.rng.normal(size=(m, 3))
+            v /= N.linalg.norm(v, axis=1)[:,None]
+            return x[rows, prev[2]] + self.BOND * v
+
+        theta, tau = self._states(m)
+        return place(x[rows, prev[0]], x[rows, prev[1]], x[rows, prev[2]],
+            self.BOND, theta, tau)
+
+    def _place_residue(self, x, alive, prev, i, obst, thr2, target, nrem):
+        """
+        Places the CA atom i of a linker residue in every model
+
+        :param x:       coordinates of all models, modified in place
+        :param alive:   models still being grown
+        :param prev:    atom indices of the three previous CA atoms
+        :param i:       atom index of the CA to place
+        :param obst:    atom indices of the obstacles
+        :param thr2:    squared minimum distances to the obstacles
+        :param target:  coordinates of the CA of the fixed domain the linker
+                        has to reach, if any
+        :param nrem:    number of bonds left to reach the target
+
+        :return: models still being grown
+        """
+        pending = alive.copy()
+
+        for t in range(self.TRIES):
+            rows = N.flatnonzero(pending)
+            if not len(rows):
+                break
+
+            if target is not None and nrem == 1:
+                p = close(x[rows, prev[2]], target[rows], self.BOND, self.rng)
+            else:
+                p = self._propose(x, rows, prev)
+
+            ok = ~N.any(N.isnan(p), axis=1)
+            if target is not None and nrem > 1:
+                ok &= N.linalg.norm(target[rows] - p, axis=1) < \
+                    0.95 * self.BOND * nrem
+            ok &= ~self._clashes(p[:,None], x[rows][:,obst], thr2)
+
+            x[rows[ok], i] = p[ok]
+            pending[rows[ok]] = False
+
+        return alive & ~pending
+
+    def _place_domain(self, x, alive, prev, dom, entry, dom_ca, obst_ca,
+        obst_linker):
+        """
+        Attaches a free domain by its terminal CA atom, with a random
+        orientation, in every model
+
+        :param x:       coordinates of all models, modified in place
+        :param alive:   models still being grown
+        :param prev:    atom indices of the three previous CA atoms
+        :param dom:     atom indices of the domain
+        :param entry:   atom index of the CA attached to the previous residue
+        :param dom_ca:  atom indices of the CA atoms of the domain to check
+        :param obst_ca: atom indices of the CA atoms placed so far to check
+        :param obst_linker: atom indices of the linker CAs placed so far, that
+                            are checked against all the atoms of the domain
+
+        :return: models still being grown
+        """
+        pending = alive.copy()
+        ref = x[0, dom] - x[0, entry]
+        i_ca = N.searchsorted(dom, dom_ca)
+
+        for t in range(self.TRIES):
+            rows = N.flatnonzero(pending)
+            if not len(rows):
+                break
+
+            p = self._propose(x, rows, prev)
+            rot = random_rotations(len(rows), self.rng)
+            xd = ref @ N.swapaxes(rot, 1, 2) + p[:,None]
+
+            ok = ~N.any(N.isnan(p), axis=1)
+            ok &= ~self._clashes(xd[:,i_ca], x[rows][:,obst_ca],
+                self.CLASH_CA**2)
+            ok &= ~self._clashes(xd, x[rows][:,obst_linker],
+                self.CLASH_ATOM**2)
+
+            x[rows[ok][:,None], dom] = xd[ok]
+            pending[rows[ok]] = False
+
+        return alive & ~pending
+
+    def _interunit(self, units, xs, alive):
+        """
+        Discards the models with clashes between the CA atoms of different
+        symmetric units, not counting the core
+        """
+        cas = []
+        for unit in units:
+            model = unit['model']
+            i_ca = N.flatnonzero(model.maskCA())
+            start, end = [d[:2] for d in unit['doms'] if d[3]][0]
+            resmap = model.resMap()[i_ca]
+            cas.append((i_ca, (resmap < start) | (resmap >= end)))
+
+        for k in range(len(units)):
+            for l in range(k+1, len(units)):
+                ik, free_k = cas[k]
+                il, free_l = cas[l]
+                alive &= ~self._clashes(xs[k][:,ik[free_k]], xs[l][:,il],
+                    self.CLASH_CA**2)
+                alive &= ~self._clashes(xs[k][:,ik[~free_k]],
+                    xs[l][:,il[free_l]], self.CLASH_CA**2)
+
+        return alive
+
+    def _symmetric(self, units, x0):
+        """
+        Replicates the grown unit 0 onto the other symmetric units, with the
+        transformations that superpose the core of unit 0 onto each core
+
+        :return: coordinates of every unit
+        :type return: list of arrays (m x atoms x 3)
+        """
+        u0 = units[0]
+        start0, end0 = [d[:2] for d in u0['doms'] if d[3]][0]
+        rindex0 = N.append(u0['model'].resIndex(), len(u0['model']))
+        a0, b0 = rindex0[start0], rindex0[end0]
+        ca0 = N.flatnonzero(u0['model'].maskCA()[a0:b0]) + a0
+
+        xs = [x0]
+        for unit in units[1:]:
+            model = unit['model']
+            rindex = N.append(model.resIndex(), len(model))
+            a, b = rindex[start0], rindex[end0]
+            ca = N.flatnonzero(model.maskCA()[a:b]) + a
+
+            if len(ca) != len(ca0):
+                raise InputError('The chains of the symtemplate must have the '\
+                    +'same number of CA atoms for symmetric models.')
+
+            r, t = superpose(u0['model'].xyz[ca0], model.xyz[ca])
+
+            x = N.repeat(model.xyz[None], len(x0), axis=0)
+            x[:,:a] = x0[:,:a0] @ r.T + t
+            x[:,b:] = x0[:,b0:] @ r.T + t
+            xs.append(x)
+
+        return xs
+
+    @TR.traced('sampler.sample')
+    def sample(self, n):
+        """
+        Grows n models
+
+        :param n:   number of models
+        :type n:    int
+
+        :return: models with the linkers as CA atoms, in the same format as
+                 the files produced by ranch
+        :type return: Ensemble
+        """
+        if self.symtemplate:
+            lunit = len(self.symunit)
+            nunits = self.symtemplate.lenResidues() // lunit
+            if nunits * lunit != self.symtemplate.lenResidues():
+                raise InputError('The symtemplate must be made of identical '+\
+                    'symmetric units.')
+            units = [self._unit(k) for k in range(nunits)]
+        else:
+            units = [self._unit()]
+
+        template = units[0]['model'].concat(*[u['model'] for u in units[1:]])
+        template.addChainId()
+        template['serial_number'] = N.arange(1, len(template)+1, dtype=N.int32)
+
+        coords = []
+        late = False
+        for i in range(self.ROUNDS):
+            missing = n - sum(len(c) for c in coords)
+            if missing <= 0:
+                break
+            late = self.deadline is not None and time.time() > self.deadline
+            if coords and late:
+                break
+            m = min(self.BATCH, max(2*missing, 16))
+
+            x0, alive = self._grow(units[0], m)
+            xs = [x0]
+
+            if len(units) > 1:
+                # symmetric pools replicate unit 0, asymmetric pools grow every
+                # unit, and mixed pools take each option for half of the models
+                sym = self.rng.random(m) < 0.5 if self.pool_sym=='m' else \
+                    N.full(m, self.pool_sym=='s')
+
+                xs = self._symmetric(units, x0) if sym.any() else \
+                    [x0] + [None]*(len(units)-1)
+
+                for k in range(1, len(units)):
+                    if not sym.all():
+                        xk, ak = self._grow(units[k], m)
+                        if xs[k] is None:
+                            xs[k] = xk
+                        else:
+                            xs[k][~sym] = xk[~sym]
+                        alive &= ak | sym
+
+                alive = self._interunit(units, xs, alive)
+
+            coords.append(N.concatenate(xs, axis=1)[alive][:missing])
+
+        coords = N.concatenate(coords)
+
+        if not len(coords):
+            raise RanchError('The native sampler was not able to grow any '+\
+                'model. The linkers may be too short to connect the domains.')
+
+        if len(coords) < n and not late:
+            print('    * Only %d of the %d models requested could be grown.' % \
+                (len(coords), n))
+
+        models = E.Ensemble.create(template, len(coords))
+        models.xyz[:] = coords
+
+        return models
+
+    def run(self):
+        """
+        Samples the models and extracts the embedded domains, like Ranch.run()
+
+        :return: one tuple (full, [modeled_doms], out_symseq) for every model
+        :type return: list of tuples
+        """
+        with TR.span('sampler.prepare'):
+            self._setup()
+        self.result = self.extract(self.sample(self.n))
+
+        return self.result
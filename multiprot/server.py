@@ -0,0 +1,241 @@
+"""
+Long-running multipr process that builds the constructs submitted to it
+
+Every call of the multipr script starts a new python process, which loads
+biskit, parses the pdb files of the domains and reads the configuration of
+the executables again. A server started with ``multipr --serve SOCKET`` keeps
+all of them between the constructs, which are submitted with
+``multipr --server SOCKET`` followed by the usual options:
+
+    multipr --serve /tmp/multiprot.sock --job-workers 2 --cache &
+    multipr --server /tmp/multiprot.sock --chain a.pdb TGTGTG b.pdb -n 10
+
+The server listens on a Unix socket and builds up to --job-workers
+constructs at the same time (see multiprot.jobs). A request is one line of
+JSON, with the command line arguments of the construct ('args'), the working
+directory they are relative to ('cwd') and optionally a 'name'. The server
+answers with one line of JSON for every change of status of the construct:
+'queued', 'running' and at last 'done' or 'failed', along with the report of
+the job (see jobs.run_job) and the files written.
+
+Only the standard library is imported here, so submitting a construct does not
+load the modules that build it.
+
+"""
+
+import concurrent.futures as F
+import json, os, queue, socket, socketserver, stat, threading
+
+
+def resolve(argv, cwd):
+    """
+    Makes the paths in the arguments of a construct absolute, as they are
+    relative to the directory of the client and not of the server
+
+    :param argv:    command line arguments of multipr
+    :type argv:     list of str
+    :param cwd:     directory the paths are relative to
+    :type cwd:      str
+
+    :return: the arguments with absolute paths of the existing files, and an
+             absolute --destination (cwd if none is given)
+    :type return: list of str
+    """
+    r = []
+    dest = False
+    for a in argv:
+        if dest:
+            a = os.path.join(cwd, a)
+            dest = False
+        elif a in ('-d', '--destination'):
+            dest = True
+        elif a.startswith('--destination='):
+            a = '--destination=' + os.path.join(cwd, a.split('=', 1)[1])
+        elif not a.startswith('-'):
+            # pdb files, possibly followed by a chain id (see options.divide)
+            parts = a.split(':')
+            if not os.path.isabs(parts[0]) and \
+                os.path.isfile(os.path.join(cwd, parts[0])):
+                a = ':'.join([os.path.join(cwd, parts[0])] + parts[1:])
+        r.append(a)
+
+    if not any(a in ('-d', '--destination') or \
+        a.startswith('--destination=') for a in argv):
+        r += ['--destination', cwd]
+
+    return r
+
+
+class Handler(socketserver.StreamRequestHandler):
+    """
+    Builds the construct of one connection and streams its status
+    """
+
+    def send(self, event):
+        self.wfile.write((json.dumps(event) + '\n').encode())
+        self.wfile.flush()
+
+    def handle(self):
+        server = self.server
+
+        try:
+            request = json.loads(self.rfile.readline().decode())
+            argv = resolve([str(a) for a in request['args']],
+                request.get('cwd') or os.getcwd())
+        except (ValueError, KeyError, TypeError) as e:
+            self.send({'status': 'failed', 'error': 'Invalid request: %s' % e})
+            return
+
+        name = str(request.get('name') or server.next_name())
+        events = queue.Queue()
+
+        def run():
+            events.put({'status': 'running', 'name': name})
+            try:
+                # Loaded by the first construct, with biskit and numpy
+                import multiprot.jobs as J
+
+                r = J.run_job((name, argv), server.defaults, server.registry,
+                    server.cache)
+                events.put(dict(r, status='done' if r['ok'] else 'failed'))
+            except Exception as e:
+                events.put({'status': 'failed', 'name': name,
+                    'error': '%s: %s' % (e.__class__.__name__, e)})
+
+        future = server.pool.submit(run)
+
+        try:
+            self.send({'status': 'queued', 'name': name})
+
+            event = {'status': 'queued'}
+            while event['status'] in ('queued', 'running'):
+                event = events.get()
+                self.send(event)
+
+        except (BrokenPipeError, ConnectionResetError):
+            # The client is gone, the construct is only built if it started
+            future.cancel()
+
+
+class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Server of multipr on a Unix socket
+
+    Usage
+    =====
+
+    >>> server = Server('/tmp/multiprot.sock', ['--workers', '4'], workers=2)
+    >>> server.serve_forever()
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path, defaults=[], workers=1, registry=None,
+        cache=None):
+        """
+        :param path:        path of the Unix socket
+        :type path:         str
+        :param defaults:    arguments of every construct (default: none)
+        :type defaults:     list of str
+        :param workers:     number of constructs built at the same time
+                            (default: 1)
+        :type workers:      int
+        :param registry:    registry of the pdb files shared by the
+                            constructs (default: None, a new one)
+        :type registry:     multiprot.structures.StructureRegistry
+        :param cache:       cache of the model pools (default: None)
+        :type cache:        multiprot.cache.PoolCache
+
+        :raise OSError: if another server is listening on path
+        """
+        if registry is None:
+            import multiprot.structures as S
+            registry = S.StructureRegistry()
+
+        self.defaults = defaults
+        self.registry = registry
+        self.cache = cache
+        self.pool = F.ThreadPoolExecutor(max_workers=max(workers, 1))
+        self.count = 0
+        self.lock = threading.Lock()
+
+        # Socket left behind by a server that did not stop cleanly
+        if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+            try:
+                with socket.socket(socket.AF_UNIX) as s:
+                    s.connect(path)
+                raise OSError('A server is already listening on %s.' % path)
+            except ConnectionRefusedError:
+                os.remove(path)
+
+        socketserver.UnixStreamServer.__init__(self, path, Handler)
+
+    def next_name(self):
+        """
+        :return: name of a construct submitted without one
+        :type return: str
+        """
+        with self.lock:
+            self.count += 1
+            return 'job%03d' % self.count
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        self.pool.shutdown(wait=False)
+        try:
+            os.remove(self.server_address)
+        except OSError:
+            pass
+
+
+def submit(path, argv, name=None, cwd=None):
+    """
+    Submits a construct to a server
+
+    :param path:    path of the Unix socket of the server
+    :type path:     str
+    :param argv:    command line arguments of the construct
+    :type argv:     list of str
+    :param name:    name of the construct (default: None, given by the server)
+    :type name:     str
+    :param cwd:     directory the paths of argv are relative to (default:
+                    None, the current directory)
+    :type cwd:      str
+
+    :return: status of the construct, as it changes (see Handler)
+    :type return: iterator of dicts
+    """
+    request = {'args': list(argv), 'cwd': os.path.abspath(cwd or os.getcwd()),
+        'name': name}
+
+    with socket.socket(socket.AF_UNIX) as s:
+        s.connect(path)
+        with s.makefile('rwb') as f:
+            f.write((json.dumps(request) + '\n').encode())
+            f.flush()
+
+            for line in f:
+                yield json.loads(line.decode())
+
+def client(path, argv):
+    """
+    Submits a construct to a server and prints its status
+
+    :return: exit code, 0 if the construct was built
+    :type return: int
+    """
+    event = {}
+    for event in submit(path, argv):
+        if event['status'] in ('queued', 'running'):
+            print('%s %s' % (event['name'], event['status']))
+
+    if event.get('status') != 'done':
+        print('Failed: %s' % event.get('error'))
+        return 1
+
+    for f in event['files']:
+        print(f)
+    print('%d model(s) built in %.2f seconds.' % (event['models'],
+        event['time']))
+
+    return 0
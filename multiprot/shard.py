@@ -0,0 +1,179 @@
+"""
+Shards of an ensemble built independently, e.g. as the tasks of a job array
+
+    multipr --chain a.pdb TGTG b.pdb -n 1000 --seed 7 --shard 1/4 -d out1
+    ...
+    multipr --chain a.pdb TGTG b.pdb -n 1000 --seed 7 --shard 4/4 -d out4
+    multipr --merge out1 out2 out3 out4 -d ensemble
+
+Shard i of K builds its part of the models requested (see part()), with
+seeds derived from the seed of the ensemble (see seed()), so it gives the
+same models wherever and whenever it runs, without any coordination with the
+other shards. Only the chain that produces the final models has a seed
+derived from the number of the shard as well. The chains modeled before it,
+with a single conformer, are the same in every shard, so the shards are
+parts of one ensemble around the same core (see Builder.call_ranch). It writes its models to its destination
+along with a manifest (shard.json). The merge copies the models of all the
+shards to a single directory, numbered after their position in the ensemble,
+and writes the manifest of the ensemble (manifest.json).
+
+"""
+
+import json, os, shutil
+import numpy as N
+
+from multiprot.errors import *
+
+MANIFEST = 'shard.json'         # manifest of a shard
+MERGED = 'manifest.json'        # manifest of the merged ensemble
+SEEDS = 2**30                   # seeds are drawn from [0, SEEDS), like ranch's
+
+
+def part(n, i, k):
+    """
+    :param n:   number of models of the ensemble
+    :type n:    int
+    :param i:   number of the shard, from 1 to k
+    :type i:    int
+    :param k:   number of shards
+    :type k:    int
+
+    :return: position of the first model of the shard in the ensemble (from
+             0), and number of models of the shard
+    :type return: (int, int)
+    """
+    size, extra = divmod(n, k)
+    start = (i - 1) * size + min(i - 1, extra)
+
+    return start, size + (i <= extra)
+
+def seed(s, *key):
+    """
+    :param s:   seed of the ensemble
+    :type s:    int
+    :param key: e.g. number of a shard, index of a chain
+    :type key:  int
+
+    :return: independent seed for the given key
+    :type return: int
+    """
+    ss = N.random.SeedSequence(s, spawn_key=key)
+    return int(ss.generate_state(1)[0] % SEEDS)
+
+def write_manifest(dest, shard, s, number, files, options=None):
+    """
+    Writes the manifest of a shard
+
+    :param dest:    directory of the shard
+    :type dest:     str
+    :param shard:   number of the shard and number of shards (i, k)
+    :type shard:    tuple of int
+    :param s:       seed of the ensemble
+    :type s:        int
+    :param number:  number of models of the ensemble
+    :type number:   int
+    :param files:   files written by the shard (models first)
+    :type files:    list of str
+    :param options: options of the construct, for the record (default: None)
+    :type options:  dict
+    """
+    start, n = part(number, *shard)
+    manifest = {'shard': shard[0], 'of': shard[1], 'seed': s,
+        'number': number, 'start': start,
+        'requested': n, 'files': [os.path.basename(f) for f in files],
+        'options': options or {}}
+
+    with open(os.path.join(dest, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+def read_manifests(dirs):
+    """
+    :param dirs:    directories of the shards
+    :type dirs:     list of str
+
+    :return: manifest of every shard, by shard number
+    :type return: dict
+
+    :raise InputError: if a directory has no manifest, or the shards are not
+                       of the same ensemble
+    """
+    r = {}
+    for d in dirs:
+        try:
+            with open(os.path.join(d, MANIFEST)) as f:
+                m = json.load(f)
+        except (OSError, ValueError) as e:
+            raise InputError('No shard manifest in %s: %s' % (d, e))
+
+        m['directory'] = d
+        first = next(iter(r.values()), m)
+        if any(m[k] != first[k] for k in ('seed', 'of', 'number')):
+            raise InputError('%s and %s are not shards of the same ensemble.' \
+                % (first['directory'], d))
+        if m['shard'] in r:
+            raise InputError('Shard %d is both in %s and %s.' % (m['shard'],
+                r[m['shard']]['directory'], d))
+
+        r[m['shard']] = m
+
+    return r
+
+def merge(dirs, dest, pref='mp'):
+    """
+    Copies the models of the shards to a single directory, where model j of
+    the ensemble (from 1) is pref_j.pdb, and the clashes of the models (see
+    Builder.write_pdbs) are joined. Shards may be merged even if some of
+    them are missing or built fewer models than requested, leaving gaps in
+    the numbering.
+
+    :param dirs:    directories of the shards
+    :type dirs:     list of str
+    :param dest:    directory of the ensemble
+    :type dest:     str
+
+    :return: manifest of the ensemble, with the 'models' (file, shard and
+             source file of every model) and the 'missing' shards
+    :type return: dict
+    """
+    shards = read_manifests(dirs)
+    first = next(iter(shards.values()))
+
+    models = []
+    clashes = []
+    for i in sorted(shards):
+        m = shards[i]
+        pdbs = [f for f in m['files'] if f.endswith('.pdb')]
+
+        names = {}
+        for j, f in enumerate(pdbs):
+            name = pref + '_%02d.pdb' % (m['start'] + j + 1)
+            shutil.copyfile(os.path.join(m['directory'], f),
+                os.path.join(dest, name))
+            models.append({'file': name, 'shard': i, 'source': f})
+            names[f] = name
+
+        f = os.path.join(m['directory'], pref + '_clashes.txt')
+        if os.path.exists(f):
+            with open(f) as fh:
+                lines = [line.split() for line in fh \
+                    if not line.startswith('#')]
+            clashes += [(names[a], b) for a, b in lines if a in names]
+
+    if clashes:
+        with open(os.path.join(dest, pref + '_clashes.txt'), 'w') as fh:
+            fh.write('# model clashes\n')
+            for name, n in clashes:
+                fh.write('%s %s\n' % (name, n))
+
+    manifest = {'seed': first['seed'], 'of': first['of'],
+        'number': first['number'], 'models': models,
+        'shards': [{'shard': i, 'directory': os.path.abspath(
+            shards[i]['directory']), 'requested': shards[i]['requested'],
+            'built': sum(m['shard'] == i for m in models)} \
+            for i in sorted(shards)],
+        'missing': [i for i in range(1, first['of'] + 1) if i not in shards]}
+
+    with open(os.path.join(dest, MERGED), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    return manifest
@@ -0,0 +1,128 @@
+"""
+Registry of the structures read from pdb files
+
+Every file is parsed once, and every request gets its own clone of the
+parsed model, so the models of different chains can still be told apart (and
+changed) independently. The parsed models can also be kept on disk, as
+pickles that load much faster than the pdb files, under a key made of the
+path, modification time and size of every file. A registry can be shared by
+several threads.
+
+Only the current version of every file is kept in memory, and at most 'size'
+models, the least recently used ones are dropped beyond it, so a long-running
+process (see multiprot.server) does not grow with every edited or new file.
+
+"""
+
+import collections, hashlib
+import os, pickle, tempfile, threading
+import biskit as B
+
+SIZE = 256      # default maximum number of parsed models kept in memory
+
+
+class StructureRegistry:
+    """
+    Parsed pdb files, in memory and optionally on disk
+
+    Usage
+    =====
+
+    >>> registry = StructureRegistry()
+    >>> m1 = registry.get('domAB1.pdb')     # parsed
+    >>> m2 = registry.get('domAB1.pdb')     # clone of the parsed model
+    """
+
+    def __init__(self, path=None, size=SIZE):
+        """
+        :param path:    directory of the pickled models (default: None, the
+                        models are only kept in memory)
+        :type path:     str
+        :param size:    maximum number of parsed models kept in memory
+                        (default: SIZE)
+        :type size:     int
+        """
+        self.path = path
+        self.size = size
+        # key : parsed model, the least recently used first
+        self.models = collections.OrderedDict()
+        self.current = {}   # absolute path : key of its version in memory
+        self.lock = threading.Lock()
+
+    def key(self, f):
+        """
+        :param f:   path of a pdb file
+        :type f:    str
+
+        :return: hexadecimal key of the current version of the file
+        :type return: str
+        """
+        st = os.stat(f)
+        h = hashlib.sha256()
+        h.update(('%s\0%d\0%d' % (os.path.abspath(f), st.st_mtime_ns,
+            st.st_size)).encode())
+
+        return h.hexdigest()
+
+    def load(self, f, key):
+        """
+        Reads a model from its pickle, or else parses the pdb file and writes
+        the pickle
+
+        :return: parsed model
+        :type return: PDBModel
+        """
+        if self.path is None:
+            return B.PDBModel(f)
+
+        cached = os.path.join(self.path, key + '.model')
+        try:
+            with open(cached, 'rb') as fh:
+                return pickle.load(fh)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            pass
+
+        m = B.PDBModel(f)
+
+        # Keep the atoms and coordinates in the pickle, which would otherwise
+        # be read again from the source file
+        m.forcePickle = True
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            fd, tmp = tempfile.mkstemp('.tmp', key, self.path)
+            with os.fdopen(fd, 'wb') as fh:
+                pickle.dump(m, fh, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, cached)
+        except OSError:
+            pass
+        m.forcePickle = False
+
+        return m
+
+    def get(self, f):
+        """
+        :param f:   path of a pdb file
+        :type f:    str
+
+        :return: new copy of the model of the file
+        :type return: PDBModel
+        """
+        key = self.key(f)
+        path = os.path.abspath(f)
+        with self.lock:
+            if key in self.models:
+                self.models.move_to_end(key)
+            else:
+                # The new version of a file replaces the old one
+                self.models.pop(self.current.get(path), None)
+                self.models[key] = self.load(f, key)
+                self.current[path] = key
+
+                while len(self.models) > self.size:
+                    old, m = self.models.popitem(last=False)
+                    self.current = {p: k for p, k in self.current.items() \
+                        if k != old}
+
+            m = self.models[key]
+
+        return m.clone()
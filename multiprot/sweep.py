@@ -0,0 +1,201 @@
+"""
+Sweep of the linkers of a construct
+
+Builds the variants of a construct in which every linker of its chains is
+replaced by the repeats of a sequence unit (e.g. TG, GS or EAAAK) cut to a
+given length, for every combination of unit and length:
+
+    multipr --chain a.pdb TGTG b.pdb -n 100 --sweep 10 20 30 40 50 60 \\
+        --sweep-units TG GS EAAAK --job-workers 4
+
+The variants are built as jobs of a single process (see multiprot.jobs), up
+to --job-workers of them at the same time, each one in a sub-directory of the
+destination named after it. They share the parsed pdb files, the domains
+embedded into their chains and the pdb files given to ranch (see
+multiprot.ranch.Staging), which only depend on the domains. Every variant is
+summarized in sweep.txt by the mean and standard deviation of the radius of
+gyration and of the end-to-end distance of its models, and the fraction of
+its models with clashes.
+
+"""
+
+import os, tempfile
+import numpy as N
+import biskit.tools as T
+
+import multiprot.options as O
+import multiprot.jobs as J
+import multiprot.ranch as R
+import multiprot.clash as CL
+import multiprot.ensemble as E
+from multiprot.errors import *
+
+UNITS = ('TG', 'GS', 'EAAAK')   # default sequence units of the linkers
+SWEEP = ('--sweep', '--sweep-units')    # options of the sweep itself
+
+
+def linker(unit, length):
+    """
+    :return: repeats of the sequence unit, cut to length residues
+    :type return: str
+    """
+    return (unit * (length // len(unit) + 1))[:length]
+
+def is_linker(a):
+    """
+    :return: True if an element of a --chain option is the sequence of a
+             linker, and not a pdb file possibly followed by a chain id (see
+             options.divide)
+    :type return: bool
+    """
+    return a.isalpha() and not os.path.isfile(a)
+
+def variants(argv, lengths, units=UNITS):
+    """
+    :param argv:    command line arguments of the construct
+    :type argv:     list of str
+    :param lengths: lengths of the linkers
+    :type lengths:  list of int
+    :param units:   sequence units of the linkers (default: UNITS)
+    :type units:    list of str
+
+    :return: (name, arguments) of every variant, with every linker of the
+             --chain options replaced, see jobs.load()
+    :type return: list of tuples (str, list of str)
+
+    :raise InputError: if a length is smaller than one residue
+    """
+    if [l for l in lengths if l < 1]:
+        raise InputError('The linkers have at least one residue: %s' % \
+            list(lengths))
+
+    r = []
+    for unit in units:
+        for length in lengths:
+            chain = False
+            args = []
+            for a in argv:
+                if a.startswith('-'):
+                    chain = a in ('--chain', '-c')
+                elif chain and is_linker(a):
+                    a = linker(unit, length)
+                args.append(a)
+
+            r.append(('%s%d' % (unit, length), args))
+
+    return r
+
+def _ends(model):
+    """
+    :return: indices of the CA atoms of a model, and the positions among them
+             of the first and last CA atom of every chain
+    :type return: tuple of numpy.arrays
+    """
+    ca = N.flatnonzero(model.maskCA())
+    chains = model.chainMap()[ca]
+    first = N.flatnonzero(N.concatenate(([True], chains[1:] != chains[:-1])))
+    last = N.concatenate((first[1:], [len(ca)])) - 1
+
+    return ca, first, last
+
+def statistics(models, cutoff=CL.CUTOFF, workers=1):
+    """
+    Statistics of the ensemble of models of a variant
+
+    :param models:  models of the variant
+    :type models:   Ensemble or list of PDBModels
+    :param cutoff:  clash distance in A, if the clashes of the models were
+                    not scored already (default: clash.CUTOFF)
+    :type cutoff:   float
+    :param workers: number of processes used to score the clashes (default: 1)
+    :type workers:  int
+
+    :return: mean and standard deviation of the radius of gyration of the CA
+             atoms ('rg', 'rg_sd') and of the distance between the first and
+             last CA atoms of the chains ('end_to_end', 'end_to_end_sd'), in A,
+             and fraction of the models with clashes ('clash_rate')
+    :type return: dict
+    """
+    if isinstance(models, E.Ensemble):
+        ca, first, last = _ends(models.topology)
+        x = N.concatenate([N.array(models.xyz[start:start+CL.CHUNK])[:, ca] \
+            for start in range(0, len(models), CL.CHUNK)])
+        clashes = models.info.get('clashes')
+    else:
+        ca, first, last = _ends(models[0])
+        x = N.array([m.xyz[ca] for m in models])
+        clashes = [m.info['clashes'] for m in models] \
+            if all('clashes' in m.info for m in models) else None
+
+    if clashes is None:
+        clashes = CL.score(models, cutoff, workers)
+
+    rg = CL.gyration(x)
+    d = N.linalg.norm(x[:, first] - x[:, last], axis=-1).mean(axis=-1)
+
+    return {'rg': float(rg.mean()), 'rg_sd': float(rg.std()),
+        'end_to_end': float(d.mean()), 'end_to_end_sd': float(d.std()),
+        'clash_rate': float(N.mean(N.asarray(clashes) > 0))}
+
+def run(argv, lengths, units=UNITS, workers=1, registry=None, cache=None):
+    """
+    Builds and summarizes every variant
+
+    :param argv:    command line arguments of multipr, with or without the
+                    options of the sweep and of the jobs
+    :type argv:     list of str
+    :param lengths: lengths of the linkers
+    :type lengths:  list of int
+    :param units:   sequence units of the linkers (default: UNITS)
+    :type units:    list of str
+    :param workers: number of variants built at the same time (default: 1)
+    :type workers:  int
+    :param registry:    registry of the pdb files (default: None, a new one)
+    :type registry:     multiprot.structures.StructureRegistry
+    :param cache:   cache of the model pools (default: None)
+    :type cache:    multiprot.cache.PoolCache
+
+    :return: report of every variant (see jobs.run_job), with its 'unit',
+             'length' and statistics (see statistics())
+    :type return: list of dicts
+    """
+    argv = O.without(argv, SWEEP + J.BATCH)
+    args = O.parsing(argv)
+
+    # Every variant in a sub-directory of the destination, see jobs.run_job
+    jobs = variants(O.without(argv, ('-d', '--destination')), lengths, units)
+    defaults = ['--destination', args.destination]
+
+    def analyse(models):
+        return statistics(models, workers=args.workers)
+
+    staging = R.Staging(tempfile.mkdtemp('', 'staging_', T.tempDir()))
+    try:
+        reports = J.run_jobs(jobs, defaults, workers, registry, cache,
+            staging, analyse)
+    finally:
+        T.tryRemove(staging.path, tree=True)
+
+    for r, (unit, length) in zip(reports, [(u, l) for u in units \
+        for l in lengths]):
+        r.update(unit=unit, length=length)
+
+    return reports
+
+def write_table(f, reports):
+    """
+    Writes the statistics of every variant to a text file, one variant per
+    line (the failed variants have no statistics)
+    """
+    keys = ['models', 'rg', 'rg_sd', 'end_to_end', 'end_to_end_sd',
+        'clash_rate']
+
+    with open(f, 'w') as fh:
+        fh.write('# variant unit length ' + ' '.join(keys) + '\n')
+        for r in reports:
+            values = ['%.2f' % r[k] if isinstance(r.get(k), float) else \
+                str(r.get(k, '-')) for k in keys]
+            if not r['ok']:
+                values = ['-'] * len(keys)
+            fh.write('%s %s %d %s\n' % (r['name'], r['unit'], r['length'],
+                ' '.join(values)))
@@ -0,0 +1,98 @@
+#############
+##  TESTING
+#############
+from multiprot.assembly import *
+import os
+import multiprot.testing as testing
+
+class TestAssembly(testing.AutoTest):
+    """
+    Test class
+    """
+
+    def setUp(self):
+        testpath = os.path.join(os.path.abspath(os.path.dirname(__file__)),
+            'testdata')
+        self.m1 = B.PDBModel(os.path.join(testpath, 'domAB1.pdb'))
+        self.m2 = B.PDBModel(os.path.join(testpath, '2z6o.pdb'))
+
+    def check_same(self, m, ref):
+        self.assertTrue(N.all(m.xyz == ref.xyz))
+        self.assertTrue(m.sequence() == ref.sequence())
+        self.assertTrue(N.all(m.resIndex() == ref.resIndex()))
+        self.assertTrue(N.all(m.chainIndex() == ref.chainIndex()))
+        for key in ['name', 'residue_name', 'chain_id', 'residue_number',
+            'serial_number']:
+            self.assertTrue(list(m[key]) == list(ref[key]), key)
+
+    def test_concat(self):
+        """
+        Whole models are joined like with PDBModel.concat
+        """
+        a = Assembly()
+        a.add(self.m1)
+        a.add(self.m2)
+        a.add(self.m1)
+
+        ref = self.m1.concat(self.m2, self.m1)
+        ref.addChainId()
+        ref['serial_number'] = N.arange(1, len(ref)+1)
+
+        self.check_same(a.build(), ref)
+
+    def test_merge(self):
+        """
+        Residues of several models are joined into a single renumbered chain
+        """
+        a = Assembly()
+        a.addResidues(self.m2, range(5, 20), split=False, renumber=True)
+        a.addResidues(self.m1, range(30, 40), newChain=False, split=False,
+            renumber=True)
+
+        ref = self.m2.takeResidues(list(range(5, 20))).concat(
+            self.m1.takeResidues(list(range(30, 40))))
+        while ref.lenChains() > 1:
+            ref.mergeChains(0)
+        ref.renumberResidues()
+        ref.addChainId()
+        ref['serial_number'] = N.arange(1, len(ref)+1)
+
+        m = a.build()
+        self.check_same(m, ref)
+        self.assertTrue(m.lenChains() == 1)
+
+    def test_terminal(self):
+        """
+        The terminal oxygen of a merged chain is removed, like with
+        PDBModel.mergeChains
+        """
+        a = Assembly()
+        a.add(self.m1, split=False)
+
+        ref = self.m1.clone()
+        ref.mergeChains(0)
+        ref['serial_number'] = N.arange(1, len(ref)+1)
+
+        m = a.build()
+        self.assertTrue(len(m) == len(self.m1) - 1)
+        self.assertTrue(list(m['name']) == list(ref['name']))
+        self.assertTrue(N.all(m.xyz == ref.xyz))
+
+    def test_profiles(self):
+        """
+        Given chain ids are kept and split the chains
+        """
+        i = self.m2.resIndex()[3]
+        ids = ['X'] * i + ['Y'] * (len(self.m2) - i)
+        a = Assembly()
+        a.add(self.m2, chain_id=ids)
+        m = a.build(chainIds=False, serials=False)
+
+        self.assertTrue(list(m['chain_id']) == ids)
+        self.assertTrue(list(m.chainIndex()) == [0, i])
+        self.assertTrue(N.all(m['serial_number'] == self.m2['serial_number']))
+
+
+if __name__ == '__main__':
+
+    testing.localTest(debug=False)
@@ -0,0 +1,403 @@
+#############
+##  TESTING        
+#############
+from multiprot.builder import *
+import multiprot.parseChains as C
+import multiprot.testing as testing
+
+class TestBuilder(testing.AutoTest):
+    """
+    Test class for argument parsing
+
+    Test for the examples 1, 4, 5 and 
+    ONLY SINGLE CHAINS FOR NOW
+    """
+
+    tempdir = None
+    testpath = None
+    mono1 = None
+    mono2 = None
+    mono3 = None
+    dimer1 = None
+    dimer2 = None
+    dimer3 = None
+    trimer = None
+    linker = None
+    argstring1 = None
+    argstring4 = None
+    argstring5 = None
+    argstring2ch = None
+    argstring2chfixed = None
+    argstring3ch = None
+    builder1 = None
+    builder4 = None
+    builder5 = None
+    builder2ch = None
+    builder2chfixed = None
+    builder3ch = None
+
+    def setUp(self):
+
+        self.testpath = self.testpath or \
+            os.path.join(os.path.abspath(os.path.dirname(__file__)), 'testdata')
+
+        self.mono1 = self.mono1 or os.path.join(self.testpath, '2z6o.pdb')
+        self.mono2 = self.mono2 or os.path.join(self.testpath, 'histone.pdb')
+        self.mono3 = self.mono3 or os.path.join(self.testpath, '2h5q.pdb')
+        self.dimer1 = self.dimer1 or os.path.join(self.testpath, 'domAB1.pdb')
+        self.dimer2 = self.dimer2 or os.path.join(self.testpath, 'domAB2.pdb')
+        self.dimer3 = self.dimer3 or os.path.join(self.testpath, '2qud.pdb')
+        self.trimer = self.trimer or os.path.join(self.testpath, '2ei4.pdb')
+
+        self.linker = self.linker or 'TG'*15
+
+        #### SINGLE CHAIN EXAMPLES
+        # Assemble argument strings
+        self.argstring1 = self.argstring1 or \
+                '--chain '+self.mono1+' '+self.linker+' '+self.mono2
+        
+        # Careful with the names of fixed domains... cannot be repeated in the chain
+        # for repeating pdbs that are not fixed or are not symtemplates there
+        # should be no problem
+        self.argstring4 = self.argstring4 or \
+                '--chain '+self.dimer1+':A '+self.linker+' '+\
+                self.dimer2+':B --fixed '+self.dimer1
+        
+        #### SYMMETRY EXAMPLE
+        # Careful with symtemplate name... cannot be repeated in the chain
+        self.argstring5 = self.argstring5 or '--chain '+self.dimer1+' '+\
+                self.linker+' '+self.dimer2+':A --symmetry p2 --symtemplate '\
+                +self.dimer1+' --poolsym s'
+
+        #### DOUBLE CHAIN
+        # Not fixed
+        self.argstring2ch = self.argstring2ch or '--chain '+self.dimer1+':A '+\
+                self.linker+' '+self.dimer3+':A '+self.linker+' '+self.dimer2+':A '+\
+                '--chain '+self.dimer1+':B '+self.linker+' '+self.dimer3+':B '+\
+                self.linker+' '+self.dimer2+':B'
+
+        # Fixed
+        # The model is the same as the previous one, but the coordinates of the
+        # dimers will be fixed
+        self.argstring2chfixed = self.argstring2chfixed or '--chain '+self.dimer1+\
+                ':A '+self.linker+' '+self.dimer3+':A '+self.linker+' '+\
+                self.dimer2+':A '+'--chain '+self.dimer1+':B '+self.linker+' '+\
+                self.dimer3+':B '+self.linker+' '+self.dimer2+':B --fixed '+\
+                self.dimer1+' '+self.dimer2+' '+self.dimer3
+
+        #### TRIPLE CHAIN
+        self.argstring3ch = self.argstring3ch or '--chain '+self.trimer+':A '+\
+                self.linker+' '+self.mono1+' --chain '+self.trimer+':B '+\
+                self.linker+' '+self.mono2+' --chain '+self.trimer+':C '+\
+                self.linker+' '+self.mono3
+
+        # Create Chain objects and Builder instance
+        args1 = C.parsing(self.argstring1.split())
+        CHAINS1 = C.create_chains(args1)
+        self.builder1 = Builder(CHAINS1,args1.debug,args1.number,
+            args1.destination)
+
+        args4 = C.parsing(self.argstring4.split())
+        CHAINS4 = C.create_chains(args4)
+        self.builder4 = Builder(CHAINS4,args4.debug,args4.number,
+            args4.destination)
+
+        args5 = C.parsing(self.argstring5.split())
+        CHAINS5 = C.create_chains(args5)
+        self.builder5 = Builder(CHAINS5,args5.debug,args5.number,
+            args5.destination)
+
+        args2ch = C.parsing(self.argstring2ch.split())
+        CHAINS2ch = C.create_chains(args2ch)
+        self.builder2ch = Builder(CHAINS2ch,args2ch.debug,args2ch.number,
+            args2ch.destination)
+
+        args2chfixed = C.parsing(self.argstring2chfixed.split())
+        CHAINS2chfixed = C.create_chains(args2chfixed)
+        self.builder2chfixed = Builder(CHAINS2chfixed,args2chfixed.debug,
+            args2chfixed.number,args2chfixed.destination)
+
+        args3ch = C.parsing(self.argstring3ch.split())
+        CHAINS3ch = C.create_chains(args3ch)
+        self.builder3ch = Builder(CHAINS3ch,args3ch.debug,args3ch.number,
+            args3ch.destination)
+
+        ## ADD TEST WITH 3 CHAINS AND SYMMETRY
+    
+    # PASSED
+    def test_find_paired(self):
+        '''
+        Test the output of find_paired method, which should return a dictionary 
+        of the form 
+
+        paired_to_i = {j:[pair_ij1,pair_ij2],k:[pair_ik1],...}
+
+        Where 
+        - i is the index of the chain whose bound chains will be found
+        - j and k are indexes of bound chains
+        - pair_ij1 and pair_ij2 are the names of the domains that bind chains i and j,
+          in the form:
+            pair_ijx = [(pdb_namei, chain_idi),(pdb_namej, chain_idj)]
+        - pair_ik1 has the names of the domain that binds chains i and k, in the
+          form:
+            pair_ikx = [(pdb_namei, chain_idi),(pdb_namek, chain_idk)]
+
+        This test method tests all the example cases in the setUp method
+        
+        '''
+
+        # Only one chain with linkers, no chains paired
+        paired_to1 = self.builder1.find_paired(0)
+        self.assertTrue(len(paired_to1)==0)
+
+        paired_to4 = self.builder4.find_paired(0)
+        self.assertTrue(len(paired_to4)==0)
+
+        # Symmetric chains, no paired chains taken into account
+        paired_to5 = self.builder5.find_paired(0)
+        self.assertTrue(len(paired_to5)==0)
+
+        # Two chains with linkers
+        # Running method on chain 0
+        paired_to2ch0 = self.builder2ch.find_paired(0)
+        pair1 = [(self.dimer1,'A'),(self.dimer1,'B')]
+        pair2 = [(self.dimer3,'A'),(self.dimer3,'B')]
+        pair3 = [(self.dimer2,'A'),(self.dimer2,'B')]
+        self.assertTrue(paired_to2ch0=={1:[pair1,pair2,pair3]}, paired_to2ch0)
+        # Running method on chain 1
+        paired_to2ch1 = self.builder2ch.find_paired(1)
+        pair1 = [(self.dimer1,'B'),(self.dimer1,'A')]
+        pair2 = [(self.dimer3,'B'),(self.dimer3,'A')]
+        pair3 = [(self.dimer2,'B'),(self.dimer2,'A')]
+        self.assertTrue(paired_to2ch1=={0:[pair1,pair2,pair3]}, paired_to2ch1)
+
+        # Three chains with linkers
+        # Running method on chain 0
+        paired_to3ch0 = self.builder3ch.find_paired(0)
+        pair1 = [(self.trimer,'A'),(self.trimer,'B')]
+        pair2 = [(self.trimer,'A'),(self.trimer,'C')]
+        self.assertTrue(paired_to3ch0=={1:[pair1],2:[pair2]})
+        # Running on chain 1
+        paired_to3ch1 = self.builder3ch.find_paired(1)
+        pair1 = [(self.trimer,'B'),(self.trimer,'A')]
+        pair2 = [(self.trimer,'B'),(self.trimer,'C')]
+        self.assertTrue(paired_to3ch1=={0:[pair1],2:[pair2]})
+        # Running on chain 2
+        paired_to3ch2 = self.builder3ch.find_paired(2)
+        pair1 = [(self.trimer,'C'),(self.trimer,'A')]
+        pair2 = [(self.trimer,'C'),(self.trimer,'B')]
+        self.assertTrue(paired_to3ch2=={0:[pair1],1:[pair2]})
+
+    def test_schedule(self):
+        '''
+        Chains bound to the modeled ones are modeled together, unless they
+        are bound to each other through a domain that was not modeled yet
+        '''
+        first = B.PDBModel(self.mono1)
+
+        # Chains 1 and 2 only bound to each other through the trimer, which is
+        # modeled with chain 0
+        self.builder3ch.CHAINS[0].modeled = True
+        self.builder3ch.full_chains = [[first]]
+        self.assertTrue(self.builder3ch.schedule([0])==[1,2])
+
+        # Chains 1 and 2 also bound through dimer2
+        argstring = '--chain '+self.trimer+':A '+self.linker+' '+self.mono1+\
+            ' --chain '+self.trimer+':B '+self.linker+' '+self.dimer2+':A'+\
+            ' --chain '+self.trimer+':C '+self.linker+' '+self.dimer2+':B'
+        args = C.parsing(argstring.split())
+        builder = Builder(C.create_chains(args), args.debug, args.number,
+            args.destination)
+        builder.CHAINS[0].modeled = True
+        builder.full_chains = [[first]]
+        self.assertTrue(builder.schedule([0])==[1])
+
+        builder.CHAINS[1].modeled = True
+        self.assertTrue(builder.schedule([0,1])==[2])
+
+        builder.CHAINS[2].modeled = True
+        self.assertTrue(builder.schedule([0,1,2])==[])
+
+    def test_merge(self):
+        '''
+        The chains modeled along with the lead chain of a batch are added to
+        its models, without the domains they took from the shared chains
+        '''
+        dimer = B.PDBModel(self.dimer1)
+        other = B.PDBModel(self.mono1)
+        lead = B.PDBModel(self.mono3).takeChains([0])
+        sibling = B.PDBModel(self.mono2)
+
+        # The shared chains are dimer (A, B) and other. The sibling took chain
+        # B of dimer and the lead chain took other
+        core = dimer.takeChains([0]).concat(other)
+        model_j = sibling.concat(core)
+        model = lead.concat(dimer)
+
+        models = E.Ensemble.from_models([model, model])
+        models.xyz[1] += 1.
+        merged = self.builder1.merge(models,
+            [(model_j, core, [dimer.takeChains([1])])])
+
+        seq = lead.sequence() + sibling.sequence() + \
+            dimer.takeChains([0]).sequence()
+        self.assertTrue(merged[0].sequence()==seq)
+        self.assertTrue(merged[0].lenChains()==3)
+
+        # Only the atoms of the lead chain model move between conformers
+        n = len(lead)
+        moved = N.any(merged[1].xyz != merged[0].xyz, axis=1)
+        self.assertTrue(N.all(moved[:n]) and not N.any(moved[n:n+len(sibling)]))
+
+    def test_siblings(self):
+        '''
+        Clashes between the chains of a batch are found in the merged model,
+        but not the ones within a chain
+        '''
+        m = B.PDBModel(self.mono1)
+        far = m.clone()
+        far.xyz = far.xyz + 100.
+        close = m.clone()
+        close.xyz = close.xyz + 1.
+
+        self.builder1.check_siblings(m.concat(far), [len(m), len(far)])
+        with self.assertRaises(ClashError):
+            self.builder1.check_siblings(m.concat(close), [len(m), len(close)])
+
+    def test_star(self):
+        '''
+        Four chains bound to a tetramer, the last three modeled at the same
+        time once the first one placed the tetramer
+        '''
+        tetramer = os.path.join(self.testpath, '5agc.pdb')
+        mono4 = os.path.join(self.testpath, '1it2_A.pdb')
+        linker = 'TG'*10
+        argstring = ' '.join('--chain %s:%s %s %s' % (tetramer, c, linker, d) \
+            for c, d in zip('ABCD', [self.mono1, self.mono2, mono4, mono4]))
+
+        args = C.parsing(argstring.split())
+        builder = Builder(C.create_chains(args), False, 2, '.', workers=2,
+            backend='native', rebuild='native', seed=1)
+        self.assertTrue(builder.schedule([0])==[1,2,3])
+
+        models = builder.run()
+        self.assertTrue(len(models)==2)
+        self.assertTrue(all(m.lenChains()==4 for m in models))
+        self.assertTrue(all(ch.modeled for ch in builder.CHAINS))
+
+    def test_select(self):
+        '''
+        With oversampling, the models without CA clashes are kept first
+        '''
+        m = B.PDBModel(self.mono1)
+        ca = N.flatnonzero(m.maskCA())
+        clashing = m.clone()
+        clashing.xyz[ca[0]] = clashing.xyz[ca[50]]
+        models = [(clashing, [{}], ''), (m, [{}], '')]
+
+        builder = Builder(self.builder1.CHAINS, False, 1, '.', oversample=2)
+        self.assertTrue(builder.select(models, 1)[0][0] is m)
+
+        builder.oversample = 1
+        self.assertTrue(builder.select(models, 1)[0][0] is clashing)
+
+    def test_seed(self):
+        '''
+        The same seed gives the same models
+        '''
+        def build(seed):
+            args = C.parsing(self.argstring1.split() + ['-n', '2'])
+            builder = Builder(C.create_chains(args), False, 2, '.',
+                backend='native', rebuild='native', seed=seed)
+            return builder.run()
+
+        a, b, c = build(3), build(3), build(4)
+        self.assertTrue(N.all(a.xyz[:] == b.xyz[:]))
+        self.assertFalse(N.all(a.xyz[:] == c.xyz[:]))
+
+    def test_shard(self):
+        '''
+        The shards of a two-chain ensemble share the first chain, and only
+        the models of the last chain differ
+        '''
+        def build(shard):
+            args = C.parsing(self.argstring2ch.split() + ['-n', '2'])
+            builder = Builder(C.create_chains(args), False, 2, '.',
+                backend='native', rebuild='native', seed=3, shard=shard)
+            return builder, builder.run()
+
+        (a, ma), (b, mb) = build(1), build(2)
+        self.assertTrue(N.all(a.full_chains[0][0].xyz == \
+            b.full_chains[0][0].xyz))
+        self.assertFalse(N.all(ma[0].xyz == mb[0].xyz))
+
+    def test_unit_transforms(self):
+        '''
+        Copies of a symmetric unit are superposed on the first one, and units
+        that differ are rebuilt
+        '''
+        unit = B.PDBModel(self.mono1)
+        l = unit.lenResidues()
+
+        # Second unit rotated 90 degrees around z and shifted
+        r = N.array([[0.,-1.,0.],[1.,0.,0.],[0.,0.,1.]])
+        copy = unit.clone()
+        copy.xyz = unit.xyz @ r.T + [10., 0., 0.]
+
+        rt = self.builder1.unit_transforms(unit.concat(copy), l)
+        self.assertTrue(rt is not None)
+        self.assertTrue(N.allclose(unit.xyz @ rt[0][0].T + rt[1][0], copy.xyz,
+            atol=1e-3))
+
+        # Not copies: moved atoms, or a single unit
+        copy.xyz[N.flatnonzero(copy.maskCA())[0]] += 1.
+        self.assertTrue(self.builder1.unit_transforms(unit.concat(copy),
+            l) is None)
+        self.assertTrue(self.builder1.unit_transforms(unit, l) is None)
+
+    # PASSED
+    def test_embed_symmetric(self):
+        '''
+        Tests builder.embed_symmetric()
+        '''
+        mod1 = B.PDBModel(os.path.join(self.testpath, 'chain01_2ch.pdb'))
+        emb_mod = mod1.takeChains([1,2,3])
+        j_dom = mod1.takeChains([0])
+        full_emb = self.builder1.embed_symmetric([j_dom],[emb_mod])
+
+        self.assertTrue(len(full_emb[0])==9267, str(len(full_emb)))
+
+    # PASSED  
+    def test_extract_embedded(self):
+        """
+        Tests the builder.extract_embedded method
+        """
+        
+        mod1 = B.PDBModel(os.path.join(self.testpath, 'chain01_2ch.pdb'))
+        emb_mod = mod1.takeChains([1,2,3])
+        j_dom = mod1.takeChains([0])
+        full_emb = self.builder1.embed_symmetric([j_dom],[emb_mod])
+        container_seq = j_dom.sequence()[:2] + emb_mod.sequence() +\
+            j_dom.sequence()[2:]
+
+        full = full_emb[0]
+        while full.lenChains()>1:
+            full.mergeChains(0)
+
+        # emb_mod starts after the first two residues of j_dom
+        chain01_2ch_reb = self.builder1.extract_embedded(full, emb_mod, 
+            container_seq, 2)
+
+        # chain01_2ch_reb.writePdb('testdata/chain01_testrebuilt.pdb')
+
+        self.assertTrue(chain01_2ch_reb.lenChains()==4)
+        self.assertTrue(chain01_2ch_reb.sequence()==mod1.sequence())
+        # The length is 9747 instead of 9750 because Biskit does not write OXT
+        # And pulchra keeps it only for the rebuilt chain
+        # self.assertTrue(len(chain01_2ch_reb)==9747, len(chain01_2ch_reb))
+        
+
+
+if __name__ == '__main__':
+
+    testing.localTest(debug=False)
@@ -0,0 +1,81 @@
+#############
+##  TESTING
+#############
+from multiprot.cache import *
+import tempfile
+import biskit as B
+import biskit.tools as T
+import multiprot.testing as testing
+
+class TestCache(testing.AutoTest):
+    """
+    Test class
+    """
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp('', 'cache_', T.tempDir())
+        self.models = tempfile.mkdtemp('', 'models_', T.tempDir())
+
+        self.paths = []
+        for i in range(5):
+            f = os.path.join(self.models, '%05d.pdb' % i)
+            with open(f, 'w') as fh:
+                fh.write('REMARK %d\n' % i + 'ATOM\n' * 20 + 'END\n')
+            self.paths.append(f)
+
+    def tearDown(self):
+        T.tryRemove(self.path, tree=True)
+        T.tryRemove(self.models, tree=True)
+
+    def test_key(self):
+        """
+        The key depends on the coordinates up to the pdb precision
+        """
+        testpath = os.path.join(os.path.abspath(os.path.dirname(__file__)),
+            'testdata')
+        dom = B.PDBModel(os.path.join(testpath, '2z6o.pdb'))
+        moved = dom.clone()
+        moved.xyz = moved.xyz + 0.0001
+
+        key = pool_key('GGG', [dom], ' -i')
+        self.assertTrue(key == pool_key('GGG', [moved], ' -i'))
+
+        moved.xyz = moved.xyz + 0.1
+        self.assertTrue(key != pool_key('GGG', [moved], ' -i'))
+        self.assertTrue(key != pool_key('GGG', [dom], ' -i -f=yes'))
+
+    def test_get_add(self):
+        """
+        The models are returned in the order they were added
+        """
+        cache = PoolCache(self.path)
+        self.assertTrue(cache.get('a', 3) == [])
+
+        cache.add('a', self.paths[:2])
+        cache.add('a', self.paths[2:])
+
+        cached = cache.get('a', 4)
+        self.assertTrue(len(cached) == 4)
+        with open(cached[2]) as f:
+            self.assertTrue(f.readline() == 'REMARK 2\n')
+
+    def test_evict(self):
+        """
+        The least recently used pools are removed first
+        """
+        size = sum(os.path.getsize(f) for f in self.paths)
+        cache = PoolCache(self.path, size=2 * size)
+
+        cache.add('a', self.paths)
+        cache.add('b', self.paths)
+        os.utime(cache.entry('a'), (0, 0))
+        os.utime(cache.entry('b'), (1, 1))
+        cache.get('a', 1)
+
+        cache.add('c', self.paths)
+        self.assertTrue(sorted(os.listdir(self.path)) == ['a', 'c'])
+
+
+if __name__ == '__main__':
+
+    testing.localTest(debug=False)
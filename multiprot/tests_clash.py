@@ -0,0 +1,86 @@
+#############
+##  TESTING
+#############
+from multiprot.clash import *
+import os, tempfile
+import biskit as B
+import biskit.tools as T
+import multiprot.testing as testing
+
+class TestClash(testing.AutoTest):
+    """
+    Test class
+    """
+
+    def setUp(self):
+        testpath = os.path.join(os.path.abspath(os.path.dirname(__file__)),
+            'testdata')
+        self.m = B.PDBModel(os.path.join(testpath, '2z6o.pdb'))
+
+    def brute_force(self, model, cutoff=CUTOFF):
+        heavy, res, chain, sg = contacts(model)
+        x = model.xyz[heavy]
+        d = N.linalg.norm(x[:,None] - x[None], axis=-1)
+        close = N.triu(d < cutoff, 1)
+        close &= (chain[:,None] != chain) | (N.abs(res[:,None] - res) > 1)
+        close &= ~(sg[:,None] & sg)
+        return N.count_nonzero(close)
+
+    def test_count(self):
+        """
+        The clashes are the same as the ones of a brute force search
+        """
+        moved = self.m.clone()
+        moved.xyz = moved.xyz + [1.5, 0., 0.]
+        m = self.m.concat(moved)
+        m.addChainId()
+
+        n = count(m.xyz, contacts(m))
+        self.assertTrue(n > 0 and n == self.brute_force(m))
+        self.assertTrue(count(self.m.xyz, contacts(self.m)) == \
+            self.brute_force(self.m))
+
+    def test_score(self):
+        """
+        The clashes of every conformer are kept in the models
+        """
+        far = self.m.clone()
+        far.xyz[0] = far.xyz[100]
+        ens = E.Ensemble.from_models([self.m, far, self.m])
+
+        r = score(ens)
+        self.assertTrue(r[1] > r[0] and r[0] == r[2])
+        self.assertTrue(ens[1].info['clashes'] == r[1])
+
+        models = [self.m, far]
+        self.assertTrue(list(score(models)) == list(r[:2]))
+        self.assertTrue(far.info['clashes'] == r[1])
+
+        f = tempfile.mktemp('.txt', 'clashes_', T.tempDir())
+        write_summary(f, ['a.pdb', 'b.pdb'], r)
+        with open(f) as fh:
+            self.assertTrue(fh.readlines()[2] == 'b.pdb %d\n' % r[1])
+        T.tryRemove(f)
+
+    def test_rank(self):
+        """
+        Models without CA clashes and within the Rg window come first
+        """
+        ca = N.flatnonzero(self.m.maskCA())
+        clashing = self.m.clone()
+        clashing.xyz[ca[0]] = clashing.xyz[ca[50]] + 0.5
+        extended = self.m.clone()
+        extended.xyz = extended.xyz * 1.5
+
+        ens = E.Ensemble.from_models([clashing, self.m, extended])
+        self.assertTrue(list(rank(ens, 2)) == [1, 2])
+
+        rg = gyration(self.m.xyz[ca])
+        self.assertTrue(list(rank(ens, 3, rg=(rg-1, rg+1))) == [1, 0, 2])
+        self.assertTrue(list(rank([clashing, self.m], 1)) == [1])
+
+
+
+if __name__ == '__main__':
+
+    testing.localTest(debug=False)
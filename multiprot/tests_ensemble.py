@@ -0,0 +1,58 @@
+#############
+##  TESTING
+#############
+from multiprot.ensemble import *
+import multiprot.testing as testing
+
+class TestEnsemble(testing.AutoTest):
+    """
+    Test class
+    """
+
+    def setUp(self):
+        testpath = os.path.join(os.path.abspath(os.path.dirname(__file__)),
+            'testdata')
+        self.m1 = B.PDBModel(os.path.join(testpath, 'domAB1.pdb'))
+        self.m2 = B.PDBModel(os.path.join(testpath, 'domAB2.pdb'))
+        self.m3 = B.PDBModel(os.path.join(testpath, '2z6o.pdb'))
+
+    def test_ensemble(self):
+        """
+        Every conformer keeps its coordinates, in a memory-mapped block
+        """
+        ens = Ensemble.from_models([self.m1, self.m2, self.m1])
+
+        self.assertTrue(isinstance(ens.xyz, N.memmap))
+        self.assertTrue(len(ens) == 3)
+        self.assertTrue(N.all(ens[1].xyz == self.m2.xyz))
+        self.assertTrue(ens[1].sequence() == self.m2.sequence())
+        self.assertTrue(len(ens[1:]) == 2 and N.all(ens[1:][1].xyz == \
+            self.m1.xyz))
+        self.assertTrue(N.all(ens[N.array([2, 1])][1].xyz == self.m2.xyz))
+
+        # The views are independent from the ensemble
+        m = ens[0]
+        m.xyz[0] = 0.
+        self.assertTrue(N.all(ens[0].xyz == self.m1.xyz))
+
+        with self.assertRaises(MatchError):
+            ens[0] = self.m3
+
+    def test_save(self):
+        """
+        A saved ensemble is mapped again from its files
+        """
+        f = tempfile.mktemp('.npy', 'ensemble_', T.tempDir())
+        Ensemble.from_models([self.m1, self.m2]).save(f)
+
+        ens = Ensemble.load(f)
+        self.assertTrue(len(ens) == 2 and N.all(ens[1].xyz == self.m2.xyz))
+        self.assertTrue(ens.names == list(self.m1['name']))
+
+        T.tryRemove(f)
+        T.tryRemove(os.path.splitext(f)[0] + '.model')
+
+
+if __name__ == '__main__':
+
+    testing.localTest(debug=False)
@@ -0,0 +1,71 @@
+#############
+##  TESTING
+#############
+from multiprot.jobs import *
+import tempfile
+import biskit.tools as T
+import multiprot.structures as S
+import multiprot.testing as testing
+
+class TestJobs(testing.AutoTest):
+    """
+    Test class
+    """
+
+    def setUp(self):
+        self.testpath = os.path.join(os.path.abspath(os.path.dirname(__file__)),
+            'testdata')
+        self.dest = tempfile.mkdtemp('', 'jobs_', T.tempDir())
+
+    def tearDown(self):
+        T.tryRemove(self.dest, tree=True)
+
+    def test_load(self):
+        """
+        Jobs are read from JSON and YAML files, with or without names
+        """
+        jobs = [{'name': 'a', 'args': '--chain x.pdb GG y.pdb'},
+            ['--chain', 'x.pdb', 'GG', 'y.pdb']]
+
+        f = os.path.join(self.dest, 'jobs.json')
+        with open(f, 'w') as fh:
+            json.dump(jobs, fh)
+
+        ref = [('a', ['--chain', 'x.pdb', 'GG', 'y.pdb']),
+            ('job002', ['--chain', 'x.pdb', 'GG', 'y.pdb'])]
+        self.assertTrue(load(f) == ref)
+
+        f = os.path.join(self.dest, 'jobs.yaml')
+        with open(f, 'w') as fh:
+            fh.write('- name: a\n  args: --chain x.pdb GG y.pdb\n')
+        self.assertTrue(load(f) == ref[:1])
+
+        self.assertTrue(common(['--jobs', f, '--job-workers=2', '-n', '2']) \
+            == ['-n', '2'])
+
+    def test_run(self):
+        """
+        The jobs are built at the same time in their own directories, and a
+        failed job does not stop the others
+        """
+        mono1 = os.path.join(self.testpath, '2z6o.pdb')
+        mono2 = os.path.join(self.testpath, 'histone.pdb')
+        chain = '--chain %s %s %s' % (mono1, 'TG'*10, mono2)
+
+        jobs = [('one', shlex.split(chain)), ('two', shlex.split(chain +
+            ' --number 2')), ('bad', ['--chain', 'missing.pdb', 'GG', mono2])]
+
+        registry = S.StructureRegistry()
+        r = run_jobs(jobs, ['--backend', 'native', '--rebuild', 'native',
+            '-d', self.dest], workers=2, registry=registry)
+
+        self.assertTrue([x['ok'] for x in r] == [True, True, False])
+        self.assertTrue([x['models'] for x in r] == [1, 2, 0])
+        self.assertTrue(len(os.listdir(os.path.join(self.dest, 'two'))) == 2)
+        self.assertTrue(len(registry.models) == 2)
+        self.assertTrue('1 failed' in summary(r))
+
+
+if __name__ == '__main__':
+
+    testing.localTest(debug=False)
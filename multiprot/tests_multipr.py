@@ -2,6 +2,7 @@
 ##  TESTING        
 #############
 import tempfile, os
+import numpy as N
 import multiprot.testing as testing
 import multiprot.parseChains as C
 import multiprot.builder as bu
@@ -58,13 +59,86 @@ class TestMultipr(testing.AutoTest):
         CHAINS = C.create_chains(args)
         build = bu.Builder(CHAINS,args.debug,args.number,args.destination)
 
-        model = build.run()
+        models = build.run()
+        model = models[0]
 
         self.assertTrue(model.lenChains()==1)
         #self.assertTrue(len(model)==2336)
 
         # build.write_pdbs([model],testdir)
 
+    def test_ensemble(self):
+        '''
+        Single chain example keeping every conformer produced by ranch
+        '''
+        testdir = tempfile.mkdtemp('', self.__class__.__name__.lower() + \
+            '_ensemble_')
+
+        argstring = '--chain '+self.mono1+' '+self.linker+' '+self.mono2+\
+            ' --number 3 --destination '+testdir
+
+        args = C.parsing(argstring.split())
+        CHAINS = C.create_chains(args)
+        build = bu.Builder(CHAINS,args.debug,args.number,args.destination)
+
+        models = build.run()
+
+        self.assertTrue(len(models)==3)
+        self.assertTrue(all(m.lenChains()==1 for m in models))
+        self.assertTrue(not N.all(models[0].xyz == models[1].xyz))
+
+        build.write_pdbs(models,testdir)
+        self.assertTrue(sorted(os.listdir(testdir)) == \
+            ['mp_01.pdb', 'mp_02.pdb', 'mp_03.pdb'])
+
+    def test_native(self):
+        '''
+        Single chain example with the native sampler and rebuild, which need
+        neither ranch nor pulchra
+        '''
+        argstring = '--chain '+self.mono1+' '+self.linker+' '+self.mono2+\
+            ' --number 3 --backend native --rebuild native'
+
+        args = C.parsing(argstring.split())
+        CHAINS = C.create_chains(args)
+        build = bu.Builder(CHAINS,args.debug,args.number,args.destination,
+            args.workers,args.backend,args.rebuild)
+
+        models = build.run()
+
+        self.assertTrue(len(models)==3)
+        self.assertTrue(all(m.lenChains()==1 for m in models))
+        self.assertTrue(len(models[0].sequence())==314)
+        # every linker residue has its backbone atoms
+        self.assertTrue(N.sum(models[0].maskFrom('name', 'N'))==314)
+
+    def test_workers(self):
+        '''
+        The multipr script with several worker processes, which import the
+        script again
+        '''
+        import subprocess, sys
+
+        testdir = tempfile.mkdtemp('', self.__class__.__name__.lower() + \
+            '_workers_')
+
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join([root] + \
+            os.environ.get('PYTHONPATH', '').split(os.pathsep)))
+
+        argstring = '--chain '+self.mono1+' '+self.linker+' '+self.mono2+\
+            ' --number 3 --backend native --rebuild native --workers 2'+\
+            ' --seed 1 --destination '+testdir
+
+        p = subprocess.run([sys.executable,
+            os.path.join(root, 'multiprot', 'scripts', 'multipr')] + \
+            argstring.split(), env=env, stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE, universal_newlines=True)
+
+        self.assertTrue(p.returncode == 0, p.stderr)
+        self.assertTrue(sorted(os.listdir(testdir)) == \
+            ['mp_01.pdb', 'mp_02.pdb', 'mp_03.pdb'])
+
     # PASSED
     def test_example4(self):
         '''
@@ -79,7 +153,8 @@ class TestMultipr(testing.AutoTest):
         CHAINS = C.create_chains(args)
         build = bu.Builder(CHAINS,args.debug,args.number,args.destination)
 
-        model = build.run()
+        models = build.run()
+        model = models[0]
 
         self.assertTrue(model.lenChains()==3)
         #self.assertTrue(len(model)==7326)
@@ -192,7 +267,8 @@ class TestMultipr(testing.AutoTest):
         CHAINS = C.create_chains(args)
         build = bu.Builder(CHAINS,args.debug,args.number,args.destination)
 
-        model = build.run()
+        models = build.run()
+        model = models[0]
 
         self.assertTrue(model.lenChains()==3)
 
@@ -333,7 +409,8 @@ class TestMultipr(testing.AutoTest):
         CHAINS = C.create_chains(args)
         build = bu.Builder(CHAINS,args.debug,args.number,args.destination)
 
-        model = build.run()
+        models = build.run()
+        model = models[0]
 
         self.assertTrue(model.lenChains()==3)
 
@@ -362,6 +439,103 @@ class TestMultipr(testing.AutoTest):
     #     self.assertTrue(model.lenChains()==3)
 
 
+class TestStartup(testing.AutoTest):
+    """
+    Test class for the start of the multipr script: the help, invalid
+    arguments and the client of a server have to run without loading biskit,
+    numpy or scipy, and the help and invalid arguments within BUDGET seconds
+    """
+
+    BUDGET = 0.5    # seconds, ~0.06 s here, ~0.6 s with the modeling stack
+    HEAVY = ('biskit', 'numpy', 'scipy')
+
+    def imported(self, argv):
+        """
+        Runs python with argv and returns its exit code, the time it took
+        and the modules it imported
+        """
+        import subprocess, sys, time
+
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join([root] + \
+            os.environ.get('PYTHONPATH', '').split(os.pathsep)))
+
+        start = time.time()
+        p = subprocess.run([sys.executable, '-X', 'importtime'] + argv,
+            env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            universal_newlines=True)
+        elapsed = time.time() - start
+
+        # Lines of -X importtime: "import time: self | cumulative | module"
+        modules = [l.split('|')[-1].strip() for l in p.stderr.splitlines() \
+            if l.startswith('import time:')]
+
+        return p.returncode, elapsed, modules
+
+    def check(self, argv, code, budget=None):
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+            'scripts', 'multipr')
+        r, elapsed, modules = self.imported([script] + argv)
+
+        self.assertTrue(r == code, r)
+        self.assertFalse([m for m in modules if m.split('.')[0] in self.HEAVY])
+        if budget is not None:
+            self.assertTrue(elapsed < budget, '%.2f s' % elapsed)
+
+    def test_help(self):
+        """
+        multipr -h
+        """
+        self.check(['-h'], 0, self.BUDGET)
+
+    def test_invalid(self):
+        """
+        Invalid and missing arguments
+        """
+        self.check(['--chain', 'a.pdb', '--number', 'abc'], 2, self.BUDGET)
+        self.check(['--number', '2'], 2, self.BUDGET)
+
+    def test_client(self):
+        """
+        multipr --server only submits the construct
+        """
+        import json, socket, tempfile, threading
+
+        path = os.path.join(tempfile.mkdtemp(), 'multiprot.sock')
+        s = socket.socket(socket.AF_UNIX)
+        s.bind(path)
+        s.listen(1)
+
+        def answer():
+            conn, addr = s.accept()
+            with conn, conn.makefile('rwb') as f:
+                f.readline()
+                f.write((json.dumps({'status': 'done', 'name': 'job001',
+                    'files': [], 'models': 0, 'time': 0.}) + '\n').encode())
+
+        t = threading.Thread(target=answer)
+        t.start()
+        try:
+            self.check(['--server', path, '--chain', 'a.pdb', 'GG', 'b.pdb'],
+                0)
+        finally:
+            t.join()
+            s.close()
+            os.remove(path)
+            os.rmdir(os.path.dirname(path))
+
+    def test_testing(self):
+        """
+        The modules used to build the models do not load the test framework
+        """
+        r, elapsed, modules = self.imported(['-c',
+            'import multiprot.builder'])
+
+        self.assertTrue(r == 0, r)
+        self.assertTrue('multiprot.builder' in modules)
+        self.assertFalse('multiprot.testing' in modules)
+
+
 if __name__ == '__main__':
 
     testing.localTest(debug=False)
@@ -0,0 +1,42 @@
+#############
+##  TESTING
+#############
+from multiprot.parallel import *
+import multiprot.testing as testing
+
+def _power(shared, item):
+    return item ** shared
+
+class TestParallel(testing.AutoTest):
+    """
+    Test class
+    """
+
+    def test_pmap_serial(self):
+        """
+        Results of a single worker are in the order of the input
+        """
+        r = pmap(_power, [3, 1, 2], shared=2)
+        self.assertTrue(r == [9, 1, 4])
+
+    def test_pmap_pool(self):
+        """
+        Results gathered from the process pool are in the order of the input
+        """
+        r = pmap(_power, range(20), workers=4, shared=3)
+        self.assertTrue(r == [i**3 for i in range(20)])
+
+    def test_pmap_threads(self):
+        """
+        Process pools are started from several threads at the same time
+        """
+        import concurrent.futures as F
+
+        with F.ThreadPoolExecutor(4) as pool:
+            r = list(pool.map(lambda k: pmap(_power, range(8), 2, k), range(4)))
+        self.assertTrue(r == [[i**k for i in range(8)] for k in range(4)])
+
+
+if __name__ == '__main__':
+
+    testing.localTest(debug=False)
@@ -0,0 +1,35 @@
+#############
+##  TESTING        
+#############
+import multiprot.testing as testing
+from multiprot.pulchra import *
+
+class TestPulchra(testing.AutoTest):
+    """
+    Test class
+    """
+
+    TAGS = [testing.EXE]
+
+    testpdb = None
+
+    def setUp(self):
+        self.testpdb =  self.testpdb or \
+            os.path.join(os.path.abspath(os.path.dirname(__file__)), 
+                'testdata/2z6o.pdb')
+
+    def test_rebuiltFile(self):
+        """
+        Test to confirm that .rebuilt.pdb file was created after running pulchra
+        """
+        pdb = B.PDBModel(self.testpdb)
+        
+        call = Pulchra(pdb)
+        rebuilt = call.run()
+        
+        self.assertTrue(isinstance(rebuilt,B.PDBModel))
+
+
+if __name__ == '__main__':
+
+    testing.localTest(debug=False)
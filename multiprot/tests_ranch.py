@@ -0,0 +1,583 @@
+#############
+##  TESTING        
+#############
+import multiprot.testing as testing
+from multiprot.ranch import *
+
+class TestRanch(testing.AutoTest):
+    """
+    Test class
+    Test examples 1, 4, 5, 7, and 10 from ranch_examples/
+    
+    Runs each case separately and tests for the creation of the models list
+    with 10 PDBModels, and then for one of the models tests for number of chains,
+    length of each chain, residue numbering and serial numbering
+
+    These tests take around 35 seconds to complete, because ranch is called for
+    each example
+    """
+
+    TAGS = [ testing.EXE, testing.LONG ]
+    
+    dom1 = None ## define empty class variable
+    dom2 = None 
+    domAB1 = None
+    domAB2 = None
+    testpath = None
+
+    def setUp(self):
+
+        self.testpath = self.testpath or \
+            os.path.join(os.path.abspath(os.path.dirname(__file__)), 'testdata')
+        
+        self.dom1 = self.dom1 or B.PDBModel(os.path.join(self.testpath, 
+            '2z6o.pdb'))
+        self.dom2 = self.dom2 or B.PDBModel(os.path.join(self.testpath, 
+            'histone.pdb'))
+        self.domAB1 = self.domAB1 or B.PDBModel(os.path.join(self.testpath, 
+            'domAB1.pdb'))
+        self.domAB2 = self.domAB2 or self.domAB1.clone()
+
+    def test_example1(self):
+        call = Ranch(self.dom1,'GGGGGGGGGG',self.dom2)
+        models = call.run()
+
+        # models = [(PDBModel, [modeled_doms]), (PDBModel, [modeled_doms]), ...]
+
+        self.assertTrue(len(models)==10, "models does not contain 10 elements")
+        self.assertTrue(isinstance(models[0], tuple) and \
+            isinstance(models[0][0], B.PDBModel) and \
+            isinstance(models[0][1], list) and \
+            isinstance(models[0][1][0], dict), 
+            "models contents are not tuples with (PDBModel, [dictionaries])")
+
+        model = models[0][0]
+        self.assertTrue(model.lenChains()==1, 'Incorrect number of chains')
+        self.assertTrue(len(model.sequence())==274, 'Incorrect chain length')
+        self.assertTrue(model.atoms['residue_number'][-1]==274, 
+            'Incorrect residue numbering')
+        self.assertTrue(model.atoms['serial_number'][-1]==2181, 
+            'Incorrect serial numbering')
+
+        dlist = models[0][1]
+        self.assertTrue(len(dlist)==1, 'list should have a single dict')
+        self.assertTrue(len(dlist[0])==0, 'dict should have 0 elements')
+
+        out_symseq = models[0][2]
+        self.assertTrue(out_symseq==model.sequence())
+
+    def test_example4(self):
+        call = Ranch(self.domAB1, 'GGGGGGGGGGGGGGGGGGGG', self.domAB2, 
+            chains = {self.domAB1:'A', self.domAB2: 'B'})
+        models = call.run()
+
+        self.assertTrue(len(models)==10, "models does not contain 10 elements")
+        self.assertTrue(isinstance(models[0], tuple) and \
+            isinstance(models[0][0], B.PDBModel) and \
+            isinstance(models[0][1], list) and \
+            isinstance(models[0][1][0], dict), 
+            "models contents are not tuples with (PDBModel, [dictionaries])")
+
+        model = models[0][0]
+        self.assertTrue(model.lenChains()==3, 'Incorrect number of chains')
+        self.assertTrue(len(model.takeChains([0]).sequence())==456 and \
+            len(model.takeChains([1]).sequence())==218 and \
+            len(model.takeChains([2]).sequence())==218, 'Incorrect chain length')
+        self.assertTrue(model.takeChains([0]).atoms['residue_number'][-1]==456 \
+            and model.takeChains([1]).atoms['residue_number'][-1]==218 \
+            and model.takeChains([2]).atoms['residue_number'][-1]==218, 
+            'Incorrect residue numbering')
+        self.assertTrue(model.atoms['serial_number'][-1]==7163, 
+            'Incorrect serial numbering')
+
+        dlist = models[0][1]
+        self.assertTrue(len(dlist)==1, 'list should have a single dict')
+        
+        d = dlist[0]
+        # The d keys will be 0 and 2, as those are the indexes of self.domAB1 and
+        # self.domAB2 in the call to ranch above
+        # d[0] and d[2] have to be PDBModels with the same sequence and number of
+        # chains as self.domAB1 and self.domAB2 respectively, but with the new
+        # coordinates after being modeled
+        self.assertTrue(len(d)==2, 'dict should have 2 elements')
+        self.assertTrue(self.domAB1.sequence() == d[0].sequence() and \
+            self.domAB2.sequence() == d[2].sequence(), 'sequences from \
+            modeled_doms and original input are different')
+        # The first model is always fixed
+        self.assertTrue(N.all(self.domAB1.xyz == d[0].xyz)) 
+
+        out_symseq = models[0][2]
+        self.assertTrue(out_symseq==model.sequence())
+
+    def test_example5(self):
+        call = Ranch(self.domAB1, 'GGGGGGGGGGGGGGGGGGGG', self.domAB2, 
+            chains = {self.domAB2: 'A'}, symmetry='p2', symtemplate=self.domAB1, 
+            pool_sym='s')
+        models = call.run()
+
+        self.assertTrue(len(models)==10, "models does not contain 10 elements")
+        self.assertTrue(isinstance(models[0], tuple) and \
+            isinstance(models[0][0], B.PDBModel) and \
+            isinstance(models[0][1], list) and \
+            isinstance(models[0][1][0], dict), 
+            "models contents are not tuples with (PDBModel, [dictionaries])")
+
+        model = models[0][0]
+        self.assertTrue(model.lenChains()==4, 'Incorrect number of chains')
+        self.assertTrue(len(model.takeChains([0]).sequence())==456 and \
+            len(model.takeChains([1]).sequence())==218 and \
+            len(model.takeChains([2]).sequence())==456 and \
+            len(model.takeChains([3]).sequence())==218, 'Incorrect chain length')
+        self.assertTrue(model.takeChains([0]).atoms['residue_number'][-1]==456 \
+            and model.takeChains([1]).atoms['residue_number'][-1]==218 \
+            and model.takeChains([2]).atoms['residue_number'][-1]==456 \
+            and model.takeChains([3]).atoms['residue_number'][-1]==218, 
+            'Incorrect residue numbering')
+        self.assertTrue(model.atoms['serial_number'][-1]==10754, 
+            'Incorrect serial numbering')
+
+        dlist = models[0][1]
+        # this list will have two 'modeled_doms' dictionaries, one for each
+        # symmetric unit
+        self.assertTrue(len(dlist)==2, 'list should have two dictionaries')
+
+        d = dlist[0]    # Take the first dictionary
+        # The only key will be 2, the position of self.domAB1 in the call to
+        # Ranch above. The symtemplate domain is not included
+        self.assertTrue(len(d)==1, 'dictionary should have 1 entry')
+        self.assertTrue(self.domAB2.sequence() == d[2].sequence(), 'sequences \
+            from modeled dom and original are different')
+
+        out_symseq = models[0][2]
+        self.assertTrue(
+            out_symseq==model.sequence()[:int(len(model.sequence())/2)])
+
+    def test_example7(self):
+        linker = 'GGGGGGGGGGGGGGGGGGGG'
+        call = Ranch(self.dom2, linker, self.domAB1, linker, self.dom2, 
+            symmetry='p2', symtemplate=self.domAB1, pool_sym='mix')
+        models = call.run()
+
+        self.assertTrue(len(models)==10, "models does not contain 10 elements")
+        self.assertTrue(isinstance(models[0], tuple) and \
+            isinstance(models[0][0], B.PDBModel) and \
+            isinstance(models[0][1], list) and \
+            isinstance(models[0][1][0], dict), 
+            "models contents are not tuples with (PDBModel, [dictionaries])")
+
+        model = models[0][0]
+        self.assertTrue(model.lenChains()==2, 'Incorrect number of chains')
+        self.assertTrue(len(model.takeChains([0]).sequence())==454 and \
+            len(model.takeChains([0]).sequence())==454, 'Incorrect chain length')
+        self.assertTrue(model.takeChains([0]).atoms['residue_number'][-1]==454 \
+            and model.takeChains([1]).atoms['residue_number'][-1]==454, 
+            'Incorrect residue numbering')
+        self.assertTrue(model.atoms['serial_number'][-1]==6876, 
+            'Incorrect serial numbering')
+
+        dlist = models[0][1]
+        # this list will have two 'modeled_doms' dictionaries, one for each
+        # symmetric unit
+        self.assertTrue(len(dlist)==2, 'list should have two dictionaries')
+
+        self.assertTrue(len(dlist[0])==0, dlist[0])
+
+        out_symseq = models[0][2]
+        self.assertTrue(
+            out_symseq==model.sequence()[:int(len(model.sequence())/2)])
+
+    def test_example10(self):
+        call = Ranch(self.domAB1, 'GGGGGGGGGGGGGGGGGGGG', self.domAB2, 
+            'GGGGGGGGGGGGGGGGGGGG', self.domAB2, chains = {self.domAB2:'B'})
+        models = call.run()
+
+        self.assertTrue(len(models)==10, "models does not contain 10 elements")
+        self.assertTrue(isinstance(models[0], tuple) and \
+            isinstance(models[0][0], B.PDBModel) and \
+            isinstance(models[0][1], list) and \
+            isinstance(models[0][1][0], dict), 
+            "models contents are not tuples with (PDBModel, [dictionaries])")
+
+        model = models[0][0]
+        self.assertTrue(model.lenChains()==4, 'Incorrect number of chains')
+        self.assertTrue(len(model.takeChains([0]).sequence())==694 and \
+            len(model.takeChains([1]).sequence())==218 and \
+            len(model.takeChains([2]).sequence())==218 and \
+            len(model.takeChains([3]).sequence())==218, 'Incorrect chain length')
+        self.assertTrue(model.takeChains([0]).atoms['residue_number'][-1]==694 \
+            and model.takeChains([1]).atoms['residue_number'][-1]==218 \
+            and model.takeChains([2]).atoms['residue_number'][-1]==218 \
+            and model.takeChains([3]).atoms['residue_number'][-1]==218, 
+            'Incorrect residue numbering')
+        self.assertTrue(model.atoms['serial_number'][-1]==10754, 
+            'Incorrect serial numbering')
+
+        dlist = models[0][1]
+        self.assertTrue(len(dlist)==1, 'list should have a single dict')
+        
+        d = dlist[0]
+        # The d keys will be 0, 2 and 4, as those are the indexes of self.domAB1
+        # and self.domAB2 in the call to ranch above
+        self.assertTrue(len(d)==3, 'dict should have 2 elements')
+        self.assertTrue(self.domAB1.sequence() == d[0].sequence() and \
+            self.domAB2.sequence() == d[2].sequence() and \
+            self.domAB2.sequence() == d[4].sequence(), 'sequences from \
+            modeled_doms and original input are different')
+        self.assertTrue(N.all(self.domAB1.xyz == d[0].xyz), 'coordinates should be\
+         the same')
+
+        out_symseq = models[0][2]
+        self.assertTrue(out_symseq==model.sequence())
+
+
+class TestPlan(testing.AutoTest):
+    """
+    Test class for the extraction plan, with models grown by the native
+    sampler in the same format as the ones of ranch
+    """
+
+    def setUp(self):
+        testpath = os.path.join(os.path.abspath(os.path.dirname(__file__)),
+            'testdata')
+        self.domAB1 = B.PDBModel(os.path.join(testpath, 'domAB1.pdb'))
+        self.domAB2 = self.domAB1.clone()
+
+    def check_plan(self, call, symseq):
+        models = call.sample(2)
+
+        plan = extraction_plan(models[0], call.embedded, symseq)
+        pool = E.Pool.from_plan(plan, 2)
+        pool.set(1, models[1].xyz)
+        r = pool[1]
+
+        if symseq:
+            ref = extract_symmetric(models[1].clone(), symseq, call.embedded)
+        else:
+            ref = extract_embedded(models[1].clone(), call.embedded)
+
+        for m, mref in [(r[0], ref[0])] + [(d[k], dref[k]) \
+            for d, dref in zip(r[1], ref[1]) for k in dref]:
+            self.assertTrue(N.all(m.xyz == mref.xyz))
+            self.assertTrue(N.all(m.atoms['chain_id'] == mref.atoms['chain_id']))
+            self.assertTrue(m.lenChains() == mref.lenChains())
+
+        self.assertTrue(r[2] == ref[2])
+        self.assertTrue('ranch_index' not in r[0].atoms.keys())
+
+    def test_embedded(self):
+        """
+        The plan gives the same domains as extract_embedded
+        """
+        import multiprot.sampler as S
+
+        call = S.Sampler(self.domAB1, 'G'*20, self.domAB2,
+            chains = {self.domAB1:'A', self.domAB2: 'B'}, seed=1)
+        call._setup()
+        self.check_plan(call, None)
+
+        # Residue ranges in the chain without the embedded domains
+        self.assertTrue(call.layout == {0:(0, 218), 1:(218, 238), 2:(238, 456)})
+
+    def test_symmetric(self):
+        """
+        The plan gives the same domains as extract_symmetric
+        """
+        import multiprot.sampler as S
+
+        call = S.Sampler(self.domAB1, 'G'*20, self.domAB2,
+            chains = {self.domAB2: 'A'}, symmetry='p2', symtemplate=self.domAB1,
+            pool_sym='s', seed=1)
+        call._setup()
+        self.check_plan(call, call.symseq)
+
+    def test_files(self):
+        """
+        The models read from files have their own coordinates
+        """
+        import multiprot.sampler as S
+
+        testpath = os.path.join(os.path.abspath(os.path.dirname(__file__)),
+            'testdata')
+        files = [os.path.join(testpath, f) for f in ['domAB1.pdb', 'domAB2.pdb']]
+
+        call = S.Sampler(self.domAB1)   # nothing embedded
+        r = call.extract(files)
+
+        for (full, doms, out_symseq), f in zip(r, files):
+            ref = extract_embedded(B.PDBModel(f), {})[0]
+            self.assertTrue(N.all(full.xyz == ref.xyz))
+            self.assertTrue(full.sequence() == ref.sequence())
+
+    def test_read_pool(self):
+        """
+        Models read from files with the same atoms go to a single Pool
+        """
+        import multiprot.sampler as S
+
+        testpath = os.path.join(os.path.abspath(os.path.dirname(__file__)),
+            'testdata')
+        f = os.path.join(testpath, 'domAB1.pdb')
+
+        call = S.Sampler(self.domAB1)   # nothing embedded
+        r = call.extract([f, f, f])
+
+        self.assertTrue(isinstance(r, E.Pool) and len(r) == 3)
+        ref = extract_embedded(B.PDBModel(f), {})[0]
+        for full, doms, out_symseq in r:
+            self.assertTrue(N.allclose(full.xyz, ref.xyz, atol=1e-3))
+
+
+class TestFixed(testing.AutoTest):
+    """
+    Test class for the check of the fixed domains, which runs before ranch
+    """
+
+    def setUp(self):
+        testpath = os.path.join(os.path.abspath(os.path.dirname(__file__)),
+            'testdata')
+        self.dom1 = B.PDBModel(os.path.join(testpath, '2z6o.pdb'))
+        self.dom2 = B.PDBModel(os.path.join(testpath, 'histone.pdb'))
+
+        # First CA of dom2 50 A away from the last CA of dom1
+        ca1 = self.dom1.xyz[N.flatnonzero(self.dom1.maskCA())[-1]]
+        ca2 = self.dom2.xyz[N.flatnonzero(self.dom2.maskCA())[0]]
+        self.dom2.xyz = self.dom2.xyz - ca2 + ca1 + [50., 0., 0.]
+
+    def test_fixed(self):
+        """
+        Fixed domains farther apart than the linker can span are rejected
+        """
+        import multiprot.sampler as S
+
+        call = S.Sampler(self.dom1, 'G'*20, self.dom2,
+            fixed=[self.dom1, self.dom2])
+        call._setup()
+
+        call = S.Sampler(self.dom1, 'G'*10, self.dom2,
+            fixed=[self.dom1, self.dom2])
+        with self.assertRaises(InputError) as e:
+            call._setup()
+        self.assertTrue('2z6o.pdb' in str(e.exception))
+        self.assertTrue('at least 13 residues' in str(e.exception))
+
+        # Not checked if only one of them is fixed
+        call = S.Sampler(self.dom1, 'G'*10, self.dom2, fixed=[self.dom1])
+        call._setup()
+
+
+class TestStaging(testing.AutoTest):
+    """
+    Test class for the input shared by several calls with the same domains
+    """
+
+    def setUp(self):
+        testpath = os.path.join(os.path.abspath(os.path.dirname(__file__)),
+            'testdata')
+        self.domAB1 = B.PDBModel(os.path.join(testpath, 'domAB1.pdb'))
+        self.staging = Staging(tempfile.mkdtemp('', 'staging_', T.tempDir()))
+
+    def tearDown(self):
+        T.tryRemove(self.staging.path, tree=True)
+
+    def test_staging(self):
+        """
+        The domains are embedded and written once, for calls with different
+        linkers
+        """
+        import multiprot.sampler as S
+
+        setups = []
+        for linker in ['G'*10, 'G'*20]:
+            dom = self.domAB1.clone()
+            call = S.Sampler(dom, linker, chains={dom: 'A'},
+                staging=self.staging)
+            call._setup()
+            setups.append(call)
+
+        a, b = [call.doms_in[0] for call in setups]
+        self.assertTrue(a is not b and N.all(a.xyz == b.xyz))
+        self.assertTrue(len(self.staging.embedded) == 1)
+
+        ref = embed(self.domAB1.takeChains([0]), self.domAB1.takeChains([1]))
+        self.assertTrue(N.all(a.xyz == ref.xyz) and \
+            a.sequence() == ref.sequence())
+
+        f = self.staging.write(a, 0)
+        self.assertTrue(self.staging.write(b, 0) == f)
+        self.assertTrue(os.listdir(self.staging.path) == [os.path.basename(f)])
+
+
+# Stand-in for the ranch executable, writes the -q models it is asked for in
+# the -w directory, with the seed it received. It then waits FAKE_SLEEP
+# seconds and exits with the code FAKE_EXIT, if they are set
+FAKE_RANCH = """#!%s
+import os, sys, time
+args = dict(a.split('=', 1) for a in sys.argv[1:] if '=' in a)
+for i in range(int(args['-q'])):
+    with open(os.path.join(args['-w'], '%%05d.pdb' %% (i+1)), 'w') as f:
+        f.write('REMARK seed %%s\\nEND\\n' %% args.get('--seed'))
+time.sleep(float(os.environ.get('FAKE_SLEEP', 0)))
+sys.exit(int(os.environ.get('FAKE_EXIT', 0)))
+"""
+
+class TestShards(testing.AutoTest):
+    """
+    Test class for the split of the models among several ranch processes and
+    for the cache of model pools, with a stand-in for ranch
+    """
+
+    def setUp(self):
+        import sys
+        from biskit.exe.exeConfigCache import ExeConfigCache
+
+        self.bindir = tempfile.mkdtemp('', 'fakeranch_', T.tempDir())
+        f = os.path.join(self.bindir, 'ranch')
+        with open(f, 'w') as fh:
+            fh.write(FAKE_RANCH % sys.executable)
+        os.chmod(f, 0o755)
+
+        self.path = os.environ['PATH']
+        os.environ['PATH'] = self.bindir + os.pathsep + self.path
+        ExeConfigCache.reset()
+
+        testpath = os.path.join(os.path.abspath(os.path.dirname(__file__)),
+            'testdata')
+        self.dom1 = B.PDBModel(os.path.join(testpath, '2z6o.pdb'))
+        self.dom2 = B.PDBModel(os.path.join(testpath, 'histone.pdb'))
+
+    def tearDown(self):
+        from biskit.exe.exeConfigCache import ExeConfigCache
+
+        os.environ['PATH'] = self.path
+        ExeConfigCache.reset()
+        T.tryRemove(self.bindir, tree=True)
+
+    def pool(self, n, workers, seed=None):
+        call = Ranch(self.dom1, 'GGGGGGGGGG', self.dom2, n=n, workers=workers,
+            seed=seed)
+        call.prepare()
+        call.execute()
+
+        files = sorted(os.listdir(call.dir_models))
+        seeds = []
+        for f in files:
+            with open(os.path.join(call.dir_models, f)) as fh:
+                seeds.append(fh.readline().split()[-1])
+
+        call.cleanup()
+        return call.shards, files, seeds
+
+    def test_shards(self):
+        """
+        The models are split among the workers and merged in one directory
+        """
+        shards, files, seeds = self.pool(45, 4, seed=7)
+
+        self.assertTrue([s[0] for s in shards]==[12, 11, 11, 11])
+        self.assertTrue(len(files)==45)
+        self.assertTrue(files[0]=='s00_00001.pdb' and files[-1]=='s03_00011.pdb')
+        # Every process has its own seed, derived from the seed of the pool
+        self.assertTrue(sorted(set(seeds))==sorted(str(SH.seed(7, i)) \
+            for i in range(4)))
+        self.assertTrue('7' not in seeds)
+
+    def test_shard_command(self):
+        """
+        The command of a shard only differs from the command of a single
+        process in the number of models, their directory and the seed
+        """
+        call = Ranch(self.dom1, 'GGGGGGGGGG', self.dom2, n=45, workers=4,
+            seed=7)
+        call.prepare()
+        try:
+            q, cwd, dir_models, seed = call.shards[1]
+            ref = [{'-q=45': '-q=%d' % q, '-w=' + call.dir_models: '-w=' + \
+                dir_models}.get(a, a) for a in call.command().split()]
+
+            self.assertTrue(call.shard_command(call.shards[1]).split() == \
+                ref + ['--seed=%d' % seed])
+        finally:
+            call.cleanup()
+
+    def test_single(self):
+        """
+        Every process builds at least 10 models
+        """
+        shards, files, seeds = self.pool(25, 4)
+        self.assertTrue([s[0] for s in shards]==[13, 12])
+
+        shards, files, seeds = self.pool(15, 4)
+        self.assertTrue(len(shards)==1 and len(files)==15)
+        self.assertTrue(seeds[0]=='None')
+
+    def returncode(self, n=20, deadline=None, **env):
+        os.environ.update(env)
+        call = Ranch(self.dom1, 'GGGGGGGGGG', self.dom2, n=n, workers=2,
+            seed=1, deadline=deadline)
+        try:
+            call.prepare()
+            call.execute()
+            return call.returncode, len(os.listdir(call.dir_models))
+        finally:
+            for k in env:
+                del os.environ[k]
+            call.cleanup()
+
+    def test_returncode(self):
+        """
+        The processes stopped at the deadline or once the models are complete
+        do not fail the pool, the ones that exit with an error do
+        """
+        r = self.returncode(deadline=time.time() + 2, FAKE_SLEEP='60')
+        self.assertTrue(r == (0, 20))
+
+        r = self.returncode(5, FAKE_SLEEP='60')
+        self.assertTrue(r[0] == 0)
+
+        r = self.returncode(FAKE_EXIT='3')
+        self.assertTrue(r == (3, 20))
+
+    def cached_pool(self, cache, n):
+        call = Ranch(self.dom1, 'GGGGGGGGGG', self.dom2, n=n, seed=3,
+            cache=cache)
+        call.prepare()
+        call.execute()
+
+        seeds = []
+        for f in call.m_paths:
+            with open(f) as fh:
+                seeds.append(fh.readline().split()[-1])
+
+        call.cleanup()
+        return call.rn, [os.path.basename(f) for f in call.m_paths], seeds
+
+    def test_cache(self):
+        """
+        Cached models are reused, and ranch only builds the missing ones
+        """
+        cache = C.PoolCache(tempfile.mkdtemp('', 'cache_', T.tempDir()))
+
+        # Every model built by ranch is cached
+        rn, files, seeds = self.cached_pool(cache, 5)
+        self.assertTrue(rn==10 and len(files)==5 and seeds[0]=='3')
+
+        # ranch is not run for a hit
+        rn, files, seeds = self.cached_pool(cache, 8)
+        self.assertTrue(rn==0 and files[-1]=='cached_00007.pdb')
+
+        # The missing models are built with a seed derived from the seed and
+        # the number of cached models
+        rn, files, seeds = self.cached_pool(cache, 15)
+        self.assertTrue(rn==10 and len(files)==15)
+        self.assertTrue(seeds[:10]==['3']*10 and \
+            seeds[10:]==[str(SH.seed(3, 10))]*5)
+
+        key = cache.entries()[0][2]
+        self.assertTrue(len(cache.get(key, 100))==20)
+
+        T.tryRemove(cache.path, tree=True)
+
+
+if __name__ == '__main__':
+
+    testing.localTest(debug=False)
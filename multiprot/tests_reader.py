@@ -0,0 +1,56 @@
+#############
+##  TESTING
+#############
+from multiprot.reader import *
+import os, tempfile
+import biskit as B
+import biskit.tools as T
+import multiprot.testing as testing
+
+class TestReader(testing.AutoTest):
+    """
+    Test class
+    """
+
+    def setUp(self):
+        testpath = os.path.join(os.path.abspath(os.path.dirname(__file__)),
+            'testdata')
+        self.f1 = os.path.join(testpath, 'domAB1.pdb')
+        self.f2 = os.path.join(testpath, 'domAB2.pdb')
+        self.f3 = os.path.join(testpath, '2z6o.pdb')
+
+    def test_read_xyz(self):
+        """
+        The coordinates are the same as the ones read by biskit
+        """
+        m = B.PDBModel(self.f2)
+        self.assertTrue(N.all(read_xyz(self.f2) == m.xyz))
+
+    def test_read_pool(self):
+        """
+        Every model has its own coordinates, with the atoms of the first one
+        """
+        first, xyz = read_pool([self.f1, self.f2])
+
+        self.assertTrue(xyz.shape == (2, len(first), 3))
+        self.assertTrue(N.all(xyz[0] == first.xyz))
+        self.assertTrue(N.all(xyz[1] == B.PDBModel(self.f2).xyz))
+
+        with self.assertRaises(MatchError):
+            read_pool([self.f1, self.f3])
+
+    def test_buffer(self):
+        """
+        The coordinates are read into the given array, which must match the
+        atoms of the file
+        """
+        buf = N.empty((len(B.PDBModel(self.f1)), 3), N.float32)
+        self.assertTrue(read_xyz(self.f1, buf) is buf)
+
+        with self.assertRaises(MatchError):
+            read_xyz(self.f3, buf)
+
+
+if __name__ == '__main__':
+
+    testing.localTest(debug=False)
@@ -0,0 +1,115 @@
+#############
+##  TESTING
+#############
+from multiprot.rebuild import *
+import os
+import multiprot.rebuild as R
+import multiprot.testing as testing
+
+class TestRebuild(testing.AutoTest):
+    """
+    Test class
+    """
+
+    testpath = None
+    histone = None
+
+    def setUp(self):
+
+        self.testpath = self.testpath or \
+            os.path.join(os.path.abspath(os.path.dirname(__file__)), 'testdata')
+
+        self.histone = self.histone or B.PDBModel(os.path.join(self.testpath,
+            'histone.pdb'))
+
+    def ca_stretch(self, model, start, end):
+        """
+        Removes all the atoms but CA of the residues from start to end
+        """
+        ri = N.append(model.resIndex(), len(model))
+        names = model['name']
+        keep = [i for k in range(len(ri)-1) for i in range(ri[k], ri[k+1]) \
+            if not start <= k < end or names[i] == 'CA']
+        return model.take(keep)
+
+    def test_rebuild(self):
+        """
+        Rebuilt residues have all of their atoms, and the backbone is close to
+        the original one
+        """
+        m = self.histone
+        rebuilt = rebuild([self.ca_stretch(m, 30, 60)])[0]
+
+        self.assertTrue(len(rebuilt)==len(m))
+        self.assertTrue(rebuilt.sequence()==m.sequence())
+        self.assertTrue(rebuilt['name']==m['name'])
+
+        mask = N.isin(m['name'], ['N', 'CA', 'C'])
+        mask[:m.resIndex()[30]] = False
+        mask[m.resIndex()[60]:] = False
+        rmsd = N.sqrt(N.mean(N.sum((rebuilt.xyz[mask]-m.xyz[mask])**2, axis=1)))
+        self.assertTrue(rmsd < 0.5, 'backbone rmsd %.2f' % rmsd)
+
+    def test_ensemble(self):
+        """
+        Conformers with the same atoms are rebuilt together
+        """
+        ca = self.ca_stretch(self.histone, 0, 20)
+        models = [ca.clone() for i in range(5)]
+        for i, m in enumerate(models):
+            m.xyz = m.xyz + i
+
+        rebuilt = rebuild(models + [self.histone])
+
+        self.assertTrue(len(rebuilt)==6)
+        self.assertTrue(all(len(r)==len(self.histone) for r in rebuilt))
+        self.assertTrue(N.all(rebuilt[-1].xyz == self.histone.xyz))
+
+        i_ca = N.flatnonzero(rebuilt[0].maskCA())
+        for r, m in zip(rebuilt, models):
+            self.assertTrue(N.allclose(r.xyz[i_ca], m.xyz[m.maskCA()]))
+        self.assertTrue(N.allclose(rebuilt[3].xyz - rebuilt[0].xyz, 3, atol=1e-3))
+
+    def test_chunks(self):
+        """
+        An ensemble is rebuilt in blocks, like the same list of models
+        """
+        ca = self.ca_stretch(self.histone, 0, 20)
+        models = [ca.clone() for i in range(5)]
+        for i, m in enumerate(models):
+            m.xyz = m.xyz + i
+
+        chunk = R.CHUNK
+        try:
+            R.CHUNK = 2
+            rebuilt = rebuild(E.Ensemble.from_models(models))
+        finally:
+            R.CHUNK = chunk
+
+        self.assertTrue(isinstance(rebuilt, E.Ensemble) and len(rebuilt)==5)
+        for r, m in zip(rebuilt, rebuild(models)):
+            self.assertTrue(r['name']==m['name'])
+            self.assertTrue(N.allclose(r.xyz, m.xyz, atol=1e-3))
+
+    def test_tables(self):
+        """
+        The tables in rebuildTables are the ones derived from testdata
+        """
+        import multiprot.rebuildTables as RT
+
+        files = ['1it2', '2ei4', '2h5q', '2qud', '2z6o', '5agc', 'chain01_2ch',
+            'domAB1', 'histone']
+        models = [B.PDBModel(os.path.join(self.testpath, f+'.pdb')) \
+            for f in files]
+        table, rotamers = derive_tables(models)
+
+        self.assertTrue(N.allclose(table, RT.BACKBONE, atol=1e-3))
+        self.assertTrue(sorted(rotamers)==sorted(RT.ROTAMERS))
+        for name, (atoms, coords) in rotamers.items():
+            self.assertTrue(atoms==RT.ROTAMERS[name][0])
+            self.assertTrue(N.allclose(coords, RT.ROTAMERS[name][1], atol=1e-3))
+
+
+if __name__ == '__main__':
+
+    testing.localTest(debug=False)
@@ -0,0 +1,121 @@
+#############
+##  TESTING
+#############
+from multiprot.sampler import *
+import os
+import multiprot.testing as testing
+
+class TestSampler(testing.AutoTest):
+    """
+    Test class
+    Same cases as TestRanch (examples 1, 4 and 5 from ranch_examples/), plus
+    the geometry of the linkers and the reproducibility of the sampling
+    """
+
+    dom1 = None ## define empty class variable
+    dom2 = None
+    domAB1 = None
+    domAB2 = None
+    testpath = None
+
+    def setUp(self):
+
+        self.testpath = self.testpath or \
+            os.path.join(os.path.abspath(os.path.dirname(__file__)), 'testdata')
+
+        self.dom1 = self.dom1 or B.PDBModel(os.path.join(self.testpath,
+            '2z6o.pdb'))
+        self.dom2 = self.dom2 or B.PDBModel(os.path.join(self.testpath,
+            'histone.pdb'))
+        self.domAB1 = self.domAB1 or B.PDBModel(os.path.join(self.testpath,
+            'domAB1.pdb'))
+        self.domAB2 = self.domAB2 or self.domAB1.clone()
+
+    def test_example1(self):
+        call = Sampler(self.dom1, 'GGGGGGGGGG', self.dom2, seed=1)
+        models = call.run()
+
+        self.assertTrue(len(models)==10, "models does not contain 10 elements")
+
+        model = models[0][0]
+        self.assertTrue(model.lenChains()==1, 'Incorrect number of chains')
+        self.assertTrue(len(model.sequence())==274, 'Incorrect chain length')
+        self.assertTrue(model.atoms['residue_number'][-1]==274,
+            'Incorrect residue numbering')
+        self.assertTrue(model.atoms['serial_number'][-1]==2181,
+            'Incorrect serial numbering')
+
+        dlist = models[0][1]
+        self.assertTrue(len(dlist)==1 and len(dlist[0])==0)
+        self.assertTrue(models[0][2]==model.sequence())
+
+    def test_deadline(self):
+        """
+        Past the deadline, the sampler keeps the models of the first round
+        """
+        call = Sampler(self.dom1, 'GGGGGGGGGG', self.dom2, n=2*Sampler.BATCH,
+            seed=1, deadline=0.)
+        models = call.run()
+
+        self.assertTrue(0 < len(models) <= Sampler.BATCH)
+
+    def test_example4(self):
+        call = Sampler(self.domAB1, 'GGGGGGGGGGGGGGGGGGGG', self.domAB2,
+            chains = {self.domAB1:'A', self.domAB2: 'B'}, n=5, seed=2)
+        models = call.run()
+
+        self.assertTrue(len(models)==5, "models does not contain 5 elements")
+
+        model = models[0][0]
+        self.assertTrue(model.lenChains()==3, 'Incorrect number of chains')
+        self.assertTrue(len(model.takeChains([0]).sequence())==456 and \
+            len(model.takeChains([1]).sequence())==218 and \
+            len(model.takeChains([2]).sequence())==218,
+            'Incorrect chain length')
+
+        dlist = models[0][1]
+        self.assertTrue(len(dlist)==1 and sorted(dlist[0])==[0, 2])
+
+    def test_example5(self):
+        call = Sampler(self.domAB1, 'GGGGGGGGGGGGGGGGGGGG', self.domAB2,
+            chains = {self.domAB2:'A'}, symmetry='p2', symtemplate=self.domAB1,
+            pool_sym='s', n=5, seed=3)
+        models = call.run()
+
+        model = models[0][0]
+        self.assertTrue(model.lenChains()==4, 'Incorrect number of chains')
+        self.assertTrue([len(model.takeChains([i]).sequence()) for i in \
+            range(4)]==[456, 218, 456, 218], 'Incorrect chain length')
+        self.assertTrue(len(models[0][1])==2)
+        self.assertTrue(models[0][2]==model.takeChains([0, 1]).sequence())
+
+    def test_linkers(self):
+        """
+        Consecutive CA atoms of the linkers are 3.8 A apart and fixed domains
+        keep their coordinates
+        """
+        call = Sampler(self.dom1, 'GS'*15, self.dom2, fixed=[self.dom1], n=5,
+            seed=4)
+        models = call.run()
+
+        for model, doms, symseq in models:
+            ca = model.xyz[model.maskCA()]
+            d = N.linalg.norm(ca[1:] - ca[:-1], axis=1)
+            self.assertTrue(N.all(N.abs(d[len(self.dom1.sequence())-1:\
+                -len(self.dom2.sequence())] - Sampler.BOND) < 0.01))
+
+            first = model.take(range(len(self.dom1)))
+            self.assertTrue(N.allclose(first.xyz, self.dom1.xyz, atol=1e-3))
+
+    def test_seed(self):
+        """
+        The same seed produces the same models
+        """
+        x = [[m[0].xyz for m in Sampler(self.dom1, 'G'*10, self.dom2, n=3,
+            seed=5).run()] for i in range(2)]
+        self.assertTrue(all(N.all(a == b) for a, b in zip(*x)))
+
+
+if __name__ == '__main__':
+
+    testing.localTest(debug=False)
@@ -0,0 +1,78 @@
+#############
+##  TESTING
+#############
+from multiprot.server import *
+import tempfile
+import biskit.tools as T
+import multiprot.testing as testing
+
+class TestServer(testing.AutoTest):
+    """
+    Test class
+    """
+
+    def setUp(self):
+        self.testpath = os.path.join(os.path.abspath(os.path.dirname(__file__)),
+            'testdata')
+        self.dest = tempfile.mkdtemp('', 'server_', T.tempDir())
+        self.path = os.path.join(self.dest, 'multiprot.sock')
+
+        self.server = Server(self.path, ['--backend', 'native', '--rebuild',
+            'native'], workers=2)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        T.tryRemove(self.dest, tree=True)
+
+    def test_resolve(self):
+        """
+        The pdb files and destination are relative to the client
+        """
+        argv = resolve(['--chain', '2z6o.pdb:A', 'TGTG', 'missing.pdb', '-n',
+            '2'], self.testpath)
+
+        self.assertTrue(argv[1] == os.path.join(self.testpath, '2z6o.pdb:A'))
+        self.assertTrue(argv[2:4] == ['TGTG', 'missing.pdb'])
+        self.assertTrue(argv[-2:] == ['--destination', self.testpath])
+
+        argv = resolve(['-d', 'out'], self.testpath)
+        self.assertTrue(argv == ['-d', os.path.join(self.testpath, 'out')])
+
+    def test_submit(self):
+        """
+        The constructs are built by the server, which streams their status
+        """
+        argv = ['--chain', '2z6o.pdb', 'TG'*10, 'histone.pdb', '--number', '2',
+            '-d', self.dest]
+
+        events = list(submit(self.path, argv, cwd=self.testpath))
+        self.assertTrue([e['status'] for e in events] == ['queued', 'running',
+            'done'])
+
+        r = events[-1]
+        self.assertTrue(r['models'] == 2 and r['name'] == 'job001')
+        self.assertTrue(all(os.path.exists(f) for f in r['files']))
+
+        # The pdb files are parsed only once
+        r = list(submit(self.path, argv, 'again', self.testpath))[-1]
+        self.assertTrue(r['ok'] and len(self.server.registry.models) == 2)
+
+        r = list(submit(self.path, ['--chain', 'missing.pdb', 'GG',
+            'histone.pdb'], cwd=self.testpath))[-1]
+        self.assertTrue(r['status'] == 'failed' and r['error'])
+
+    def test_running(self):
+        """
+        A second server is not started on the same socket
+        """
+        with self.assertRaises(OSError):
+            Server(self.path)
+
+
+if __name__ == '__main__':
+
+    testing.localTest(debug=False)
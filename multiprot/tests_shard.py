@@ -0,0 +1,71 @@
+#############
+##  TESTING
+#############
+from multiprot.shard import *
+import tempfile
+import biskit.tools as T
+import multiprot.testing as testing
+
+class TestShard(testing.AutoTest):
+    """
+    Test class
+    """
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp('', 'shards_', T.tempDir())
+
+    def tearDown(self):
+        T.tryRemove(self.path, tree=True)
+
+    def test_part(self):
+        """
+        The shards split the ensemble without gaps or overlaps
+        """
+        parts = [part(10, i, 4) for i in range(1, 5)]
+        self.assertTrue(parts == [(0, 3), (3, 3), (6, 2), (8, 2)])
+        self.assertTrue(part(2, 3, 4) == (2, 0))
+
+        seeds = [seed(7, i) for i in range(1, 5)]
+        self.assertTrue(len(set(seeds)) == 4 and seeds == [seed(7, i) for i \
+            in range(1, 5)])
+        self.assertTrue(all(0 <= s < SEEDS for s in seeds))
+
+    def shard(self, i, k, n, s=7):
+        d = os.path.join(self.path, 'shard%d' % i)
+        os.makedirs(d)
+        start, m = part(n, i, k)
+        files = []
+        for j in range(m):
+            files.append(os.path.join(d, 'mp_%02d.pdb' % (j + 1)))
+            with open(files[-1], 'w') as f:
+                f.write('REMARK shard %d model %d\nEND\n' % (i, j + 1))
+        write_manifest(d, (i, k), s, n, files)
+        return d
+
+    def test_merge(self):
+        """
+        The models are numbered after their position in the ensemble
+        """
+        dirs = [self.shard(i, 3, 8) for i in (3, 1)]
+        dest = os.path.join(self.path, 'merged')
+        os.makedirs(dest)
+
+        r = merge(dirs, dest)
+        self.assertTrue([m['file'] for m in r['models']] == ['mp_01.pdb',
+            'mp_02.pdb', 'mp_03.pdb', 'mp_07.pdb', 'mp_08.pdb'])
+        self.assertTrue(r['missing'] == [2])
+        with open(os.path.join(dest, 'mp_07.pdb')) as f:
+            self.assertTrue(f.readline().startswith('REMARK shard 3 model 1'))
+        self.assertTrue(os.path.exists(os.path.join(dest, MERGED)))
+
+        # Shards of another ensemble are not merged
+        other = os.path.join(self.path, 'other')
+        os.makedirs(other)
+        write_manifest(other, (2, 3), 8, 8, [])
+        with self.assertRaises(InputError):
+            merge(dirs + [other], dest)
+
+
+if __name__ == '__main__':
+
+    testing.localTest(debug=False)
@@ -0,0 +1,83 @@
+#############
+##  TESTING
+#############
+from multiprot.structures import *
+import shutil
+import numpy as N
+import biskit.tools as T
+import multiprot.testing as testing
+
+class TestStructures(testing.AutoTest):
+    """
+    Test class
+    """
+
+    def setUp(self):
+        testpath = os.path.join(os.path.abspath(os.path.dirname(__file__)),
+            'testdata')
+        self.path = tempfile.mkdtemp('', 'structures_', T.tempDir())
+        self.f = os.path.join(self.path, 'dom.pdb')
+        shutil.copyfile(os.path.join(testpath, '2z6o.pdb'), self.f)
+
+    def tearDown(self):
+        T.tryRemove(self.path, tree=True)
+
+    def test_get(self):
+        """
+        Every request gets its own copy of the model
+        """
+        registry = StructureRegistry()
+        m1 = registry.get(self.f)
+        m2 = registry.get(self.f)
+
+        self.assertTrue(m1 is not m2 and len(registry.models) == 1)
+        self.assertTrue(N.all(m1.xyz == m2.xyz))
+        self.assertTrue(m1.sourceFile() == self.f)
+
+        m1.xyz[0] += 1.
+        self.assertTrue(N.all(registry.get(self.f).xyz == m2.xyz))
+
+    def test_disk(self):
+        """
+        The pickled models are the same as the parsed ones, and a new version
+        of the file is parsed again
+        """
+        cache = os.path.join(self.path, 'cache')
+        ref = StructureRegistry(cache).get(self.f)
+
+        registry = StructureRegistry(cache)
+        m = registry.get(self.f)
+        self.assertTrue(len(os.listdir(cache)) == 1)
+        self.assertTrue(N.all(m.xyz == ref.xyz) and m.sequence() == \
+            ref.sequence() and m['name'] == ref['name'])
+
+        os.utime(self.f, ns=(0, 0))
+        registry.get(self.f)
+        self.assertTrue(len(os.listdir(cache)) == 2)
+
+        # Only the new version stays in memory
+        self.assertTrue(len(registry.models) == 1)
+
+    def test_evict(self):
+        """
+        The least recently used models are dropped beyond the size
+        """
+        files = [self.f]
+        for i in range(2):
+            files.append(os.path.join(self.path, 'dom%d.pdb' % i))
+            shutil.copyfile(self.f, files[-1])
+
+        registry = StructureRegistry(size=2)
+        registry.get(files[0])
+        registry.get(files[1])
+        registry.get(files[0])
+        registry.get(files[2])
+
+        self.assertTrue(list(registry.models) == [registry.key(f) for f in \
+            (files[0], files[2])])
+        self.assertTrue(sorted(registry.current) == sorted(files[::2]))
+
+
+if __name__ == '__main__':
+
+    testing.localTest(debug=False)
@@ -0,0 +1,99 @@
+#############
+##  TESTING
+#############
+from multiprot.sweep import *
+import biskit as B
+import multiprot.structures as S
+import multiprot.testing as testing
+
+class TestSweep(testing.AutoTest):
+    """
+    Test class
+    """
+
+    def setUp(self):
+        self.testpath = os.path.join(os.path.abspath(os.path.dirname(__file__)),
+            'testdata')
+        self.dest = tempfile.mkdtemp('', 'sweep_', T.tempDir())
+
+    def tearDown(self):
+        T.tryRemove(self.dest, tree=True)
+
+    def test_variants(self):
+        """
+        Every linker of the chains is replaced, and nothing else
+        """
+        self.assertTrue(linker('EAAAK', 7) == 'EAAAKEA')
+
+        argv = ['--chain', 'a.pdb:A', 'GG', 'b.pdb', 'GG', 'c.pdb',
+            '--fixed', 'a.pdb', '-n', '5']
+        r = variants(argv, [4, 5], ['TG'])
+
+        self.assertTrue([name for name, args in r] == ['TG4', 'TG5'])
+        self.assertTrue(r[0][1] == ['--chain', 'a.pdb:A', 'TGTG', 'b.pdb',
+            'TGTG', 'c.pdb', '--fixed', 'a.pdb', '-n', '5'])
+
+        # pdb files are recognized by their existence, not their extension
+        cwd = os.getcwd()
+        os.chdir(self.dest)
+        try:
+            open('DOMAIN', 'w').close()
+            argv = ['--chain', 'a.ENT', 'GG', 'DOMAIN:B', 'GG', 'DOMAIN']
+            r = variants(argv, [3], ['GS'])
+        finally:
+            os.chdir(cwd)
+        self.assertTrue(r[0][1] == ['--chain', 'a.ENT', 'GSG', 'DOMAIN:B',
+            'GSG', 'DOMAIN'])
+
+        with self.assertRaises(InputError):
+            variants(argv, [0, 3])
+        with self.assertRaises(SystemExit):
+            O.parsing(argv + ['--sweep', '0'])
+
+    def test_statistics(self):
+        """
+        The statistics are the same for an ensemble and a list of models
+        """
+        m = B.PDBModel(os.path.join(self.testpath, '2z6o.pdb'))
+        far = m.clone()
+        far.xyz = far.xyz * 1.5
+        models = [m, far]
+
+        r = statistics(E.Ensemble.from_models(models))
+        ref = statistics(models)
+        self.assertTrue(all(N.isclose(r[k], ref[k]) for k in r))
+
+        ca = m.xyz[m.maskCA()]
+        d = N.linalg.norm(ca[0] - ca[-1])
+        self.assertTrue(N.isclose(r['end_to_end'], d * 1.25))
+        self.assertTrue(N.isclose(r['rg_sd'], CL.gyration(ca) * 0.25))
+        self.assertTrue(0 <= r['clash_rate'] <= 1)
+
+    def test_run(self):
+        """
+        The variants are built in their own directories and summarized
+        """
+        argv = ['--chain', os.path.join(self.testpath, '2z6o.pdb'), 'GG',
+            os.path.join(self.testpath, 'histone.pdb'), '-n', '2', '--backend',
+            'native', '--rebuild', 'native', '-d', self.dest]
+
+        registry = S.StructureRegistry()
+        r = run(argv + ['--sweep', '5', '10'], [5, 10], ['GS', 'EAAAK'],
+            workers=2, registry=registry)
+
+        self.assertTrue([x['name'] for x in r] == ['GS5', 'GS10', 'EAAAK5',
+            'EAAAK10'])
+        self.assertTrue(all(x['ok'] and x['models'] == 2 for x in r))
+        self.assertTrue(r[1]['destination'] == os.path.join(self.dest, 'GS10'))
+        self.assertTrue(len(registry.models) == 2)
+
+        f = os.path.join(self.dest, 'sweep.txt')
+        write_table(f, r)
+        with open(f) as fh:
+            lines = fh.readlines()
+        self.assertTrue(len(lines) == 5 and lines[4].startswith('EAAAK10 '))
+
+
+if __name__ == '__main__':
+
+    testing.localTest(debug=False)
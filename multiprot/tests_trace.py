@@ -0,0 +1,91 @@
+#############
+##  TESTING
+#############
+from multiprot.trace import *
+import subprocess, sys, tempfile
+import multiprot.testing as testing
+import multiprot.parallel as PA
+import multiprot.trace as TR
+
+def _sleep(shared, item):
+    with TR.span('test.worker', item=item):
+        time.sleep(shared)
+    return item
+
+class TestTrace(testing.AutoTest):
+    """
+    Test class
+    """
+
+    def setUp(self):
+        TR.drain()
+        TR.enable()
+
+    def tearDown(self):
+        TR.enable(False)
+        TR.drain()
+
+    def test_span(self):
+        """
+        The spans record the time of the stages and of the external programs
+        """
+        @TR.traced('test.traced')
+        def f():
+            subprocess.run([sys.executable, '-c',
+                'sum(range(3*10**6))'], check=True)
+
+        with TR.span('test.outer', chain=1):
+            time.sleep(0.05)
+            f()
+
+        r = {s['name']: s for s in TR.records()}
+        self.assertTrue(set(r) == {'test.outer', 'test.traced'})
+        self.assertTrue(r['test.outer']['wall'] >= r['test.traced']['wall'] \
+            >= r['test.traced']['subprocess'] > 0)
+        self.assertTrue(r['test.outer']['cpu'] < 0.05)
+        self.assertTrue(r['test.outer']['args'] == {'chain': 1})
+        self.assertTrue(r['test.outer']['rss'] > 0)
+
+        # Nothing is recorded when disabled
+        TR.enable(False)
+        with TR.span('test.disabled'):
+            f()
+        self.assertTrue(len(TR.records()) == 2)
+
+    def test_workers(self):
+        """
+        The spans of the worker processes are sent to the main process
+        """
+        with TR.span('test.main'):
+            pass
+        self.assertTrue(PA.pmap(_sleep, range(4), 2, 0.01) == list(range(4)))
+
+        r = [s for s in TR.records() if s['name'] == 'test.worker']
+        self.assertTrue(sorted(s['args']['item'] for s in r) == list(range(4)))
+        self.assertTrue(all(s['pid'] != os.getpid() for s in r))
+
+        # The spans of the main process are not sent back by the workers
+        self.assertTrue(len(TR.records()) == 5)
+
+    def test_write(self):
+        """
+        The trace file has an event and the summary of every stage
+        """
+        for i in range(3):
+            with TR.span('test.stage'):
+                pass
+
+        with tempfile.NamedTemporaryFile(suffix='.json') as f:
+            TR.write(f.name)
+            with open(f.name) as fh:
+                trace = json.load(fh)
+
+        self.assertTrue(len(trace['traceEvents']) == 3)
+        self.assertTrue(trace['traceEvents'][0]['ph'] == 'X')
+        self.assertTrue(trace['summary'][0]['count'] == 3)
+        self.assertTrue(TR.table().splitlines()[1].startswith('test.stage'))
+
+
+if __name__ == '__main__':
+
+    testing.localTest(debug=False)
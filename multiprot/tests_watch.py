@@ -0,0 +1,98 @@
+#############
+##  TESTING
+#############
+from multiprot.watch import *
+import sys, tempfile
+import biskit.tools as T
+import multiprot.testing as testing
+
+# Writes one model every 0.2 seconds, each file in two steps
+WRITER = """
+import os, sys, time
+for i in range(10):
+    with open(os.path.join(sys.argv[1], 'model%02d.pdb' % i), 'w') as f:
+        f.write('ATOM\\n')
+        f.flush()
+        time.sleep(0.1)
+        f.write('END\\n')
+    time.sleep(0.1)
+"""
+
+class TestWatch(testing.AutoTest):
+    """
+    Test class
+    """
+
+    def setUp(self):
+        self.dir_models = tempfile.mkdtemp('', 'models_', T.tempDir())
+
+    def tearDown(self):
+        T.tryRemove(self.dir_models, tree=True)
+
+    def writer(self):
+        return subprocess.Popen([sys.executable, '-c', WRITER, self.dir_models])
+
+    def test_complete(self):
+        """
+        Only files ending with END are complete
+        """
+        f = os.path.join(self.dir_models, 'model.pdb')
+        with open(f, 'w') as fh:
+            fh.write('ATOM\n')
+        self.assertFalse(complete(f))
+
+        with open(f, 'a') as fh:
+            fh.write('END\n\n')
+        self.assertTrue(complete(f))
+
+    def check_wait(self, inotify):
+        p = self.writer()
+        t = time.time()
+        paths = wait_models(self.dir_models, 3, p, inotify)
+        t = time.time() - t
+        p.kill()
+        p.wait()
+
+        self.assertTrue(len(paths)==3)
+        self.assertTrue(all(complete(f) for f in paths))
+        self.assertTrue(t < 1.5, 'waited %.2f s' % t)
+
+    def test_wait_inotify(self):
+        """
+        The wait ends shortly after the third model is written
+        """
+        self.check_wait(True)
+
+    def test_wait_polling(self):
+        """
+        Same with the polling fallback
+        """
+        self.check_wait(False)
+
+    def test_deadline(self):
+        """
+        The wait ends at the deadline with the models complete by then, and
+        the unfinished model is removed once the writer is stopped
+        """
+        p = self.writer()
+        paths = wait_models(self.dir_models, 10, p, deadline=time.time()+0.5)
+        stop(p)
+        prune(self.dir_models)
+
+        self.assertTrue(p.returncode is not None)
+        self.assertTrue(1 <= len(paths) < 10)
+        self.assertTrue(all(complete(f) for f in paths))
+        self.assertTrue(all(complete(os.path.join(self.dir_models, f)) \
+            for f in os.listdir(self.dir_models)))
+
+    def test_exit(self):
+        """
+        The wait ends when the process exits with fewer models
+        """
+        p = subprocess.Popen([sys.executable, '-c', 'pass'])
+        self.assertTrue(wait_models(self.dir_models, 3, p)==[])
+
+
+if __name__ == '__main__':
+
+    testing.localTest(debug=False)
@@ -0,0 +1,218 @@
+"""
+Timing and resource use of the stages of the modeling
+
+    multipr --chain a.pdb TGTG b.pdb -n 100 --trace trace.json
+
+Every stage (e.g. ranch.prepare, pulchra.run, builder.select, see the
+modules that build the models) runs in a span, which records its wall time,
+the CPU time of the thread running it, the time of the external programs
+(e.g. ranch, pulchra) that exited during the span, and the peak memory of the
+process and of its external programs at the end of the span. The spans of
+the worker processes (see multiprot.parallel) are sent back to the main
+process along with their results.
+
+The trace file is in the trace event format of Chrome (chrome://tracing,
+https://ui.perfetto.dev), with a summary of every stage, which is also printed
+as a table. Nothing is recorded until the tracing is enabled.
+
+The time of the external programs and the peak memory are those of the whole
+process, so they are shared by the spans that run at the same time in
+several threads.
+
+"""
+
+import contextlib, functools, json, os, threading, time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+_enabled = False
+_records = []
+_lock = threading.Lock()
+
+
+def enable(on=True):
+    """
+    Starts (or stops) recording the spans of this process
+    """
+    global _enabled
+    _enabled = on
+
+def enabled():
+    """
+    :return: True if the spans are recorded
+    :type return: bool
+    """
+    return _enabled
+
+def _usage():
+    """
+    :return: time of the external programs that exited, in seconds, and peak
+             memory of the process and of its external programs, in MB
+    :type return: (float, float)
+    """
+    if resource is None:
+        return 0., 0.
+
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    # ru_maxrss is in kB on Linux, in bytes on macOS
+    unit = 1024.**2 if os.uname().sysname == 'Darwin' else 1024.
+
+    return children.ru_utime + children.ru_stime, \
+        max(own.ru_maxrss, children.ru_maxrss) / unit
+
+@contextlib.contextmanager
+def span(name, **args):
+    """
+    Records the block of code run in it, if the tracing is enabled
+
+    >>> with span('builder.select', models=len(models)):
+    ...     models = select(models)
+
+    :param name:    name of the stage
+    :type name:     str
+    :param args:    details of the span, kept in the trace file (e.g. the
+                    number of the chain)
+    :type args:     json serializable values
+    """
+    if not _enabled:
+        yield
+        return
+
+    sub, rss = _usage()
+    start = time.time()
+    wall = time.perf_counter()
+    cpu = time.thread_time()
+
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - wall
+        cpu = time.thread_time() - cpu
+        sub_end, rss = _usage()
+
+        record = {'name': name, 'pid': os.getpid(),
+            'tid': threading.get_ident(), 'start': start, 'wall': wall,
+            'cpu': cpu, 'subprocess': sub_end - sub, 'rss': rss, 'args': args}
+        with _lock:
+            _records.append(record)
+
+def traced(name):
+    """
+    Decorator that runs every call of a function in a span
+
+    :param name:    name of the stage
+    :type name:     str
+    """
+    def decorator(func):
+
+        @functools.wraps(func)
+        def wrapper(*args, **kw):
+            if not _enabled:
+                return func(*args, **kw)
+            with span(name):
+                return func(*args, **kw)
+
+        return wrapper
+
+    return decorator
+
+def records():
+    """
+    :return: the spans recorded so far
+    :type return: list of dicts
+    """
+    with _lock:
+        return list(_records)
+
+def drain():
+    """
+    :return: the spans recorded so far, which are forgotten (e.g. by a worker
+             process that sends them to the main process)
+    :type return: list of dicts
+    """
+    global _records
+    with _lock:
+        r, _records = _records, []
+    return r
+
+def extend(spans):
+    """
+    Adds the spans recorded by another process
+    """
+    with _lock:
+        _records.extend(spans)
+
+def summary(spans=None):
+    """
+    :param spans:   spans to summarize (default: None, all the spans recorded)
+    :type spans:    list of dicts
+
+    :return: number of spans, total wall, CPU and subprocess time in seconds
+             and peak memory in MB of every stage, in order of first call
+    :type return: list of dicts
+    """
+    if spans is None:
+        spans = records()
+
+    r = {}
+    for s in sorted(spans, key=lambda s: s['start']):
+        t = r.setdefault(s['name'], {'name': s['name'], 'count': 0,
+            'wall': 0., 'cpu': 0., 'subprocess': 0., 'rss': 0.})
+        t['count'] += 1
+        for k in ('wall', 'cpu', 'subprocess'):
+            t[k] += s[k]
+        t['rss'] = max(t['rss'], s['rss'])
+
+    return list(r.values())
+
+def table(spans=None):
+    """
+    :return: summary of every stage (see summary()), as a text table
+    :type return: str
+    """
+    rows = summary(spans)
+    width = max([len(t['name']) for t in rows] + [5])
+
+    lines = ['%-*s %6s %10s %10s %11s %9s' % (width, 'stage', 'calls',
+        'wall (s)', 'cpu (s)', 'subproc (s)', 'rss (MB)')]
+    for t in rows:
+        lines.append('%-*s %6d %10.3f %10.3f %11.3f %9.1f' % (width,
+            t['name'], t['count'], t['wall'], t['cpu'], t['subprocess'],
+            t['rss']))
+
+    return '\n'.join(lines)
+
+def write(f, spans=None):
+    """
+    Writes the spans to a trace file, see the description of the module
+
+    :param f:       path of the trace file
+    :type f:        str
+    :param spans:   spans to write (default: None, all the spans recorded)
+    :type spans:    list of dicts
+    """
+    if spans is None:
+        spans = records()
+
+    events = [{'name': s['name'], 'ph': 'X', 'pid': s['pid'], 'tid': s['tid'],
+        'ts': s['start'] * 1e6, 'dur': s['wall'] * 1e6,
+        'args': dict(s['args'], cpu=s['cpu'], subprocess=s['subprocess'],
+        rss=s['rss'])} for s in spans]
+
+    with open(f, 'w') as fh:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms',
+            'summary': summary(spans)}, fh, indent=1)
+
+def report(f):
+    """
+    Writes the trace file and prints the summary table, e.g. at the exit of
+    the multipr script
+    """
+    write(f)
+    print(table())
+    print('Trace written to %s' % f)
@@ -0,0 +1,221 @@
+"""
+Waits for the model files written by an external program (ranch), so it can be
+stopped as soon as enough models are complete
+
+On Linux the directory of the models is watched with inotify, so the wait ends
+as soon as a file is closed. Elsewhere, or if inotify is not available, the
+directory is polled at short intervals.
+
+"""
+
+import ctypes, ctypes.util
+import os, select, subprocess, time
+
+# inotify constants (see <sys/inotify.h>)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+POLL = 0.05     # seconds between checks of the directory without inotify
+EXIT = 0.25     # seconds between checks of the process with inotify
+STOP = 5.       # seconds given to a process to exit after it is terminated
+
+
+def complete(path):
+    """
+    Checks that a pdb file was completely written, i.e. that its last line is
+    an END record
+
+    :param path:    path of the pdb file
+    :type path:     str
+
+    :return: True if the file ends with an END record
+    :type return: bool
+    """
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - 82))
+            lines = f.read().split(b'\n')
+    except OSError:
+        return False
+
+    lines = [l for l in lines if l.strip()]
+    return bool(lines) and lines[-1].startswith(b'END')
+
+def ready(directory, n, running=True):
+    """
+    Complete model files in directory, in the order of their names
+
+    While the program is running, a model is complete if it ends with an END
+    record or if a later model was already started. Once the program is done,
+    all of the files are complete.
+
+    :param directory:   directory of the models
+    :type directory:    str
+    :param n:           maximum number of models to return
+    :type n:            int
+    :param running:     whether the program writing the models is still
+                        running (default: True)
+    :type running:      bool
+
+    :return: paths of the first n complete models
+    :type return: list of str
+    """
+    paths = [os.path.join(directory, f) for f in sorted(os.listdir(directory))]
+
+    if running and paths and not complete(paths[-1]):
+        paths = paths[:-1]
+
+    return paths[:n]
+
+def prune(directory):
+    """
+    Removes the model files of directory that were not completely written,
+    e.g. by a program that was stopped
+
+    :param directory:   directory of the models
+    :type directory:    str
+    """
+    for f in os.listdir(directory):
+        path = os.path.join(directory, f)
+        if not complete(path):
+            os.remove(path)
+
+def stop(process):
+    """
+    Terminates a process, and kills it if it does not exit within STOP
+    seconds
+
+    :param process: process to stop
+    :type process:  subprocess.Popen
+    """
+    if process.poll() is not None:
+        return
+
+    process.terminate()
+    try:
+        process.wait(STOP)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+class Inotify:
+    """
+    Watches the files closed or moved into a directory with inotify
+    """
+
+    def __init__(self, directory):
+        """
+        :param directory:   directory to watch
+        :type directory:    str
+
+        :raise OSError: if inotify is not available
+        """
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+
+        try:
+            self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        except AttributeError:
+            raise OSError('inotify is not available')
+
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory),
+            IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, 'inotify_add_watch failed')
+
+    def wait(self, timeout):
+        """
+        Waits until a file is closed or moved into the directory
+
+        :param timeout: maximum time to wait, in seconds
+        :type timeout:  float
+        """
+        if select.select([self.fd], [], [], timeout)[0]:
+            try:
+                os.read(self.fd, 65536)
+            except BlockingIOError:
+                pass
+
+    def close(self):
+        os.close(self.fd)
+
+
+class Polling:
+    """
+    Fallback for Inotify, waits for a short time
+    """
+
+    def __init__(self, directory):
+        pass
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, POLL))
+
+    def close(self):
+        pass
+
+
+def watcher(directory, inotify=True):
+    """
+    :param inotify: use inotify if available (default: True)
+    :type inotify:  bool
+
+    :return: an Inotify watcher for directory, or a Polling one if inotify is
+             not available
+    :type return: Inotify or Polling
+    """
+    if inotify:
+        try:
+            return Inotify(directory)
+        except OSError:
+            pass
+
+    return Polling(directory)
+
+def wait_models(directory, n, process, inotify=True, deadline=None):
+    """
+    Waits until n complete models are in directory, or until the process
+    writing them exits or the deadline is reached
+
+    :param directory:   directory of the models
+    :type directory:    str
+    :param n:           number of models to wait for
+    :type n:            int
+    :param process:     process writing the models
+    :type process:      subprocess.Popen
+    :param inotify:     use inotify if available, instead of polling the
+                        directory (default: True)
+    :type inotify:      bool
+    :param deadline:    time (see time.time()) at which the wait ends with
+                        the models complete by then (default: None, no limit)
+    :type deadline:     float
+
+    :return: paths of the complete models (at most n)
+    :type return: list of str
+    """
+    w = watcher(directory, inotify)
+
+    try:
+        while True:
+            running = process.poll() is None
+            paths = ready(directory, n, running)
+
+            if len(paths) >= n or not running:
+                return paths
+
+            timeout = EXIT
+            if deadline is not None:
+                timeout = deadline - time.time()
+                if timeout <= 0:
+                    return paths
+
+            w.wait(min(timeout, EXIT))
+    finally:
+        w.close()